@@ -0,0 +1,137 @@
+"""In-process benchmarks of YahooFinanceFetcher against the offline market data provider.
+
+Runs the quote fetchers (price-only, profile and full), fetch_historical_data for every supported period
+and wire format, and the dashboard's DataFrame build from each response,
+reporting throughput, latency percentiles and peak traced memory per case.
+Timings are taken without tracemalloc; memory comes from a separate,
+shorter traced pass so tracing overhead does not skew latency.
+
+    python benchmarks/bench_fetcher.py
+    python benchmarks/bench_fetcher.py --quick --json results.json
+    python benchmarks/bench_fetcher.py --bar-store off --latency-ms 20
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+
+from bench_server import percentile
+
+PERIODS = ("1d", "5d", "1mo", "3mo", "6mo", "ytd", "1y", "2y", "5y", "10y")
+FORMATS = ("records", "columnar")
+
+
+def measure(fn, iterations: int, memory_iterations: int) -> dict:
+    latencies = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        call_started = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - call_started)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    for i in range(memory_iterations):
+        fn(i)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "ops": iterations,
+        "ops_per_sec": iterations / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "peak_kib": peak / 1024,
+    }
+
+
+def run_cases(args) -> dict:
+    from data_fetchers.yahoo_finance import YahooFinanceFetcher
+    from finance_mcp_client import history_to_dataframe
+
+    tickers = [f"T{n:04d}" for n in range(args.tickers)]
+    results = {}
+
+    def record(name: str, fn):
+        # One untimed call per ticker warms the bar store and the provider's generated series
+        for ticker in tickers:
+            fn(ticker)
+        results[name] = measure(lambda i: fn(tickers[i % len(tickers)]), args.iterations, args.memory_iterations)
+        row = results[name]
+        print(f"{name:<42} {row['ops_per_sec']:>10.1f} {row['p50_ms']:>9.3f} {row['p99_ms']:>9.3f} {row['peak_kib']:>10.1f}")
+
+    print(f"{'case':<42} {'ops/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'peak KiB':>10}")
+    record("fetch_quote", YahooFinanceFetcher.fetch_quote)
+    record("fetch_profile", YahooFinanceFetcher.fetch_profile)
+    record("fetch_stock_price", YahooFinanceFetcher.fetch_stock_price)
+
+    for period in PERIODS:
+        for format in args.formats:
+            record(
+                f"fetch_historical_data {period} {format}",
+                lambda ticker, period=period, format=format: YahooFinanceFetcher.fetch_historical_data(ticker, period, format)
+            )
+
+    for period in PERIODS:
+        for format in args.formats:
+            # Build from the decoded JSON the dashboard receives, not the fetcher's in-memory dict
+            payloads = {
+                ticker: json.loads(json.dumps(YahooFinanceFetcher.fetch_historical_data(ticker, period, format)))
+                for ticker in tickers
+            }
+            record(f"history_to_dataframe {period} {format}", lambda ticker, payloads=payloads: history_to_dataframe(payloads[ticker]))
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark YahooFinanceFetcher against the offline market data provider")
+    parser.add_argument("--iterations", type=int, default=200, help="Timed calls per case")
+    parser.add_argument("--memory-iterations", type=int, default=20, help="Calls per case traced for peak memory")
+    parser.add_argument("--tickers", type=int, default=20, help="Distinct tickers cycled through per case")
+    parser.add_argument("--formats", type=lambda value: value.split(","), default=list(FORMATS),
+                        help="Comma-separated wire formats for historical data cases")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Simulated upstream latency per provider request")
+    parser.add_argument("--bar-store", choices=["warm", "off"], default="warm",
+                        help="Serve history from a temporary bar store (warm) or from the provider on every call (off)")
+    parser.add_argument("--data-dir", help="Replay recordings from this directory (see record_market_data.py)")
+    parser.add_argument("--quick", action="store_true", help="Few iterations, for smoke runs in CI")
+    parser.add_argument("--json", help="Also write results to this path")
+    args = parser.parse_args()
+
+    if args.quick:
+        args.iterations, args.memory_iterations, args.tickers = 20, 3, 5
+    unknown = set(args.formats) - set(FORMATS)
+    if unknown:
+        parser.error(f"unknown formats: {', '.join(sorted(unknown))}")
+
+    # Provider settings are read at import time, so set them before importing the fetcher
+    os.environ["MARKET_DATA_PROVIDER"] = "offline"
+    os.environ["OFFLINE_LATENCY_MS"] = str(args.latency_ms)
+    if args.data_dir:
+        os.environ["OFFLINE_DATA_DIR"] = args.data_dir
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # No upstream rate limit: the provider is local and the limiter would dominate the numbers
+    os.environ.setdefault("UPSTREAM_YAHOO_RATE", "0")
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["BAR_STORE_PATH"] = os.path.join(directory, "bars.db") if args.bar_store == "warm" else ""
+        import logging_setup
+        logging_setup.configure_logging()
+        results = run_cases(args)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+        print(f"wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
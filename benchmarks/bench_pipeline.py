@@ -0,0 +1,156 @@
+"""End-to-end throughput benchmark of the query pipeline, fully offline.
+
+Runs the classic (extract, fetch, stream analysis) or agent pipeline with
+the stub LLM backend against benchmarks/stub_server.py, from concurrent
+threads, and reports queries/sec and latency percentiles. Unless
+--warm-caches is given, the ticker extraction caches (the file and the
+in-memory LRU) and the analysis cache are disabled, so every query does
+the full amount of work. Queries naming a known company still resolve on
+the local fast path, which is not a cache.
+
+    python benchmarks/bench_pipeline.py --concurrency 8 --duration 15
+    python benchmarks/bench_pipeline.py --pipeline agent --llm-latency-ms 500
+    python benchmarks/bench_pipeline.py --fetcher offline
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from bench_server import percentile, free_port, wait_until_healthy, start_server
+
+QUERIES = [
+    "How has Apple performed over the last 6 months?",
+    "Give me Tesla data",
+    "What is Microsoft's P/E ratio?",
+    "Show me NVDA over the past year",
+    "Is John Deere a good buy this quarter?",
+    "What's going on with Amazon stock?",
+    "Netflix performance over 3 months",
+    "Compare Google's valuation to its sector",
+]
+
+
+def run_classic(llm_parser, client, query: str) -> bool:
+    ticker, timeframe = llm_parser.extract_ticker_and_timeframe(query)
+    if not ticker:
+        return False
+    data, hist_response, indicators_response = asyncio.run(client.fetch_analysis_inputs(ticker, timeframe))
+    if "error" in data:
+        return False
+    historical_data = hist_response.get("data", {}) if hist_response and "error" not in hist_response else None
+    indicators = indicators_response.get("data", {}) if indicators_response and "error" not in indicators_response else None
+    chunks = list(llm_parser.stream_analysis_summary(
+        ticker, data.get("data", {}), query, historical_data, indicators
+    ))
+    return bool(chunks)
+
+
+def run_load(args, url: str) -> dict:
+    from llm_backends import StubBackend
+    from llm_parser import TickerParser
+    from agent_pipeline import ToolCallingPipeline
+    from finance_mcp_client import FinanceClient, AsyncFinanceClient
+
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + args.duration
+
+    def worker(worker_id: int):
+        llm_parser = TickerParser(StubBackend(latency_ms=args.llm_latency_ms, token_ms=args.llm_token_ms))
+        client = FinanceClient()
+        client.base_url = url
+        async_client = AsyncFinanceClient(client, max_workers=4)
+        pipeline = ToolCallingPipeline(llm_parser, client)
+        local, failed = [], 0
+        i = worker_id
+        while time.perf_counter() < stop_at:
+            query = QUERIES[i % len(QUERIES)]
+            i += args.concurrency
+            started = time.perf_counter()
+            try:
+                if args.pipeline == "agent":
+                    ok = bool(pipeline.run(query)["answer"])
+                else:
+                    ok = run_classic(llm_parser, async_client, query)
+            except Exception:
+                ok = False
+            local.append(time.perf_counter() - started)
+            failed += 0 if ok else 1
+        async_client.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "queries": len(latencies),
+        "errors": errors[0],
+        "qps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": (latencies[-1] * 1000) if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the full query pipeline with the stub LLM backend")
+    parser.add_argument("--url", help="Use an already running tool server instead of starting the stub server")
+    parser.add_argument("--pipeline", choices=["classic", "agent"], default="classic")
+    parser.add_argument("--mode", choices=["gunicorn", "dev"], default="gunicorn")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--stub-latency-ms", type=float, default=50, help="Simulated market data latency")
+    parser.add_argument("--price-ttl", type=float, default=15)
+    parser.add_argument("--fetcher", choices=["stub", "offline"], default="stub",
+                        help="Stub out YahooFinanceFetcher, or run it against the offline market data provider")
+    parser.add_argument("--llm-latency-ms", type=float, default=200, help="Simulated time to first token")
+    parser.add_argument("--llm-token-ms", type=float, default=5, help="Simulated time per generated token")
+    parser.add_argument("--warm-caches", action="store_true", help="Keep the extraction and analysis caches enabled")
+    args = parser.parse_args()
+
+    if not args.warm_caches:
+        os.environ["TICKER_CACHE_PATH"] = ""
+        os.environ["TICKER_CACHE_SIZE"] = "0"
+        os.environ["ANALYSIS_CACHE_PATH"] = ""
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    process = None
+    url = args.url
+    if not url:
+        port = free_port()
+        url = f"http://127.0.0.1:{port}"
+        process = start_server(args, port)
+    try:
+        wait_until_healthy(url)
+        result = run_load(args, url)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+    print(f"pipeline:     {args.pipeline}, concurrency {args.concurrency}, {args.duration:.0f}s")
+    print(f"stub llm:     {args.llm_latency_ms:.0f} ms first token, {args.llm_token_ms:.0f} ms/token")
+    print(f"queries:      {result['queries']} ({result['errors']} errors)")
+    print(f"throughput:   {result['qps']:.2f} queries/s")
+    print(f"latency p50:  {result['p50_ms']:.1f} ms")
+    print(f"latency p99:  {result['p99_ms']:.1f} ms")
+    print(f"latency max:  {result['max_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Load benchmark for the /tool_call endpoint.
+
+Starts benchmarks/stub_server.py (gunicorn or the Flask dev server) with a
+stubbed fetcher, or with the real fetcher on the offline market data
+provider (--fetcher offline), drives it with concurrent keep-alive clients
+and reports requests/sec and latency percentiles. Pass --url to benchmark
+a server that is already running instead.
+
+    python benchmarks/bench_server.py --concurrency 32 --duration 15
+    python benchmarks/bench_server.py --mode dev
+    python benchmarks/bench_server.py --fetcher offline --tool fetch_historical_data
+"""
+import os
+import sys
+import time
+import socket
+import argparse
+import threading
+import subprocess
+
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_healthy(url: str, timeout: float = 30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{url}/health", timeout=1).ok:
+                return
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not become healthy within {timeout}s")
+
+
+def start_server(args, port: int) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "PORT": str(port),
+        "HOST": "127.0.0.1",
+        "BENCH_SERVER_MODE": args.mode,
+        "MCP_WORKERS": str(args.workers),
+        "MCP_THREADS": str(args.threads),
+        "STUB_LATENCY_MS": str(args.stub_latency_ms),
+        "BENCH_FETCHER": args.fetcher,
+        "MARKET_DATA_PROVIDER": "offline",
+        "OFFLINE_LATENCY_MS": str(args.stub_latency_ms),
+        "UPSTREAM_YAHOO_RATE": "0",
+        "QUOTE_CACHE_PRICE_TTL": str(args.price_ttl),
+        "BAR_STORE_PATH": "",
+        # Background warming would add upstream work that isn't part of the measured load
+        "PREFETCH_INTERVAL_SECONDS": "0",
+        "PREFETCH_STATE_PATH": "",
+        # Streams aren't benchmarked; skip the dedicated stream process and its port
+        "QUOTE_STREAM_PORT": "",
+        "LOG_LEVEL": "WARNING",
+    })
+    return subprocess.Popen(
+        [sys.executable, os.path.join(HERE, "stub_server.py")],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+
+def run_load(url: str, payloads: list, concurrency: int, duration: float) -> dict:
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def worker(worker_id: int):
+        session = requests.Session()
+        local, failed = [], 0
+        i = worker_id
+        while time.perf_counter() < stop_at:
+            payload = payloads[i % len(payloads)]
+            i += concurrency
+            started = time.perf_counter()
+            try:
+                response = session.post(f"{url}/tool_call", json=payload, timeout=30)
+                ok = response.status_code == 200
+                response.content
+            except requests.exceptions.RequestException:
+                ok = False
+            local.append(time.perf_counter() - started)
+            failed += 0 if ok else 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": (latencies[-1] * 1000) if latencies else 0.0,
+    }
+
+
+def build_payloads(tool: str, tickers: int) -> list:
+    symbols = [f"T{n:04d}" for n in range(tickers)]
+    if tool == "fetch_historical_data":
+        return [{"name": tool, "parameters": {"ticker": s, "period": "3mo", "format": "columnar"}} for s in symbols]
+    return [{"name": "fetch_stock_data", "parameters": {"ticker": s}} for s in symbols]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /tool_call throughput against a stubbed fetcher")
+    parser.add_argument("--url", help="Benchmark an already running server instead of starting one")
+    parser.add_argument("--mode", choices=["gunicorn", "dev"], default="gunicorn")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--tool", choices=["fetch_stock_data", "fetch_historical_data"], default="fetch_stock_data")
+    parser.add_argument("--tickers", type=int, default=50, help="Distinct tickers cycled through by the clients")
+    parser.add_argument("--fetcher", choices=["stub", "offline"], default="stub",
+                        help="Stub out YahooFinanceFetcher, or run it against the offline market data provider")
+    parser.add_argument("--stub-latency-ms", type=float, default=50, help="Simulated upstream latency per request")
+    parser.add_argument("--price-ttl", type=float, default=15, help="Quote cache price TTL; 0 sends every quote to the stub")
+    args = parser.parse_args()
+
+    process = None
+    url = args.url
+    if not url:
+        port = free_port()
+        url = f"http://127.0.0.1:{port}"
+        process = start_server(args, port)
+    try:
+        wait_until_healthy(url)
+        result = run_load(url, build_payloads(args.tool, args.tickers), args.concurrency, args.duration)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+    if args.url:
+        label = args.url
+    elif args.mode == "gunicorn":
+        label = f"gunicorn ({args.workers} workers x {args.threads} threads)"
+    else:
+        label = "flask dev server"
+    if not args.url:
+        label += f", {args.fetcher} fetcher"
+    print(f"server:       {label}")
+    print(f"tool:         {args.tool}, concurrency {args.concurrency}, {args.duration:.0f}s")
+    print(f"requests:     {result['requests']} ({result['errors']} errors)")
+    print(f"throughput:   {result['rps']:.1f} req/s")
+    print(f"latency p50:  {result['p50_ms']:.1f} ms")
+    print(f"latency p99:  {result['p99_ms']:.1f} ms")
+    print(f"latency max:  {result['max_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
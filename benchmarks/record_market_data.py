@@ -0,0 +1,31 @@
+"""Record live Yahoo data for offline replay by MARKET_DATA_PROVIDER=offline.
+
+Writes <TICKER>.json (the info blob) and <TICKER>.csv (daily bars) per
+ticker into the output directory; point OFFLINE_DATA_DIR (or
+bench_fetcher.py --data-dir) at it. Needs network access, unlike
+everything that consumes the recordings.
+
+    python benchmarks/record_market_data.py AAPL MSFT NVDA --out benchmarks/data
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from data_fetchers.offline_provider import record
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record Yahoo info blobs and daily bars for offline replay")
+    parser.add_argument("tickers", nargs="+")
+    parser.add_argument("--out", required=True, help="Directory to write recordings to")
+    parser.add_argument("--period", default="10y", help="History period to record (default 10y)")
+    args = parser.parse_args()
+
+    for ticker, bars in record(args.tickers, args.out, args.period).items():
+        print(f"{ticker}: {bars} daily bars")
+
+
+if __name__ == "__main__":
+    main()
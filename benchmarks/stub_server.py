@@ -0,0 +1,97 @@
+"""Tool server with YahooFinanceFetcher replaced by a synthetic in-process stub.
+
+Used by bench_server.py so load numbers measure the serving stack rather
+than Yahoo. STUB_LATENCY_MS simulates upstream latency per fetch. With
+BENCH_FETCHER=offline the real fetcher runs instead, against the offline
+market data provider, so parsing and formatting costs are included.
+"""
+import os
+import sys
+import time
+import math
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import pandas as pd
+import mcp_server
+import serve
+from data_fetchers.yahoo_finance import YahooFinanceFetcher
+from data_fetchers import indicators
+from data_fetchers.resample import resample_bars
+
+STUB_LATENCY = float(os.environ.get("STUB_LATENCY_MS", 50)) / 1000
+
+
+class StubFetcher:
+    @staticmethod
+    def fetch_quote(ticker: str) -> dict:
+        time.sleep(STUB_LATENCY)
+        return {
+            "ticker": ticker,
+            "price": 100.0 + (zlib.crc32(ticker.encode()) % 1000) / 10,
+            "currency": "USD",
+            "marketCap": 1_000_000_000,
+        }
+
+    @staticmethod
+    def fetch_profile(ticker: str) -> dict:
+        time.sleep(STUB_LATENCY)
+        return {
+            "ticker": ticker,
+            "name": f"{ticker} Inc.",
+            "sector": "Technology",
+            "industry": "Software",
+            "description": "Synthetic benchmark company",
+            "trailingEps": 5.0,
+        }
+
+    @staticmethod
+    def _synthetic_history(bars: int = 100):
+        index = pd.date_range(end=pd.Timestamp.now(tz="America/New_York").normalize(), periods=bars, freq="B", name="Date")
+        closes = [100 + 10 * math.sin(i / 7) for i in range(len(index))]
+        return pd.DataFrame({
+            "Open": closes, "High": closes, "Low": closes, "Close": closes,
+            "Volume": 1_000_000, "Dividends": 0.0, "Stock Splits": 0.0
+        }, index=index)
+
+    @staticmethod
+    def fetch_historical_data(ticker: str, period: str = "1mo", format: str = "records",
+                              interval: str = None, max_points: int = None) -> dict:
+        time.sleep(STUB_LATENCY)
+        interval = interval or "1d"
+        hist = resample_bars(StubFetcher._synthetic_history(), interval)
+        return YahooFinanceFetcher._format_history(ticker, period, interval, hist, format, max_points)
+
+    @staticmethod
+    def fetch_indicators(ticker: str, period: str = "6mo", series: bool = False) -> dict:
+        time.sleep(STUB_LATENCY)
+        hist = StubFetcher._synthetic_history(300)
+        frame = indicators.compute_indicators(hist).iloc[-100:]
+        payload = {
+            "ticker": ticker,
+            "period": period,
+            "interval": "1d",
+            "bars": len(frame),
+            "as_of": indicators.epoch_seconds(frame.index[-1]),
+            "latest": indicators.latest_values(frame),
+            "period_stats": indicators.period_stats(hist.iloc[-100:]),
+        }
+        if series:
+            payload["series"] = indicators.to_columnar(frame)
+        return payload
+
+
+def install_stub():
+    mcp_server.quote_cache.loaders = {"price": StubFetcher.fetch_quote, "profile": StubFetcher.fetch_profile}
+    mcp_server.YahooFinanceFetcher = StubFetcher
+
+
+if __name__ == "__main__":
+    if os.environ.get("BENCH_FETCHER", "stub") == "stub":
+        install_stub()
+    if os.environ.get("BENCH_SERVER_MODE", "gunicorn") == "dev":
+        port = int(os.environ.get("PORT", 5001))
+        mcp_server.app.run(host="127.0.0.1", port=port, debug=False, threaded=True)
+    else:
+        serve.main(mcp_server.app)
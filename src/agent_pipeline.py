@@ -0,0 +1,285 @@
+import os
+import json
+import time
+import logging
+
+import tracing
+from token_budget import TokenBudget
+
+logger = logging.getLogger(__name__)
+
+# Function definitions for the existing tool server tools, in the OpenAI/Groq tools format
+TOOL_DEFINITIONS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "fetch_stock_data",
+            "description": "Current quote for one stock: price, P/E ratio, market cap, sector, industry and a short description.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "ticker": {"type": "string", "description": "Exchange ticker symbol, e.g. AAPL"},
+                    "fields": {
+                        "type": "array",
+                        "items": {"type": "string", "enum": ["price", "currency", "marketCap", "pe_ratio", "name", "sector", "industry", "description"]},
+                        "description": "Only these fields; omit for the full quote. Asking for just price is fastest."
+                    }
+                },
+                "required": ["ticker"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "fetch_historical_data",
+            "description": "Price history summary for one stock over a period. Only call it when the question concerns performance over time.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "ticker": {"type": "string", "description": "Exchange ticker symbol, e.g. AAPL"},
+                    "period": {"type": "string", "enum": ["1mo", "3mo", "6mo", "1y", "2y", "5y"]}
+                },
+                "required": ["ticker", "period"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "fetch_indicators",
+            "description": "Technical indicators for one stock over a period: RSI, MACD, moving averages, Bollinger %B, volatility, max drawdown and VWAP. Call it for momentum, trend-strength or risk questions.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "ticker": {"type": "string", "description": "Exchange ticker symbol, e.g. AAPL"},
+                    "period": {"type": "string", "enum": ["1mo", "3mo", "6mo", "1y", "2y", "5y"]}
+                },
+                "required": ["ticker", "period"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "fetch_portfolio_analytics",
+            "description": "Risk and return of a portfolio of several stocks: annualized return and volatility, Sharpe ratio, beta to the S&P 500, one-day value at risk and each holding's risk contribution. Call it when the user describes holdings or asks about diversification or portfolio risk.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "holdings": {
+                        "type": "object",
+                        "description": "Ticker symbol to weight or position value, e.g. {\"AAPL\": 0.6, \"MSFT\": 0.4}",
+                        "additionalProperties": {"type": "number"}
+                    },
+                    "period": {"type": "string", "enum": ["3mo", "6mo", "1y", "2y", "5y"]}
+                },
+                "required": ["holdings", "period"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "screen_stocks",
+            "description": "Find stocks matching fundamentals criteria (price, market cap, P/E, sector, industry) across the screening universe, sorted by a field. Call it for questions like 'which tech stocks have P/E under 20'.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "sector": {"type": "string", "description": "Yahoo sector name, e.g. Technology, Healthcare, Financial Services"},
+                    "industry": {"type": "string"},
+                    "min_pe": {"type": "number"},
+                    "max_pe": {"type": "number"},
+                    "min_market_cap": {"type": "number", "description": "In the quote currency, e.g. 1e10 for $10B"},
+                    "max_market_cap": {"type": "number"},
+                    "min_price": {"type": "number"},
+                    "max_price": {"type": "number"},
+                    "sort_by": {"type": "string", "enum": ["marketCap", "pe_ratio", "price", "ticker"]},
+                    "descending": {"type": "boolean"},
+                    "limit": {"type": "integer", "description": "Maximum results, default 10"}
+                }
+            }
+        }
+    },
+]
+
+SYSTEM_PROMPT = """You are a financial analyst. Work out which stock the user means (company names map to their ticker, e.g. Apple=AAPL, John Deere=DE), fetch the data you need with the tools, then answer.
+Call fetch_stock_data for the quote. Call fetch_historical_data only when the question involves a time period or trend, and fetch_indicators when it concerns momentum, technicals or risk.
+For questions about several holdings together, call fetch_portfolio_analytics once with all of them instead of fetching each stock.
+To find stocks by criteria such as sector, P/E or market cap, call screen_stocks rather than fetching candidates one by one.
+Answer the question directly, then cover key metrics, historical trend if fetched, market position, risks and opportunities, and an investment perspective where relevant. Use specific numbers from the tool results."""
+
+# Completion tokens reserved for the final answer when deciding whether another tool round fits
+ANSWER_TOKENS = 800
+# Smallest final answer worth asking for; the last call may overrun the budget by up to this much
+MIN_ANSWER_TOKENS = 300
+
+
+def summarize_history(response: dict) -> dict:
+    """Compact a columnar historical response to the handful of numbers the model needs"""
+    if "error" in response:
+        return {"error": response["error"]}
+    history = response.get("data", {})
+    closes = [c for c in history.get("data", {}).get("Close", []) if c is not None]
+    if not closes:
+        return {"error": "no historical data"}
+    first, last = closes[0], closes[-1]
+    return {
+        "ticker": history.get("ticker"),
+        "period": history.get("period"),
+        "interval": history.get("interval"),
+        "points": len(closes),
+        "first_close": round(first, 2),
+        "last_close": round(last, 2),
+        "change_pct": round((last - first) / first * 100, 2) if first else None,
+        "high": round(max(closes), 2),
+        "low": round(min(closes), 2),
+    }
+
+
+class ToolCallingPipeline:
+    """Answers a query in one LLM conversation that calls the data tools itself.
+
+    Replaces the extract-then-analyze pair of LLM calls. Token usage is
+    tracked per query against AGENT_TOKEN_BUDGET; once another tool round
+    would not leave room for the answer, the model is asked to answer with
+    what it has.
+    """
+
+    def __init__(self, parser, client, max_rounds: int = None, token_budget: int = None):
+        self.parser = parser
+        self.client = client
+        self.max_rounds = max_rounds if max_rounds is not None else int(os.environ.get("AGENT_MAX_ROUNDS", 4))
+        self.token_budget = token_budget if token_budget is not None else int(os.environ.get("AGENT_TOKEN_BUDGET", 6000))
+
+    def _execute(self, name: str, arguments: str) -> dict:
+        try:
+            args = json.loads(arguments or "{}")
+        except ValueError:
+            return {"error": f"invalid arguments: {arguments}"}
+        if not isinstance(args, dict):
+            return {"error": "arguments must be a JSON object"}
+
+        if name == "fetch_portfolio_analytics":
+            holdings = args.get("holdings")
+            if not holdings or not isinstance(holdings, dict):
+                return {"error": "holdings is required"}
+            holdings = {str(symbol).upper(): weight for symbol, weight in holdings.items()}
+            response = self.client.fetch_portfolio_analytics(holdings, args.get("period", "1y"))
+            if "error" in response:
+                return {"error": response["error"]}
+            # Per-holding detail is the bulk of the payload; keep the numbers the answer needs
+            data = response.get("data", {})
+            data["holdings"] = {
+                symbol: {key: values.get(key) for key in ("weight", "total_return", "volatility", "risk_contribution")}
+                for symbol, values in data.get("holdings", {}).items()
+            }
+            return data
+
+        if name == "screen_stocks":
+            criteria = {key: value for key, value in args.items() if key != "limit"}
+            try:
+                limit = int(args.get("limit") or 10)
+            except (TypeError, ValueError):
+                return {"error": f"limit must be an integer, got {args.get('limit')!r}"}
+            response = self.client.screen_stocks(limit=limit, **criteria)
+            if "error" in response:
+                return {"error": response["error"]}
+            data = response.get("data", {})
+            return {
+                "matches": data.get("matches"),
+                "results": [
+                    {key: row.get(key) for key in ("ticker", "name", "sector", "price", "marketCap", "pe_ratio")}
+                    for row in data.get("results", [])
+                ],
+            }
+
+        ticker = str(args.get("ticker", "")).upper()
+        if not ticker:
+            return {"error": "ticker is required"}
+
+        if name == "fetch_stock_data":
+            response = self.client.fetch_stock_data(ticker, args.get("fields") or None)
+            return {"error": response["error"]} if "error" in response else response.get("data", {})
+        if name == "fetch_historical_data":
+            response = self.client.fetch_historical_data(ticker, args.get("period", "1mo"), format="columnar")
+            return summarize_history(response)
+        if name == "fetch_indicators":
+            response = self.client.fetch_indicators(ticker, args.get("period", "6mo"))
+            return {"error": response["error"]} if "error" in response else response.get("data", {})
+        return {"error": f"unknown tool {name}"}
+
+    def run(self, user_query: str) -> dict:
+        """Run the conversation; returns {answer, tickers, tool_calls, usage, elapsed}"""
+        budget = TokenBudget(self.token_budget)
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_query},
+        ]
+        tool_calls, tickers = [], []
+        answer = None
+        started = time.perf_counter()
+
+        for round_number in range(self.max_rounds):
+            remaining = budget.remaining
+            allow_tools = round_number < self.max_rounds - 1 and remaining > 2 * ANSWER_TOKENS
+            # Without tools this is the final answer; a nearly spent budget must not cut it to a few tokens
+            max_tokens = ANSWER_TOKENS if allow_tools else max(MIN_ANSWER_TOKENS, min(ANSWER_TOKENS, remaining))
+            try:
+                with tracing.span("llm.agent", round=round_number + 1):
+                    result = self.parser.backend.chat(
+                        messages,
+                        max_tokens=max_tokens,
+                        temperature=0.3,
+                        tools=TOOL_DEFINITIONS if allow_tools else None,
+                        tool_choice="auto" if allow_tools else None
+                    )
+            except Exception as e:
+                logger.error(f"LLM error: {e}", exc_info=True)
+                break
+            budget.record(result.usage)
+            self.parser.token_usage.record(result.usage)
+
+            if not result.tool_calls or not allow_tools:
+                answer = (result.content or "").strip() or None
+                break
+
+            messages.append({
+                "role": "assistant",
+                "content": result.content or "",
+                "tool_calls": [
+                    {"id": call.id, "type": "function",
+                     "function": {"name": call.name, "arguments": call.arguments}}
+                    for call in result.tool_calls
+                ],
+            })
+            for call in result.tool_calls:
+                call_started = time.perf_counter()
+                output = self._execute(call.name, call.arguments)
+                tool_calls.append({
+                    "name": call.name,
+                    "arguments": call.arguments,
+                    "seconds": round(time.perf_counter() - call_started, 3),
+                    "error": output.get("error"),
+                })
+                if "error" not in output and output.get("ticker") and output["ticker"] not in tickers:
+                    tickers.append(output["ticker"])
+                messages.append({
+                    "role": "tool",
+                    "tool_call_id": call.id,
+                    "name": call.name,
+                    "content": json.dumps(output, default=str),
+                })
+
+        usage = budget.report()
+        logger.info(
+            "Agent pipeline: %s LLM calls, %s tool calls, %s prompt + %s completion tokens",
+            usage["calls"], len(tool_calls), usage["prompt_tokens"], usage["completion_tokens"]
+        )
+        return {
+            "answer": answer,
+            "tickers": tickers,
+            "tool_calls": tool_calls,
+            "usage": usage,
+            "elapsed": time.perf_counter() - started,
+        }
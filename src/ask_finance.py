@@ -4,7 +4,10 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 import argparse
-from finance_mcp_client import FinanceClient
+import asyncio
+import tracing
+from finance_mcp_client import AsyncFinanceClient, FinanceClient
+from agent_pipeline import ToolCallingPipeline
 
 try:
     from llm_parser import TickerParser
@@ -12,9 +15,42 @@ except ImportError as e:
     print(f"Error: Failed to import TickerParser: {e}")
     sys.exit(1)
 
+def print_token_usage(usage: dict):
+    if usage["calls"]:
+        print(f"🔢 Tokens: {usage['prompt_tokens']} prompt + {usage['completion_tokens']} completion over {usage['calls']} LLM calls")
+
+def print_trace(trace):
+    print(f"\n🔬 Timing breakdown ({trace.elapsed * 1000:.0f} ms total):")
+    for row in trace.rows():
+        details = f"  {row['details']}" if row['details'] else ""
+        print(f"  {row['start_ms']:>8.1f} ms  {row['duration_ms']:>8.1f} ms  {row['stage']}{details}")
+
+def run_agent(llm_parser, query: str):
+    result = ToolCallingPipeline(llm_parser, FinanceClient()).run(query)
+    
+    for call in result["tool_calls"]:
+        status = f"❌ {call['error']}" if call["error"] else "✓"
+        print(f"{status} {call['name']}({call['arguments']}) in {call['seconds']:.2f}s")
+    
+    if not result["answer"]:
+        print("❌ Error: The model did not produce an answer")
+        sys.exit(1)
+    
+    print("\n📊 Analysis:\n")
+    print(result["answer"])
+    print(f"\n⏱ Total {result['elapsed']:.2f}s")
+    print_token_usage(result["usage"])
+
 def main():
     parser = argparse.ArgumentParser(description="Fetch financial data using stock ticker symbols or natural language")
     parser.add_argument("query", help="Stock ticker or natural language query (e.g., 'Get me Tesla data')")
+    parser.add_argument(
+        "--mode",
+        choices=["classic", "agent"],
+        default="classic",
+        help="classic: extract ticker, fetch, then analyze; agent: one LLM conversation that calls the tools itself"
+    )
+    parser.add_argument("--timings", action="store_true", help="Print a per-stage timing breakdown of the query")
     args = parser.parse_args()
 
     if not args.query.strip():
@@ -22,6 +58,14 @@ def main():
         sys.exit(1)
 
     llm_parser = TickerParser()
+    trace = tracing.start_trace(args.query)
+
+    if args.mode == "agent":
+        run_agent(llm_parser, args.query)
+        if args.timings:
+            print_trace(trace)
+        return
+
     ticker, timeframe = llm_parser.extract_ticker_and_timeframe(args.query)
     
     if not ticker:
@@ -33,33 +77,47 @@ def main():
     if timeframe:
         print(f"✓ Extracted timeframe: {timeframe}")
 
-    client = FinanceClient()
+    client = AsyncFinanceClient()
 
     try:
-        data = client.fetch_stock_data(ticker)
+        # Quote, history and indicators are independent, so fetch them concurrently
+        data, hist_response, indicators_response = asyncio.run(client.fetch_analysis_inputs(ticker, timeframe))
         
         if "error" in data:
             print(f"❌ Error: {data.get('error')}")
             sys.exit(1)
         
         historical_data = None
-        if timeframe:
-            hist_response = client.fetch_historical_data(ticker, timeframe)
-            if "error" not in hist_response:
-                historical_data = hist_response.get('data', {})
+        if hist_response and "error" not in hist_response:
+            historical_data = hist_response.get('data', {})
+        
+        indicators = None
+        if indicators_response and "error" not in indicators_response:
+            indicators = indicators_response.get('data', {})
         
         print("\n✓ Financial data retrieved successfully.\n")
         
-        summary = llm_parser.generate_analysis_summary(
+        print("📊 Analysis:\n")
+        received = False
+        for chunk in llm_parser.stream_analysis_summary(
             ticker, 
             data.get('data', {}), 
             user_query=args.query,
-            historical_data=historical_data
-        )
+            historical_data=historical_data,
+            indicators=indicators
+        ):
+            received = True
+            print(chunk, end="", flush=True)
+        print()
         
-        if summary:
-            print("📊 Analysis:\n")
-            print(summary)
+        timing = llm_parser.last_stream_timing
+        if received and timing and timing.get("cached"):
+            print("\n⚡ Served from the analysis cache")
+        elif received and timing and timing.get("time_to_first_token") is not None:
+            print(f"\n⏱ First token {timing['time_to_first_token']:.2f}s · total {timing['total']:.2f}s")
+        print_token_usage(llm_parser.token_usage.report())
+        if args.timings:
+            print_trace(trace)
         
     except Exception as e:
         print(f"❌ Error: {e}")
@@ -1 +1,2 @@
-from .yahoo_finance import YahooFinanceFetcher
\ No newline at end of file
+from .yahoo_finance import YahooFinanceFetcher
+from .quote_cache import QuoteCache
\ No newline at end of file
@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BAR_STORE_PATH = os.path.join(os.path.expanduser("~"), ".financehub", "bars.db")
+
+# yfinance column name -> SQLite column name
+COLUMNS = {
+    "Open": "open",
+    "High": "high",
+    "Low": "low",
+    "Close": "close",
+    "Volume": "volume",
+    "Dividends": "dividends",
+    "Stock Splits": "splits",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bars (
+    ticker TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    open REAL, high REAL, low REAL, close REAL,
+    volume REAL, dividends REAL, splits REAL,
+    PRIMARY KEY (ticker, interval, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS series (
+    ticker TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    tz TEXT,
+    start_ts INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (ticker, interval)
+);
+CREATE TABLE IF NOT EXISTS indicators (
+    ticker TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    period TEXT NOT NULL,
+    version TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (ticker, interval, period)
+);
+CREATE TABLE IF NOT EXISTS indicator_state (
+    ticker TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    last_ts INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (ticker, interval)
+);
+"""
+
+
+class BarStore:
+    """Persistent per-ticker/interval OHLCV bars backed by a local SQLite file.
+
+    A series row records the earliest start the stored bars are complete
+    from, so readers know whether a period can be served locally and only
+    the tail after the last stored bar needs to be downloaded.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def coverage(self, ticker: str, interval: str) -> dict:
+        """Return {start_ts, last_ts, tz, updated_at} for a stored series, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT s.start_ts, s.tz, s.updated_at, MAX(b.ts) FROM series s "
+                "LEFT JOIN bars b ON b.ticker = s.ticker AND b.interval = s.interval "
+                "WHERE s.ticker = ? AND s.interval = ? GROUP BY s.ticker",
+                (ticker, interval)
+            ).fetchone()
+        if row is None or row[3] is None:
+            return None
+        return {"start_ts": row[0], "tz": row[1], "updated_at": row[2], "last_ts": row[3]}
+
+    def read(self, ticker: str, interval: str, start_ts: int = None):
+        """Load stored bars as a yfinance-shaped DataFrame indexed by Date"""
+        query = f"SELECT ts, {', '.join(COLUMNS.values())} FROM bars WHERE ticker = ? AND interval = ?"
+        params = [ticker, interval]
+        if start_ts is not None:
+            query += " AND ts >= ?"
+            params.append(int(start_ts))
+        query += " ORDER BY ts"
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+            tz_row = self._conn.execute(
+                "SELECT tz FROM series WHERE ticker = ? AND interval = ?", (ticker, interval)
+            ).fetchone()
+
+        frame = pd.DataFrame(rows, columns=["ts"] + list(COLUMNS.keys()))
+        frame["Volume"] = frame["Volume"].fillna(0).astype("int64")
+        index = pd.to_datetime(frame.pop("ts"), unit="s", utc=True)
+        tz = tz_row[0] if tz_row else None
+        index = index.dt.tz_convert(tz) if tz else index.dt.tz_localize(None)
+        frame.index = pd.DatetimeIndex(index, name="Date")
+        return frame
+
+    def write(self, ticker: str, interval: str, hist, start_ts: int = None):
+        """Upsert bars from a yfinance history frame.
+
+        start_ts widens the recorded coverage; pass it only when hist is
+        the complete history from that point onwards.
+        """
+        if hist is None or hist.empty:
+            return
+        index = hist.index
+        tz = str(index.tz) if index.tz is not None else None
+        utc_index = index.tz_convert("UTC") if index.tz is not None else index.tz_localize("UTC")
+        timestamps = (utc_index - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(seconds=1)
+
+        # SQLite stores NaN as NULL, so missing values round-trip without special handling
+        frame = hist.reindex(columns=list(COLUMNS.keys())).astype(float)
+        rows = [
+            (ticker, interval, int(ts), *values)
+            for ts, values in zip(timestamps, frame.itertuples(index=False, name=None))
+        ]
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO bars (ticker, interval, ts, {', '.join(COLUMNS.values())}) "
+                f"VALUES (?, ?, ?, {', '.join('?' * len(COLUMNS))})",
+                rows
+            )
+            existing = self._conn.execute(
+                "SELECT start_ts, tz FROM series WHERE ticker = ? AND interval = ?", (ticker, interval)
+            ).fetchone()
+            if existing is None and start_ts is None:
+                # Bars without a known complete start; cover only what we were given
+                start_ts = int(timestamps[0])
+            if existing is not None:
+                start_ts = min(existing[0], start_ts) if start_ts is not None else existing[0]
+                # Keep the exchange timezone from the first write; multi-symbol downloads may be in UTC
+                tz = existing[1] or tz
+            self._conn.execute(
+                "INSERT OR REPLACE INTO series (ticker, interval, tz, start_ts, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (ticker, interval, tz, int(start_ts), time.time())
+            )
+        logger.debug("Stored %s %s bars for %s", len(rows), interval, ticker)
+
+    def read_indicators(self, ticker: str, interval: str, period: str, version: str):
+        """Cached indicator payload computed from exactly the bars identified by version, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM indicators WHERE ticker = ? AND interval = ? AND period = ? AND version = ?",
+                (ticker, interval, period, version)
+            ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def write_indicators(self, ticker: str, interval: str, period: str, version: str, payload: dict):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO indicators (ticker, interval, period, version, payload, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (ticker, interval, period, version, json.dumps(payload), time.time())
+            )
+
+    def read_indicator_state(self, ticker: str, interval: str):
+        """Serialized IndicatorState for a series, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state FROM indicator_state WHERE ticker = ? AND interval = ?", (ticker, interval)
+            ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def write_indicator_state(self, ticker: str, interval: str, state: dict):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO indicator_state (ticker, interval, last_ts, state, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (ticker, interval, state["last_ts"], json.dumps(state), time.time())
+            )
+
+    def clear(self, ticker: str, interval: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM bars WHERE ticker = ? AND interval = ?", (ticker, interval))
+            self._conn.execute("DELETE FROM series WHERE ticker = ? AND interval = ?", (ticker, interval))
+            # Indicators at every interval are derived from these bars
+            self._conn.execute("DELETE FROM indicators WHERE ticker = ?", (ticker,))
+            self._conn.execute("DELETE FROM indicator_state WHERE ticker = ?", (ticker,))
+
+    def touch(self, ticker: str, interval: str):
+        """Mark a series as freshly checked against upstream without new bars"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE series SET updated_at = ? WHERE ticker = ? AND interval = ?",
+                (time.time(), ticker, interval)
+            )
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_bar_store():
+    """Return the process-wide BarStore, or None when BAR_STORE_PATH is set empty"""
+    global _default_store
+    path = os.environ.get("BAR_STORE_PATH", DEFAULT_BAR_STORE_PATH)
+    if not path:
+        return None
+    with _default_store_lock:
+        if _default_store is None or _default_store.path != path:
+            try:
+                _default_store = BarStore(path)
+            except (OSError, sqlite3.Error) as e:
+                logger.error("Failed to open bar store at %s: %s", path, e)
+                return None
+        return _default_store
@@ -0,0 +1,362 @@
+import copy
+import math
+from collections import deque
+import numpy as np
+import pandas as pd
+
+# Indicator parameters; names in the output embed the window (sma_20, rsi_14, ...)
+SMA_WINDOWS = (20, 50, 200)
+EMA_SPANS = (12, 26)
+RSI_PERIOD = 14
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+BOLLINGER_WINDOW, BOLLINGER_STD = 20, 2.0
+VOLATILITY_WINDOW = 20
+
+# Bars per year used to annualize volatility
+PERIODS_PER_YEAR = {"1d": 252, "1wk": 52, "1mo": 12}
+
+
+def sma(close: pd.Series, window: int) -> pd.Series:
+    return close.rolling(window, min_periods=window).mean()
+
+
+def ema(close: pd.Series, span: int) -> pd.Series:
+    # adjust=False gives the recursive EMA used by charting platforms, seeded with the first close
+    return close.ewm(span=span, adjust=False, min_periods=span).mean()
+
+
+def rsi(close: pd.Series, period: int = RSI_PERIOD) -> pd.Series:
+    """Wilder's RSI: gains and losses smoothed with alpha = 1/period"""
+    delta = close.diff()
+    gain = delta.clip(lower=0).ewm(alpha=1 / period, adjust=False, min_periods=period).mean()
+    loss = (-delta.clip(upper=0)).ewm(alpha=1 / period, adjust=False, min_periods=period).mean()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = 100 - 100 / (1 + gain / loss)
+    # No losses in the window means RSI 100
+    return values.where(loss != 0, 100.0).where(gain.notna())
+
+
+def macd(close: pd.Series, fast: int = MACD_FAST, slow: int = MACD_SLOW, signal: int = MACD_SIGNAL) -> pd.DataFrame:
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = line.ewm(span=signal, adjust=False, min_periods=signal).mean()
+    return pd.DataFrame({"macd": line, "macd_signal": signal_line, "macd_hist": line - signal_line})
+
+
+def bollinger(close: pd.Series, window: int = BOLLINGER_WINDOW, num_std: float = BOLLINGER_STD) -> pd.DataFrame:
+    middle = sma(close, window)
+    std = close.rolling(window, min_periods=window).std(ddof=0)
+    upper, lower = middle + num_std * std, middle - num_std * std
+    return pd.DataFrame({
+        "bb_upper": upper,
+        "bb_middle": middle,
+        "bb_lower": lower,
+        "bb_percent_b": (close - lower) / (upper - lower),
+    })
+
+
+def log_returns(close: pd.Series) -> pd.Series:
+    return np.log(close / close.shift(1))
+
+
+def realized_volatility(close: pd.Series, window: int = VOLATILITY_WINDOW, periods_per_year: int = 252) -> pd.Series:
+    """Rolling annualized standard deviation of log returns"""
+    return log_returns(close).rolling(window, min_periods=window).std() * math.sqrt(periods_per_year)
+
+
+def drawdown(close: pd.Series) -> pd.Series:
+    """Fractional distance below the running peak (0 at a new high)"""
+    return close / close.cummax() - 1
+
+
+def max_drawdown(close: pd.Series) -> dict:
+    """Largest peak-to-trough decline as {max_drawdown_pct, peak, trough} (timestamps of the bars)"""
+    close = close.dropna()
+    if close.empty:
+        return {"max_drawdown_pct": None, "peak": None, "trough": None}
+    dd = drawdown(close)
+    trough = dd.idxmin()
+    peak = close.loc[:trough].idxmax()
+    return {"max_drawdown_pct": float(dd.loc[trough] * 100), "peak": peak, "trough": trough}
+
+
+def vwap(hist: pd.DataFrame) -> pd.Series:
+    """Volume-weighted average of the typical price, anchored at the first bar"""
+    typical = (hist["High"] + hist["Low"] + hist["Close"]) / 3
+    volume = hist["Volume"].astype(float)
+    cumulative_volume = volume.cumsum()
+    return (typical * volume).cumsum() / cumulative_volume.where(cumulative_volume > 0)
+
+
+def compute_indicators(hist: pd.DataFrame, interval: str = "1d") -> pd.DataFrame:
+    """Every indicator as a column aligned to hist's index, computed column-wise over the whole frame"""
+    close = hist["Close"].astype(float)
+    columns = {"close": close}
+    for window in SMA_WINDOWS:
+        columns[f"sma_{window}"] = sma(close, window)
+    for span in EMA_SPANS:
+        columns[f"ema_{span}"] = ema(close, span)
+    columns[f"rsi_{RSI_PERIOD}"] = rsi(close)
+    columns["volatility"] = realized_volatility(close, periods_per_year=PERIODS_PER_YEAR.get(interval, 252))
+    frame = pd.DataFrame(columns, index=hist.index)
+    return pd.concat([frame, macd(close), bollinger(close)], axis=1)
+
+
+def _clean(value):
+    if value is None:
+        return None
+    value = float(value)
+    return round(value, 4) if math.isfinite(value) else None
+
+
+def epoch_seconds(timestamp):
+    if timestamp is None:
+        return None
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tz is None:
+        timestamp = timestamp.tz_localize("UTC")
+    return int(timestamp.timestamp())
+
+
+def period_stats(hist: pd.DataFrame, interval: str = "1d") -> dict:
+    """Whole-period figures: change, annualized volatility, max drawdown, VWAP and range"""
+    close = hist["Close"].astype(float).dropna()
+    if close.empty:
+        return {}
+    returns = log_returns(close).dropna()
+    drawdown_info = max_drawdown(close)
+    volatility = returns.std() * math.sqrt(PERIODS_PER_YEAR.get(interval, 252)) if len(returns) > 1 else None
+    anchored_vwap = vwap(hist).dropna()
+    first, last = close.iloc[0], close.iloc[-1]
+    return {
+        "first_close": _clean(first),
+        "last_close": _clean(last),
+        "change_pct": _clean((last - first) / first * 100) if first else None,
+        "high": _clean(hist["High"].max()),
+        "low": _clean(hist["Low"].min()),
+        "volatility": _clean(volatility),
+        "max_drawdown_pct": _clean(drawdown_info["max_drawdown_pct"]),
+        "max_drawdown_peak": epoch_seconds(drawdown_info["peak"]),
+        "max_drawdown_trough": epoch_seconds(drawdown_info["trough"]),
+        "vwap": _clean(anchored_vwap.iloc[-1]) if not anchored_vwap.empty else None,
+    }
+
+
+def latest_values(indicators: pd.DataFrame) -> dict:
+    """Last row of compute_indicators as a JSON-safe dict"""
+    if indicators.empty:
+        return {}
+    row = indicators.iloc[-1]
+    return {column: _clean(row[column]) for column in indicators.columns}
+
+
+def to_columnar(frame: pd.DataFrame) -> dict:
+    """Columnar wire format matching fetch_historical_data(format="columnar")"""
+    index = frame.index
+    utc_index = index.tz_convert("UTC") if index.tz is not None else index.tz_localize("UTC")
+    data = {"Date": ((utc_index - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(seconds=1)).tolist()}
+    for column in frame.columns:
+        values = frame[column].astype(float).round(4)
+        data[column] = values.astype(object).where(np.isfinite(values), None).tolist()
+    return {
+        "format": "columnar",
+        "timezone": str(index.tz) if index.tz is not None else None,
+        "columns": list(data.keys()),
+        "data": data,
+    }
+
+
+class IndicatorState:
+    """Online indicator state so each new bar updates the latest values in O(1).
+
+    Holds running sums for the moving averages and Bollinger bands, the
+    recursive EMA/MACD values, Wilder's smoothed gain/loss for RSI and the
+    last VOLATILITY_WINDOW log returns. Values match compute_indicators for
+    the same bars, given the same first bar (EMAs are seeded with it).
+    """
+
+    def __init__(self, interval: str = "1d"):
+        self.interval = interval
+        self.anchor_ts = None
+        self.last_ts = None
+        self.count = 0
+        self.closes = deque(maxlen=max(SMA_WINDOWS))
+        self.sums = {window: 0.0 for window in SMA_WINDOWS}
+        self.sum_squares = 0.0  # over the last BOLLINGER_WINDOW closes
+        self.emas = {span: None for span in (*EMA_SPANS, MACD_FAST, MACD_SLOW)}
+        self.macd_signal = None
+        self.macd_count = 0
+        self.avg_gain = None
+        self.avg_loss = None
+        self.returns = deque(maxlen=VOLATILITY_WINDOW)
+        self.return_sum = 0.0
+        self.return_sum_squares = 0.0
+
+    @classmethod
+    def from_closes(cls, closes: pd.Series, interval: str = "1d") -> "IndicatorState":
+        """Seed the state from a full close series with vectorized pandas operations"""
+        closes = closes.dropna().astype(float)
+        state = cls(interval)
+        if closes.empty:
+            return state
+        values = closes.to_numpy()
+        timestamps = [epoch_seconds(ts) for ts in (closes.index[0], closes.index[-1])]
+        state.anchor_ts, state.last_ts = timestamps
+        state.count = len(values)
+        state.closes.extend(values[-state.closes.maxlen:])
+        for window in SMA_WINDOWS:
+            state.sums[window] = float(values[-window:].sum())
+        state.sum_squares = float((values[-BOLLINGER_WINDOW:] ** 2).sum())
+
+        full_emas = {span: closes.ewm(span=span, adjust=False).mean() for span in state.emas}
+        state.emas = {span: float(series.iloc[-1]) for span, series in full_emas.items()}
+        if state.count >= MACD_SLOW:
+            line = (full_emas[MACD_FAST] - full_emas[MACD_SLOW]).iloc[MACD_SLOW - 1:]
+            state.macd_signal = float(line.ewm(span=MACD_SIGNAL, adjust=False).mean().iloc[-1])
+            state.macd_count = len(line)
+
+        if state.count > 1:
+            delta = closes.diff()
+            state.avg_gain = float(delta.clip(lower=0).ewm(alpha=1 / RSI_PERIOD, adjust=False).mean().iloc[-1])
+            state.avg_loss = float((-delta.clip(upper=0)).ewm(alpha=1 / RSI_PERIOD, adjust=False).mean().iloc[-1])
+            returns = np.log(values[1:] / values[:-1])[-VOLATILITY_WINDOW:]
+            state.returns.extend(returns)
+            state.return_sum = float(returns.sum())
+            state.return_sum_squares = float((returns ** 2).sum())
+        return state
+
+    def update(self, ts: int, close: float):
+        """Append one completed bar"""
+        close = float(close)
+        if self.count:
+            previous = self.closes[-1]
+            delta = close - previous
+            gain, loss = max(delta, 0.0), max(-delta, 0.0)
+            if self.avg_gain is None:
+                self.avg_gain, self.avg_loss = gain, loss
+            else:
+                self.avg_gain += (gain - self.avg_gain) / RSI_PERIOD
+                self.avg_loss += (loss - self.avg_loss) / RSI_PERIOD
+
+            log_return = math.log(close / previous)
+            if len(self.returns) == self.returns.maxlen:
+                dropped = self.returns[0]
+                self.return_sum -= dropped
+                self.return_sum_squares -= dropped * dropped
+            self.returns.append(log_return)
+            self.return_sum += log_return
+            self.return_sum_squares += log_return * log_return
+
+        # Running sums: add the new close, subtract the one leaving each window
+        for window in SMA_WINDOWS:
+            if len(self.closes) >= window:
+                self.sums[window] -= self.closes[-window]
+            self.sums[window] += close
+        if len(self.closes) >= BOLLINGER_WINDOW:
+            self.sum_squares -= self.closes[-BOLLINGER_WINDOW] ** 2
+        self.sum_squares += close * close
+        self.closes.append(close)
+
+        for span, value in self.emas.items():
+            self.emas[span] = close if value is None else value + 2 / (span + 1) * (close - value)
+
+        self.count += 1
+        if self.count >= MACD_SLOW:
+            line = self.emas[MACD_FAST] - self.emas[MACD_SLOW]
+            if self.macd_signal is None:
+                self.macd_signal = line
+            else:
+                self.macd_signal += 2 / (MACD_SIGNAL + 1) * (line - self.macd_signal)
+            self.macd_count += 1
+
+        if self.anchor_ts is None:
+            self.anchor_ts = ts
+        self.last_ts = ts
+
+    def peek(self, ts: int, close: float) -> dict:
+        """Latest values as if a (possibly still forming) bar were appended, without committing it"""
+        state = copy.deepcopy(self)
+        state.update(ts, close)
+        return state.values()
+
+    def values(self) -> dict:
+        """Current indicator values, keyed like latest_values()"""
+        if not self.count:
+            return {}
+        close = self.closes[-1]
+        result = {"close": close}
+        for window in SMA_WINDOWS:
+            result[f"sma_{window}"] = self.sums[window] / window if self.count >= window else None
+        for span in EMA_SPANS:
+            result[f"ema_{span}"] = self.emas[span] if self.count >= span else None
+
+        rsi_value = None
+        if self.count > RSI_PERIOD:
+            rsi_value = 100.0 if self.avg_loss == 0 else 100 - 100 / (1 + self.avg_gain / self.avg_loss)
+        result[f"rsi_{RSI_PERIOD}"] = rsi_value
+
+        volatility = None
+        if len(self.returns) == VOLATILITY_WINDOW:
+            n = VOLATILITY_WINDOW
+            variance = (self.return_sum_squares - self.return_sum ** 2 / n) / (n - 1)
+            volatility = math.sqrt(max(variance, 0.0)) * math.sqrt(PERIODS_PER_YEAR.get(self.interval, 252))
+        result["volatility"] = volatility
+
+        line = self.emas[MACD_FAST] - self.emas[MACD_SLOW] if self.count >= MACD_SLOW else None
+        signal = self.macd_signal if self.macd_count >= MACD_SIGNAL else None
+        result.update({
+            "macd": line,
+            "macd_signal": signal,
+            "macd_hist": line - signal if line is not None and signal is not None else None,
+        })
+
+        bands = dict.fromkeys(("bb_upper", "bb_middle", "bb_lower", "bb_percent_b"))
+        if self.count >= BOLLINGER_WINDOW:
+            middle = self.sums[BOLLINGER_WINDOW] / BOLLINGER_WINDOW
+            std = math.sqrt(max(self.sum_squares / BOLLINGER_WINDOW - middle * middle, 0.0))
+            upper, lower = middle + BOLLINGER_STD * std, middle - BOLLINGER_STD * std
+            bands.update({
+                "bb_upper": upper,
+                "bb_middle": middle,
+                "bb_lower": lower,
+                "bb_percent_b": (close - lower) / (upper - lower) if upper != lower else None,
+            })
+        result.update(bands)
+        return {key: _clean(value) for key, value in result.items()}
+
+    def to_dict(self) -> dict:
+        return {
+            "interval": self.interval,
+            "anchor_ts": self.anchor_ts,
+            "last_ts": self.last_ts,
+            "count": self.count,
+            "closes": list(self.closes),
+            "sums": {str(window): value for window, value in self.sums.items()},
+            "sum_squares": self.sum_squares,
+            "emas": {str(span): value for span, value in self.emas.items()},
+            "macd_signal": self.macd_signal,
+            "macd_count": self.macd_count,
+            "avg_gain": self.avg_gain,
+            "avg_loss": self.avg_loss,
+            "returns": list(self.returns),
+            "return_sum": self.return_sum,
+            "return_sum_squares": self.return_sum_squares,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "IndicatorState":
+        state = cls(data["interval"])
+        state.anchor_ts = data["anchor_ts"]
+        state.last_ts = data["last_ts"]
+        state.count = data["count"]
+        state.closes.extend(data["closes"])
+        state.sums = {int(window): value for window, value in data["sums"].items()}
+        state.sum_squares = data["sum_squares"]
+        state.emas = {int(span): value for span, value in data["emas"].items()}
+        state.macd_signal = data["macd_signal"]
+        state.macd_count = data["macd_count"]
+        state.avg_gain = data["avg_gain"]
+        state.avg_loss = data["avg_loss"]
+        state.returns.extend(data["returns"])
+        state.return_sum = data["return_sum"]
+        state.return_sum_squares = data["return_sum_squares"]
+        return state
@@ -0,0 +1,244 @@
+"""Offline stand-in for the parts of yfinance YahooFinanceFetcher uses.
+
+Selected with MARKET_DATA_PROVIDER=offline. Tickers recorded into
+OFFLINE_DATA_DIR (see benchmarks/record_market_data.py) are replayed from
+<TICKER>.json (the info blob, which also backs fast_info) and <TICKER>.csv (daily bars); any other
+ticker gets deterministic synthetic data seeded by its symbol, so runs are
+reproducible without network access. OFFLINE_LATENCY_MS and
+OFFLINE_JITTER_MS add simulated per-request latency.
+"""
+import os
+import json
+import time
+import zlib
+import random
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from .resample import resample_bars
+
+OFFLINE_LATENCY = float(os.environ.get("OFFLINE_LATENCY_MS", 0)) / 1000
+OFFLINE_JITTER = float(os.environ.get("OFFLINE_JITTER_MS", 0)) / 1000
+
+# Years of synthetic daily bars generated per ticker
+SYNTHETIC_YEARS = 12
+TIMEZONE = "America/New_York"
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume", "Dividends", "Stock Splits"]
+
+# yfinance period -> calendar days
+PERIOD_DAYS = {
+    "1d": 1, "5d": 5, "1mo": 30, "3mo": 91, "6mo": 182,
+    "1y": 365, "2y": 730, "5y": 1826, "10y": 3652,
+}
+
+SECTORS = {
+    "Technology": ["Software—Infrastructure", "Semiconductors", "Consumer Electronics"],
+    "Healthcare": ["Drug Manufacturers—General", "Medical Devices"],
+    "Financial Services": ["Banks—Diversified", "Credit Services", "Asset Management"],
+    "Energy": ["Oil & Gas Integrated"],
+    "Consumer Cyclical": ["Internet Retail", "Auto Manufacturers", "Restaurants"],
+    "Industrials": ["Aerospace & Defense", "Farm & Heavy Construction Machinery"],
+}
+
+
+def _simulate_latency():
+    delay = OFFLINE_LATENCY + (random.uniform(0, OFFLINE_JITTER) if OFFLINE_JITTER else 0)
+    if delay > 0:
+        time.sleep(delay)
+
+
+def _seed(ticker: str) -> int:
+    # crc32 rather than hash() so data is identical across processes
+    return zlib.crc32(ticker.encode())
+
+
+def _data_dir() -> str:
+    return os.environ.get("OFFLINE_DATA_DIR", "")
+
+
+def _recorded_path(ticker: str, suffix: str) -> str:
+    directory = _data_dir()
+    path = os.path.join(directory, f"{ticker}{suffix}") if directory else ""
+    return path if path and os.path.exists(path) else None
+
+
+@lru_cache(maxsize=1024)
+def _daily_bars(ticker: str, today: str) -> pd.DataFrame:
+    """Full daily history for ticker, recorded if available; today keys the cache so new days appear"""
+    path = _recorded_path(ticker, ".csv")
+    if path:
+        info_path = _recorded_path(ticker, ".json")
+        tz = TIMEZONE
+        if info_path:
+            with open(info_path) as f:
+                tz = json.load(f).get("exchangeTimezoneName") or TIMEZONE
+        frame = pd.read_csv(path, index_col="Date")
+        frame.index = pd.DatetimeIndex(pd.to_datetime(frame.index, utc=True).tz_convert(tz), name="Date")
+        return frame.reindex(columns=OHLCV_COLUMNS).fillna({"Dividends": 0.0, "Stock Splits": 0.0})
+
+    rng = np.random.default_rng(_seed(ticker))
+    end = pd.Timestamp(today, tz=TIMEZONE)
+    index = pd.bdate_range(end=end, periods=SYNTHETIC_YEARS * 252, tz=TIMEZONE, name="Date")
+    n = len(index)
+
+    # Geometric random walk with a per-ticker drift and volatility
+    volatility = rng.uniform(0.01, 0.03)
+    returns = rng.normal(rng.uniform(-0.0002, 0.0008), volatility, n)
+    close = rng.uniform(10, 400) * np.exp(np.cumsum(returns))
+    open_ = np.concatenate([[close[0]], close[:-1]]) * (1 + rng.normal(0, volatility / 4, n))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, volatility / 2, n)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, volatility / 2, n)))
+    volume = rng.lognormal(15, 0.5, n).astype("int64")
+    return pd.DataFrame({
+        "Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume,
+        "Dividends": 0.0, "Stock Splits": 0.0,
+    }, index=index)
+
+
+def _bars(ticker: str) -> pd.DataFrame:
+    return _daily_bars(ticker.upper(), pd.Timestamp.now(tz=TIMEZONE).strftime("%Y-%m-%d"))
+
+
+def _timestamp(value, tz) -> pd.Timestamp:
+    value = pd.Timestamp(value)
+    return value.tz_localize(tz) if value.tz is None else value.tz_convert(tz)
+
+
+def _slice(bars: pd.DataFrame, period: str = None, start=None, end=None) -> pd.DataFrame:
+    tz = bars.index.tz
+    if start is not None:
+        bars = bars[bars.index >= _timestamp(start, tz)]
+    elif period == "ytd":
+        bars = bars[bars.index.year == bars.index[-1].year]
+    elif period in PERIOD_DAYS:
+        bars = bars[bars.index > bars.index[-1] - pd.Timedelta(days=PERIOD_DAYS[period])]
+    elif period not in (None, "max"):
+        raise ValueError(f"Invalid period '{period}'")
+    if end is not None:
+        bars = bars[bars.index < _timestamp(end, tz)]
+    return bars
+
+
+def _history(ticker: str, period: str = "1mo", interval: str = "1d", start=None, end=None) -> pd.DataFrame:
+    bars = _slice(_bars(ticker), None if start is not None else period, start, end)
+    return resample_bars(bars.copy(), interval)
+
+
+class FastInfo:
+    """yfinance FastInfo look-alike with the quote attributes YahooFinanceFetcher reads"""
+
+    def __init__(self, info: dict):
+        self.last_price = info.get("regularMarketPrice") or info.get("currentPrice")
+        self.previous_close = info.get("previousClose")
+        self.currency = info.get("currency")
+        self.shares = info.get("sharesOutstanding")
+
+    @property
+    def market_cap(self):
+        return self.last_price * self.shares if self.last_price and self.shares else None
+
+
+class Ticker:
+    """yfinance.Ticker look-alike; every property access is a simulated upstream request"""
+
+    def __init__(self, ticker: str):
+        self.ticker = ticker.upper()
+
+    @property
+    def info(self) -> dict:
+        _simulate_latency()
+        return self._info()
+
+    @property
+    def fast_info(self) -> "FastInfo":
+        _simulate_latency()
+        return FastInfo(self._info())
+
+    def _info(self) -> dict:
+        path = _recorded_path(self.ticker, ".json")
+        if path:
+            with open(path) as f:
+                return json.load(f)
+        return self._synthetic_info()
+
+    def _synthetic_info(self) -> dict:
+        rng = random.Random(_seed(self.ticker))
+        bars = _bars(self.ticker)
+        price = round(float(bars["Close"].iloc[-1]), 2)
+        sector = rng.choice(sorted(SECTORS))
+        shares = rng.randint(50, 20_000) * 1_000_000
+        eps = round(price / rng.uniform(8, 60), 2) if rng.random() > 0.1 else round(-rng.uniform(0.1, 5), 2)
+        year = bars["Close"].iloc[-252:]
+        info = {
+            "symbol": self.ticker,
+            "quoteType": "EQUITY",
+            "exchange": "NMS",
+            "currency": "USD",
+            "longName": f"{self.ticker.title()} Holdings Inc.",
+            "shortName": f"{self.ticker.title()} Holdings",
+            "sector": sector,
+            "industry": rng.choice(SECTORS[sector]),
+            "longBusinessSummary": f"{self.ticker.title()} Holdings Inc. is a synthetic company generated for offline benchmarks.",
+            "currentPrice": price,
+            "regularMarketPrice": price,
+            "previousClose": round(float(bars["Close"].iloc[-2]), 2),
+            "sharesOutstanding": shares,
+            "marketCap": int(price * shares),
+            "trailingEps": eps,
+            "fiftyTwoWeekHigh": round(float(year.max()), 2),
+            "fiftyTwoWeekLow": round(float(year.min()), 2),
+            "averageVolume": int(bars["Volume"].iloc[-63:].mean()),
+        }
+        if eps > 0:
+            # Yahoo omits trailingPE for loss-making companies
+            info["trailingPE"] = round(price / eps, 2)
+        return info
+
+    def history(self, period: str = "1mo", interval: str = "1d", start=None, end=None, **kwargs) -> pd.DataFrame:
+        _simulate_latency()
+        return _history(self.ticker, period, interval, start, end)
+
+    @property
+    def financials(self) -> pd.DataFrame:
+        _simulate_latency()
+        rng = np.random.default_rng(_seed(self.ticker))
+        year_ends = pd.to_datetime([f"{pd.Timestamp.now().year - n}-12-31" for n in range(1, 5)])
+        revenue = rng.uniform(1e9, 4e11) * np.cumprod(rng.uniform(0.9, 1.2, 4))
+        net_income = revenue * rng.uniform(-0.05, 0.3, 4)
+        return pd.DataFrame(
+            [revenue, revenue * rng.uniform(0.3, 0.7), net_income],
+            index=["Total Revenue", "Gross Profit", "Net Income"],
+            columns=year_ends,
+        )
+
+
+def download(tickers, period: str = "1mo", interval: str = "1d", start=None, end=None,
+             group_by: str = "column", **kwargs) -> pd.DataFrame:
+    """yfinance.download look-alike: one simulated request for all tickers, wide frame grouped by ticker"""
+    _simulate_latency()
+    if isinstance(tickers, str):
+        tickers = tickers.replace(",", " ").split()
+    frames = {ticker: _history(ticker, period, interval, start, end) for ticker in tickers}
+    frame = pd.concat(frames, axis=1)
+    if group_by != "ticker":
+        frame = frame.swaplevel(axis=1).sort_index(axis=1)
+    return frame
+
+
+def record(tickers: list, directory: str, period: str = "10y") -> dict:
+    """Capture live info blobs and daily bars from yfinance for later offline replay"""
+    import yfinance
+
+    os.makedirs(directory, exist_ok=True)
+    saved = {}
+    for ticker in tickers:
+        ticker = ticker.upper()
+        stock = yfinance.Ticker(ticker)
+        hist = stock.history(period=period, interval="1d")
+        with open(os.path.join(directory, f"{ticker}.json"), "w") as f:
+            json.dump(stock.info, f, default=str)
+        hist.to_csv(os.path.join(directory, f"{ticker}.csv"), index_label="Date")
+        saved[ticker] = len(hist)
+    return saved
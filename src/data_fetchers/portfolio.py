@@ -0,0 +1,141 @@
+import math
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS = 252
+
+
+def normalize_weights(holdings: dict) -> dict:
+    """Scale weights (or position values) to sum to 1; negative weights are short positions"""
+    total = sum(holdings.values())
+    if not total:
+        raise ValueError("holding weights must not sum to zero")
+    return {ticker: weight / total for ticker, weight in holdings.items()}
+
+
+def align_closes(closes: dict, min_observations: int = 20):
+    """Join per-ticker close series on calendar date.
+
+    Exchanges in different time zones and holiday calendars are aligned by
+    local date, gaps are forward-filled and leading rows before every series
+    has started are dropped. Returns (frame, dropped) where dropped maps
+    tickers without enough overlapping data to a reason.
+    """
+    series, dropped = {}, {}
+    for ticker, close in closes.items():
+        close = close.dropna()
+        if close.empty:
+            dropped[ticker] = "no price history"
+            continue
+        index = close.index.tz_localize(None) if close.index.tz is not None else close.index
+        series[ticker] = pd.Series(close.to_numpy(dtype=float), index=index.normalize())
+    if not series:
+        return pd.DataFrame(), dropped
+
+    frame = pd.DataFrame(series).sort_index()
+    frame = frame[~frame.index.duplicated(keep="last")]
+    # Count real prices before forward-filling so stale series are not padded into looking complete
+    counts = frame.notna().sum()
+    short = list(counts[counts < min_observations + 1].index)
+    for ticker in short:
+        dropped[ticker] = f"fewer than {min_observations + 1} prices in the period"
+    return frame.drop(columns=short).ffill().dropna(), dropped
+
+
+def _round(value, digits: int = 6):
+    if value is None:
+        return None
+    value = float(value)
+    return round(value, digits) if math.isfinite(value) else None
+
+
+def portfolio_analytics(prices: pd.DataFrame, weights: dict, benchmark: pd.Series = None,
+                        confidence: float = 0.95, include_matrices: bool = False) -> dict:
+    """Risk and return of a weighted portfolio from aligned daily closes, using matrix operations throughout.
+
+    prices has one column per holding; benchmark is an optional close
+    series aligned to the same dates. Volatilities, covariance and returns
+    are annualized over TRADING_DAYS.
+    """
+    tickers = list(prices.columns)
+    w = np.array([weights[ticker] for ticker in tickers])
+    values = prices.to_numpy(dtype=float)
+    returns = values[1:] / values[:-1] - 1  # T x N simple returns
+    observations = returns.shape[0]
+    if observations < 2:
+        raise ValueError("need at least three aligned prices to compute returns")
+
+    portfolio_returns = returns @ w
+    covariance = np.cov(returns, rowvar=False, ddof=1).reshape(len(tickers), len(tickers))
+    variance = float(w @ covariance @ w)
+    stds = np.sqrt(np.diag(covariance))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        correlation = covariance / np.outer(stds, stds)
+        # Each holding's share of portfolio variance
+        risk_contribution = w * (covariance @ w) / variance if variance > 0 else np.full(len(tickers), np.nan)
+
+    growth = np.prod(1 + returns, axis=0)
+    annualized = growth ** (TRADING_DAYS / observations) - 1
+    portfolio_growth = float(np.prod(1 + portfolio_returns))
+    volatility = math.sqrt(variance * TRADING_DAYS)
+
+    # One-day value at risk as a positive fraction of portfolio value
+    tail = 1 - confidence
+    historical_var = -float(np.quantile(portfolio_returns, tail))
+    tail_returns = portfolio_returns[portfolio_returns <= -historical_var]
+    expected_shortfall = -float(tail_returns.mean()) if tail_returns.size else historical_var
+    mean_return = float(portfolio_returns.mean())
+    parametric_var = -(mean_return + NormalDist().inv_cdf(tail) * math.sqrt(variance))
+
+    result = {
+        "observations": observations,
+        "start": prices.index[0].strftime("%Y-%m-%d"),
+        "end": prices.index[-1].strftime("%Y-%m-%d"),
+        "total_return": _round(portfolio_growth - 1),
+        "annualized_return": _round(portfolio_growth ** (TRADING_DAYS / observations) - 1),
+        "volatility": _round(volatility),
+        "sharpe": _round((mean_return * TRADING_DAYS) / volatility) if volatility else None,
+        "value_at_risk": {
+            "confidence": confidence,
+            "horizon_days": 1,
+            "historical": _round(historical_var),
+            "parametric": _round(parametric_var),
+            "expected_shortfall": _round(expected_shortfall),
+        },
+        "beta": None,
+    }
+
+    betas = np.full(len(tickers), np.nan)
+    if benchmark is not None:
+        bench_values = benchmark.reindex(prices.index).ffill().to_numpy(dtype=float)
+        bench_returns = bench_values[1:] / bench_values[:-1] - 1
+        valid = np.isfinite(bench_returns)
+        if valid.sum() > 2:
+            centered_bench = bench_returns[valid] - bench_returns[valid].mean()
+            bench_variance = centered_bench @ centered_bench / (valid.sum() - 1)
+            centered = returns[valid] - returns[valid].mean(axis=0)
+            betas = centered.T @ centered_bench / (valid.sum() - 1) / bench_variance
+            result["beta"] = _round(float(w @ betas))
+            result["benchmark_return"] = _round(float(np.prod(1 + bench_returns[valid]) - 1))
+
+    result["holdings"] = {
+        ticker: {
+            "weight": _round(w[i]),
+            "total_return": _round(growth[i] - 1),
+            "annualized_return": _round(annualized[i]),
+            "volatility": _round(stds[i] * math.sqrt(TRADING_DAYS)),
+            "beta": _round(betas[i]),
+            "risk_contribution": _round(risk_contribution[i]),
+        }
+        for i, ticker in enumerate(tickers)
+    }
+
+    if include_matrices:
+        result["matrices"] = {
+            "tickers": tickers,
+            "covariance": np.round(covariance * TRADING_DAYS, 8).tolist(),
+            "correlation": np.round(np.nan_to_num(correlation), 4).tolist(),
+        }
+    return result
@@ -0,0 +1,328 @@
+import os
+import json
+import fcntl
+import time
+import logging
+import threading
+from datetime import datetime, timedelta, time as clock
+from zoneinfo import ZoneInfo
+
+from .screener import parse_tickers
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_PATH = os.path.join(os.path.expanduser("~"), ".financehub", "popularity.json")
+
+# Regular US equity session; exchange holidays are not modelled and run like trading days
+MARKET_TIMEZONE = ZoneInfo("America/New_York")
+MARKET_OPEN = clock(9, 30)
+MARKET_CLOSE = clock(16, 0)
+# Pause after the close before the final pass, so the day's bar has settled
+POST_CLOSE_DELAY = timedelta(minutes=5)
+
+# Decayed popularity below which a ticker is forgotten
+MIN_KEPT_SCORE = 0.01
+
+# Longest single sleep of the background loop, so stop() and schedule changes are noticed
+MAX_SLEEP = 300
+
+
+def _session(day) -> tuple:
+    return (
+        datetime.combine(day, MARKET_OPEN, MARKET_TIMEZONE),
+        datetime.combine(day, MARKET_CLOSE, MARKET_TIMEZONE),
+    )
+
+
+def market_phase(now: datetime, preopen: timedelta) -> str:
+    """"open" in the regular session, "preopen" in the warm-up window before it, otherwise "closed" """
+    local = now.astimezone(MARKET_TIMEZONE)
+    if local.weekday() >= 5:
+        return "closed"
+    session_open, session_close = _session(local.date())
+    if session_open <= local < session_close:
+        return "open"
+    if session_open - preopen <= local < session_open:
+        return "preopen"
+    return "closed"
+
+
+def next_open(now: datetime) -> datetime:
+    """Start of the next regular session at or after now"""
+    local = now.astimezone(MARKET_TIMEZONE)
+    day = local.date()
+    while True:
+        session_open, _ = _session(day)
+        if day.weekday() < 5 and session_open >= local:
+            return session_open
+        day += timedelta(days=1)
+
+
+class Popularity:
+    """Request counts per ticker that decay exponentially, so last month's interest fades out"""
+
+    def __init__(self, half_life: float, max_size: int = 1000):
+        self.half_life = half_life
+        self.max_size = max_size
+        # ticker -> (score, wall time the score was computed at)
+        self._scores = {}
+        self._lock = threading.Lock()
+
+    def _decayed(self, score: float, as_of: float, now: float) -> float:
+        return score * 0.5 ** (max(0.0, now - as_of) / self.half_life)
+
+    def record(self, ticker: str, now: float = None, weight: float = 1.0):
+        now = time.time() if now is None else now
+        with self._lock:
+            score, as_of = self._scores.get(ticker, (0.0, now))
+            self._scores[ticker] = (self._decayed(score, as_of, now) + weight, now)
+            if len(self._scores) > self.max_size:
+                # Drop the least popular quarter at once rather than one ticker per request
+                ranked = sorted(self._scores, key=lambda t: self._decayed(*self._scores[t], now))
+                for stale in ranked[:len(ranked) // 4]:
+                    del self._scores[stale]
+
+    def top(self, n: int, min_score: float = 0.5, now: float = None) -> list:
+        """Up to n tickers by decayed score; the default cutoff keeps tickers requested within one half-life"""
+        now = time.time() if now is None else now
+        with self._lock:
+            scores = {ticker: self._decayed(score, as_of, now) for ticker, (score, as_of) in self._scores.items()}
+        ranked = sorted((t for t, score in scores.items() if score >= min_score), key=lambda t: -scores[t])
+        return ranked[:n]
+
+    def merge(self, scores: dict, now: float = None):
+        """Fold in scores persisted by other workers, keeping the higher decayed score per ticker"""
+        now = time.time() if now is None else now
+        with self._lock:
+            for ticker, (score, as_of) in scores.items():
+                theirs = self._decayed(float(score), float(as_of), now)
+                mine = self._decayed(*self._scores[ticker], now) if ticker in self._scores else 0.0
+                if max(theirs, mine) < MIN_KEPT_SCORE:
+                    # Interest has long faded; stop carrying the ticker around in the state file
+                    self._scores.pop(ticker, None)
+                    continue
+                self._scores[ticker] = (max(theirs, mine), now)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {ticker: [score, as_of] for ticker, (score, as_of) in self._scores.items()}
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+
+class Prefetcher:
+    """Keeps quote and history caches warm for watchlist and popular tickers ahead of demand.
+
+    Targets are the configured watchlist plus the most requested tickers
+    in recent interactive tool_call traffic. Passes run every interval seconds during
+    the regular US session and a pre-open window before it, once more
+    shortly after the close for the final daily bar, and not at all
+    overnight or at weekends. Quotes are warmed on the bounded executor
+    in every worker, since each has its own quote cache. History goes to
+    the shared bar store, so only the worker holding a lock next to the
+    state file refreshes it, in one batch call. Popularity is persisted
+    so restarts and other workers share it.
+    """
+
+    def __init__(self, quote_loader, history_loader=None, executor=None, watchlist: list = None,
+                 top_n: int = None, interval: float = None, preopen_minutes: float = None,
+                 half_life_hours: float = None, path: str = None):
+        self.quote_loader = quote_loader
+        self.history_loader = history_loader
+        self.executor = executor
+        self.watchlist = watchlist if watchlist is not None else parse_tickers(os.environ.get("PREFETCH_WATCHLIST", ""))
+        self.top_n = top_n if top_n is not None else int(os.environ.get("PREFETCH_TOP_N", 20))
+        self.interval = interval if interval is not None else float(os.environ.get("PREFETCH_INTERVAL_SECONDS", 60))
+        self.preopen = timedelta(minutes=(
+            preopen_minutes if preopen_minutes is not None else float(os.environ.get("PREFETCH_PREOPEN_MINUTES", 30))
+        ))
+        self.popularity = Popularity(3600 * (
+            half_life_hours if half_life_hours is not None else float(os.environ.get("PREFETCH_HALF_LIFE_HOURS", 72))
+        ))
+        self.path = path if path is not None else os.environ.get("PREFETCH_STATE_PATH", DEFAULT_STATE_PATH)
+
+        self.last_run = None
+        self.last_pass = None
+        self._pid = None
+        # (pid, open lock file) while this process is the one refreshing history
+        self._history_lock = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._load_persisted()
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0 and (self.top_n > 0 or bool(self.watchlist))
+
+    def _load_persisted(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                self.popularity.merge(json.load(f)["scores"])
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning("Ignoring unreadable prefetch state at %s: %s", self.path, e)
+
+    def _persist(self):
+        if not self.path:
+            return
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Write then rename so concurrent workers never read a partial file
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"scores": self.popularity.to_dict()}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning("Failed to persist prefetch state to %s: %s", self.path, e)
+
+    def record(self, tickers: list):
+        """Count one request towards popularity, split evenly over the tickers it names.
+
+        A batch call for hundreds of tickers then weighs as much as a
+        single lookup instead of pushing out genuinely popular tickers.
+        """
+        for ticker in tickers:
+            self.popularity.record(ticker.strip().upper(), weight=1 / len(tickers))
+
+    def _refreshes_history(self) -> bool:
+        """Whether this process refreshes history: the first to lock a file next to the state file keeps it"""
+        pid = os.getpid()
+        if self._history_lock is not None and self._history_lock[0] == pid:
+            return True
+        if not self.path:
+            # Nowhere to coordinate through; assume a single process
+            return True
+        lock_path = f"{self.path}.lock"
+        try:
+            directory = os.path.dirname(lock_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            lock_file = open(lock_path, "a")
+        except OSError as e:
+            logger.warning("Cannot open prefetch lock %s, refreshing history anyway: %s", lock_path, e)
+            return True
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            # Another worker holds it; the lock is released when that worker exits
+            lock_file.close()
+            return False
+        self._history_lock = (pid, lock_file)
+        logger.info("Prefetcher in process %s refreshes history", pid)
+        return True
+
+    def targets(self) -> list:
+        return list(dict.fromkeys(self.watchlist + self.popularity.top(self.top_n)))
+
+    def run_once(self) -> dict:
+        """Warm quotes and history for every target now"""
+        started = time.perf_counter()
+        self.last_run = time.time()
+        # Pick up what other workers have seen before choosing targets
+        self._load_persisted()
+        tickers = self.targets()
+
+        errors = {}
+        if self.executor is not None:
+            futures = [(ticker, self.executor.submit(self.quote_loader, ticker)) for ticker in tickers]
+            for ticker, future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    errors[ticker] = str(e)
+        else:
+            for ticker in tickers:
+                try:
+                    self.quote_loader(ticker)
+                except Exception as e:
+                    errors[ticker] = str(e)
+        if self.history_loader is not None and tickers and self._refreshes_history():
+            try:
+                self.history_loader(tickers)
+            except Exception as e:
+                errors["history"] = str(e)
+
+        self.last_pass = {
+            "at": self.last_run,
+            "tickers": len(tickers),
+            "errors": errors,
+            "seconds": round(time.perf_counter() - started, 2),
+        }
+        self._persist()
+        logger.info(
+            "Prefetched %s tickers, %s errors in %.1fs", len(tickers), len(errors), self.last_pass["seconds"]
+        )
+        return self.last_pass
+
+    def delay(self, now: datetime = None) -> float:
+        """Seconds until the next pass is due"""
+        now = now if now is not None else datetime.now(MARKET_TIMEZONE)
+        if market_phase(now, self.preopen) != "closed":
+            if self.last_run is None:
+                return 0.0
+            return max(0.0, self.last_run + self.interval - now.timestamp())
+
+        local = now.astimezone(MARKET_TIMEZONE)
+        if local.weekday() < 5:
+            session_close = _session(local.date())[1]
+            settled = session_close + POST_CLOSE_DELAY
+            if session_close <= local < settled:
+                return (settled - local).total_seconds()
+            if local >= settled and (self.last_run is None or self.last_run < settled.timestamp()):
+                return 0.0
+        return max(0.0, (next_open(now) - self.preopen - local).total_seconds())
+
+    def _loop(self, stop: threading.Event):
+        while not stop.is_set():
+            delay = self.delay()
+            if delay > 0:
+                stop.wait(min(delay, MAX_SLEEP))
+                continue
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error("Prefetch pass failed: %s", e)
+                stop.wait(self.interval)
+
+    def ensure_running(self):
+        """Start the background loop in this process if it isn't running.
+
+        Cheap enough to call per request. The server is imported before
+        gunicorn forks its workers and threads don't survive a fork, so
+        the loop starts lazily in each worker.
+        """
+        pid = os.getpid()
+        if not self.enabled or self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            self._stop = threading.Event()
+            threading.Thread(target=self._loop, args=(self._stop,), name="prefetcher", daemon=True).start()
+        logger.info(
+            "Started prefetcher: %s watchlist tickers plus top %s popular every %ss",
+            len(self.watchlist), self.top_n, self.interval
+        )
+
+    def stop(self):
+        self._stop.set()
+        self._pid = None
+
+    def stats(self) -> dict:
+        now = datetime.now(MARKET_TIMEZONE)
+        return {
+            "enabled": self.enabled,
+            "running": self._pid == os.getpid(),
+            "refreshes_history": self._history_lock is not None and self._history_lock[0] == os.getpid(),
+            "phase": market_phase(now, self.preopen),
+            "next_pass_in": round(self.delay(now), 1) if self.enabled else None,
+            "watchlist_size": len(self.watchlist),
+            "tracked_tickers": len(self.popularity),
+            "targets": self.targets(),
+            "last_pass": self.last_pass,
+        }
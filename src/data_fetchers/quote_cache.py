@@ -0,0 +1,202 @@
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict
+
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# Quote fields grouped by the loader that provides them, i.e. by how fast they go stale
+PRICE_FIELDS = ("price", "currency", "marketCap")
+PROFILE_FIELDS = ("name", "sector", "industry", "description")
+# Every field a quote can carry, in response order; pe_ratio is derived from the price and the profile's EPS
+QUOTE_FIELDS = ("price", "currency", "marketCap", "pe_ratio", "name", "sector", "industry", "description")
+FIELD_CLASSES = {
+    **{field: ("price",) for field in PRICE_FIELDS},
+    **{field: ("profile",) for field in PROFILE_FIELDS},
+    "pe_ratio": ("price", "profile"),
+}
+
+
+def pe_ratio(price, eps):
+    """Trailing P/E as Yahoo reports it: "N/A" without a price or for loss-making companies"""
+    if not price or not isinstance(eps, (int, float)) or eps <= 0:
+        return "N/A"
+    return round(price / eps, 2)
+
+
+def build_quote(ticker: str, parts: dict, fields=QUOTE_FIELDS) -> dict:
+    """Assemble the requested fields from per-class loader results ({"price": {...}, "profile": {...}})"""
+    price, profile = parts.get("price", {}), parts.get("profile", {})
+    quote = {"ticker": ticker}
+    for field in QUOTE_FIELDS:
+        if field not in fields:
+            continue
+        if field == "pe_ratio":
+            quote[field] = pe_ratio(price.get("price"), profile.get("trailingEps"))
+        else:
+            quote[field] = (price if field in PRICE_FIELDS else profile).get(field, "N/A")
+    return quote
+
+
+class _Flight:
+    """An in-progress upstream fetch that concurrent callers can wait on"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class QuoteCache:
+    """LRU quote cache with one loader and TTL per field class and single-flight upstream fetches.
+
+    loaders maps each class to a callable taking a ticker: "price" returns
+    PRICE_FIELDS from the lightweight quote endpoint, "profile" returns
+    PROFILE_FIELDS plus trailingEps from the full info scrape. A lookup
+    only loads the classes its fields need, so price-only callers never
+    pay for the profile.
+    """
+
+    def __init__(self, loaders: dict, price_ttl: float = None, profile_ttl: float = None, max_size: int = None):
+        self.loaders = dict(loaders)
+        self.ttls = {
+            "price": price_ttl if price_ttl is not None else float(os.environ.get("QUOTE_CACHE_PRICE_TTL", 15)),
+            "profile": profile_ttl if profile_ttl is not None else float(os.environ.get("QUOTE_CACHE_PROFILE_TTL", 6 * 3600)),
+        }
+        self.max_size = max_size if max_size is not None else int(os.environ.get("QUOTE_CACHE_MAX_SIZE", 1000))
+
+        # ticker -> {class: (data, expires)}
+        self._entries = OrderedDict()
+        # (ticker, class) -> _Flight
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._counters = {
+            cls: {"hits": 0, "misses": 0, "coalesced": 0, "prefetches": 0, "errors": 0} for cls in self.ttls
+        }
+        self._evictions = 0
+
+    @staticmethod
+    def _key(ticker: str) -> str:
+        return ticker.strip().upper()
+
+    def get(self, ticker: str, fields=None) -> dict:
+        """Return the quote for ticker with the requested fields (all by default).
+
+        Each field class is fetched upstream at most once per expiry.
+        """
+        fields = QUOTE_FIELDS if fields is None else fields
+        classes = [cls for cls in self.ttls if any(cls in FIELD_CLASSES[field] for field in fields)]
+        key = self._key(ticker)
+        parts = {cls: self._get_class(key, ticker, cls) for cls in classes}
+        return build_quote(ticker, parts, fields)
+
+    def warm(self, ticker: str, ahead: float, fields=None) -> dict:
+        """Reload the field classes of ticker that expire within ahead seconds and return the quote.
+
+        Used by the prefetcher and the quote stream; warming loads are
+        counted as prefetches rather than lookups so the hit rate reflects
+        interactive traffic.
+        """
+        fields = QUOTE_FIELDS if fields is None else fields
+        key = self._key(ticker)
+        parts = {
+            cls: self._get_class(key, ticker, cls, ahead=ahead)
+            for cls in self.ttls if any(cls in FIELD_CLASSES[field] for field in fields)
+        }
+        return build_quote(ticker, parts, fields)
+
+    def cold_classes(self, ticker: str, fields=None) -> list:
+        """Field classes a lookup of these fields would load upstream: neither fresh in the cache nor already loading"""
+        fields = QUOTE_FIELDS if fields is None else fields
+        key = self._key(ticker)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entries.get(key, {})
+            return [
+                cls for cls in self.ttls
+                if any(cls in FIELD_CLASSES[field] for field in fields)
+                and not (cls in cached and cached[cls][1] > now)
+                and (key, cls) not in self._flights
+            ]
+
+    def _get_class(self, key: str, ticker: str, cls: str, ahead: float = None) -> dict:
+        now = time.monotonic()
+        warming = ahead is not None
+        with self._lock:
+            cached = self._entries.get(key, {}).get(cls)
+            if cached is not None and cached[1] > now + (ahead or 0):
+                if not warming:
+                    self._entries.move_to_end(key)
+                    self._counters[cls]["hits"] += 1
+                return cached[0]
+
+            flight = self._flights.get((key, cls))
+            if flight is not None:
+                if not warming:
+                    self._counters[cls]["coalesced"] += 1
+                leader = False
+            else:
+                flight = _Flight()
+                self._flights[(key, cls)] = flight
+                self._counters[cls]["prefetches" if warming else "misses"] += 1
+                leader = True
+
+        if not leader:
+            waited_from = time.perf_counter()
+            flight.event.wait()
+            tracing.record("quote_cache.coalesced_wait", time.perf_counter() - waited_from, start=waited_from, field_class=cls)
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            data = dict(self.loaders[cls](ticker))
+            flight.result = data
+            self._store(key, cls, data)
+            return data
+        except Exception as e:
+            flight.error = e
+            with self._lock:
+                self._counters[cls]["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop((key, cls), None)
+            flight.event.set()
+
+    def _store(self, key: str, cls: str, data: dict):
+        expires = time.monotonic() + self.ttls[cls]
+        with self._lock:
+            self._entries.setdefault(key, {})[cls] = (data, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                evicted, _ = self._entries.popitem(last=False)
+                self._evictions += 1
+                logger.debug("Evicted %s from quote cache", evicted)
+
+    def invalidate(self, ticker: str = None):
+        with self._lock:
+            if ticker is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(self._key(ticker), None)
+
+    def stats(self) -> dict:
+        """Lookup counters summed over field classes, with the per-class breakdown under "classes" """
+        with self._lock:
+            classes = {cls: dict(counters) for cls, counters in self._counters.items()}
+            stats = {"evictions": self._evictions, "size": len(self._entries)}
+        for name in ("hits", "misses", "coalesced", "prefetches", "errors"):
+            stats[name] = sum(counters[name] for counters in classes.values())
+        for counters in classes.values():
+            lookups = counters["hits"] + counters["misses"] + counters["coalesced"]
+            counters["hit_rate"] = round((counters["hits"] + counters["coalesced"]) / lookups, 4) if lookups else 0.0
+        stats["classes"] = classes
+        stats["max_size"] = self.max_size
+        stats["ttls"] = dict(self.ttls)
+        lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_rate"] = round((stats["hits"] + stats["coalesced"]) / lookups, 4) if lookups else 0.0
+        return stats
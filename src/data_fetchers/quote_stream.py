@@ -0,0 +1,172 @@
+import os
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Quote fields pushed to stream subscribers; a poll only produces an event when one of them changes
+STREAM_FIELDS = ("price", "currency", "marketCap")
+
+
+class StreamFull(Exception):
+    """Raised when the process already serves its maximum number of stream subscribers"""
+
+
+class Subscription:
+    """One client's view of the stream: the newest undelivered event per ticker.
+
+    Pollers overwrite rather than queue, so a slow client skips to the
+    latest price instead of building up a backlog.
+    """
+
+    def __init__(self, stream, tickers: list):
+        self.stream = stream
+        self.tickers = tickers
+        self._pending = {}
+        self._changed = threading.Condition()
+        self.closed = False
+
+    def _push(self, ticker: str, event: dict):
+        with self._changed:
+            self._pending[ticker] = event
+            self._changed.notify()
+
+    def get(self, timeout: float = None) -> list:
+        """Events published since the last call, waiting up to timeout for one; empty on timeout"""
+        with self._changed:
+            if not self._pending:
+                self._changed.wait(timeout)
+            events, self._pending = list(self._pending.values()), {}
+        return events
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.stream._unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _Poller:
+    """Polls one ticker on a daemon thread and fans each change out to its subscribers"""
+
+    def __init__(self, ticker: str, loader, interval: float):
+        self.ticker = ticker
+        self.loader = loader
+        self.interval = interval
+        self.subscribers = set()
+        self.latest = None
+        self.polls = 0
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        threading.Thread(target=self._run, name=f"quote-stream-{self.ticker}", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def add(self, subscription: Subscription):
+        with self._lock:
+            self.subscribers.add(subscription)
+            latest = self.latest
+        # New subscribers see the current price at once instead of waiting for the next change
+        if latest is not None:
+            subscription._push(self.ticker, latest)
+
+    def remove(self, subscription: Subscription) -> int:
+        with self._lock:
+            self.subscribers.discard(subscription)
+            return len(self.subscribers)
+
+    def _publish(self, event: dict):
+        with self._lock:
+            self.latest = event
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            subscription._push(self.ticker, event)
+
+    def _run(self):
+        while not self._stop.is_set():
+            delay = self.interval
+            self.polls += 1
+            try:
+                quote = self.loader(self.ticker)
+                previous = self.latest
+                if previous is None or previous["type"] != "quote" or any(
+                    quote.get(field) != previous.get(field) for field in STREAM_FIELDS
+                ):
+                    self._publish(dict(
+                        {field: quote.get(field) for field in STREAM_FIELDS},
+                        type="quote", ticker=self.ticker, as_of=time.time()
+                    ))
+            except Exception as e:
+                # Back off as long as a throttled upstream asks before polling again
+                delay = max(delay, getattr(e, "retry_after", None) or 0)
+                logger.warning("Quote stream poll for %s failed: %s", self.ticker, e)
+                self._publish({"type": "error", "ticker": self.ticker, "error": str(e), "as_of": time.time()})
+            self._stop.wait(delay)
+
+
+class QuoteStream:
+    """Live quote fan-out: one upstream poller per ticker, shared by every subscriber of that ticker.
+
+    Pollers start with a ticker's first subscriber and stop with its
+    last, so N viewers of a ticker cost one poll per interval rather
+    than N requests.
+    """
+
+    def __init__(self, loader, interval: float = None, max_subscribers: int = None):
+        self.loader = loader
+        self.interval = interval if interval is not None else float(os.environ.get("QUOTE_STREAM_INTERVAL", 5))
+        self.max_subscribers = (
+            max_subscribers if max_subscribers is not None else int(os.environ.get("QUOTE_STREAM_MAX_SUBSCRIBERS", 100))
+        )
+        self._pollers = {}
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, tickers: list) -> Subscription:
+        tickers = list(dict.fromkeys(t.strip().upper() for t in tickers if t and t.strip()))
+        subscription = Subscription(self, tickers)
+        with self._lock:
+            if len(self._subscriptions) >= self.max_subscribers:
+                raise StreamFull(f"at most {self.max_subscribers} quote stream subscribers per process")
+            self._subscriptions.add(subscription)
+            for ticker in tickers:
+                poller = self._pollers.get(ticker)
+                if poller is None:
+                    poller = self._pollers[ticker] = _Poller(ticker, self.loader, self.interval)
+                    poller.start()
+                    logger.info("Started quote stream poller for %s", ticker)
+                poller.add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+            for ticker in subscription.tickers:
+                poller = self._pollers.get(ticker)
+                if poller is not None and poller.remove(subscription) == 0:
+                    poller.stop()
+                    del self._pollers[ticker]
+                    logger.info("Stopped quote stream poller for %s", ticker)
+
+    def stats(self) -> dict:
+        with self._lock:
+            pollers = dict(self._pollers)
+            subscribers = len(self._subscriptions)
+        return {
+            "subscribers": subscribers,
+            "max_subscribers": self.max_subscribers,
+            "interval": self.interval,
+            "pollers": {
+                ticker: {"subscribers": len(poller.subscribers), "polls": poller.polls}
+                for ticker, poller in pollers.items()
+            },
+        }
@@ -0,0 +1,81 @@
+import math
+import numpy as np
+import pandas as pd
+
+# Bar intervals served from stored daily bars
+INTERVALS = ("1d", "1wk", "1mo")
+
+# Interval -> pandas resample rule and bin options; weekly bars are labeled by their Monday like yfinance's
+RESAMPLE_RULES = {
+    "1wk": ("W-MON", {"label": "left", "closed": "left"}),
+    "1mo": ("MS", {}),
+}
+
+AGGREGATIONS = {
+    "Open": "first",
+    "High": "max",
+    "Low": "min",
+    "Close": "last",
+    "Volume": "sum",
+    "Dividends": "sum",
+}
+
+
+def resample_bars(hist: pd.DataFrame, interval: str) -> pd.DataFrame:
+    """Aggregate daily OHLCV bars into weekly or monthly bars; daily input is returned unchanged"""
+    if interval == "1d" or hist.empty:
+        return hist
+    if interval not in RESAMPLE_RULES:
+        raise ValueError(f"interval must be one of {', '.join(INTERVALS)}")
+    rule, options = RESAMPLE_RULES[interval]
+
+    resampler = hist.resample(rule, **options)
+    frame = resampler.agg({column: how for column, how in AGGREGATIONS.items() if column in hist.columns})
+    if "Stock Splits" in hist.columns:
+        # Split ratios compound; yfinance uses 0 for "no split"
+        splits = hist["Stock Splits"].replace(0, 1).resample(rule, **options).prod()
+        frame["Stock Splits"] = splits.replace(1, 0)
+    frame = frame.dropna(subset=["Close"])
+    if "Volume" in frame.columns:
+        frame["Volume"] = frame["Volume"].astype("int64")
+    return frame.reindex(columns=[c for c in hist.columns if c in frame.columns]).rename_axis("Date")
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: positions of threshold points that keep the shape of (x, y)"""
+    n = len(y)
+    if threshold >= n or threshold < 1:
+        return np.arange(n)
+    if threshold < 3:
+        # Too few points for buckets between the endpoints: keep both ends, or only the latest
+        return np.array([0, n - 1] if threshold == 2 else [n - 1], dtype=np.int64)
+
+    every = (n - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start = int(math.floor(i * every)) + 1
+        end = int(math.floor((i + 1) * every)) + 1
+        next_end = min(int(math.floor((i + 2) * every)) + 1, n)
+        if end >= next_end:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        else:
+            avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+
+        # Pick the point in this bucket forming the largest triangle with the last pick and the next bucket's mean
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample(hist: pd.DataFrame, max_points: int, column: str = "Close") -> pd.DataFrame:
+    """Keep at most max_points bars, chosen by LTTB on column; whole bars are kept, not averaged"""
+    if not max_points or len(hist) <= max_points:
+        return hist
+    index = hist.index
+    utc_index = index.tz_convert("UTC") if index.tz is not None else index.tz_localize("UTC")
+    x = ((utc_index - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(seconds=1)).to_numpy(dtype=float)
+    y = hist[column].astype(float).ffill().bfill().to_numpy()
+    return hist.iloc[lttb_indices(x, y, max_points)]
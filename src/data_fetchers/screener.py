@@ -0,0 +1,312 @@
+import os
+import json
+import time
+import logging
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SNAPSHOT_PATH = os.path.join(os.path.expanduser("~"), ".financehub", "fundamentals.json")
+
+# Screened when SCREENER_UNIVERSE is not set
+DEFAULT_UNIVERSE = (
+    "AAPL", "MSFT", "NVDA", "AMZN", "GOOGL", "META", "TSLA", "AVGO", "ORCL", "CRM",
+    "ADBE", "AMD", "INTC", "CSCO", "IBM", "QCOM", "TXN", "NFLX", "JPM", "BAC",
+    "WFC", "GS", "MS", "V", "MA", "AXP", "BRK-B", "JNJ", "UNH", "PFE",
+    "MRK", "ABBV", "LLY", "TMO", "WMT", "COST", "HD", "MCD", "KO", "PEP",
+    "PG", "NKE", "DIS", "XOM", "CVX", "CAT", "DE", "BA", "GE", "HON",
+)
+
+# Columns of the snapshot; numeric ones get a sorted index for range filters and ordering
+NUMERIC_FIELDS = ("price", "marketCap", "pe_ratio")
+TEXT_FIELDS = ("ticker", "name", "sector", "industry")
+# Text columns with an equality index (matched case-insensitively)
+CATEGORY_FIELDS = ("sector", "industry")
+SORT_FIELDS = NUMERIC_FIELDS + ("ticker",)
+
+
+class SnapshotLoading(Exception):
+    """No fundamentals snapshot exists yet; the first one is being built in the background"""
+
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_tickers(value: str) -> list:
+    """Tickers from a comma-separated list or a file with one ticker per line ('#' starts a comment)"""
+    if not value.strip():
+        return []
+    if os.path.isfile(value):
+        with open(value) as f:
+            symbols = [line.split("#")[0] for line in f]
+    else:
+        symbols = value.split(",")
+    return list(dict.fromkeys(s.strip().upper() for s in symbols if s.strip()))
+
+
+def load_universe(value: str = None) -> list:
+    """Tickers to screen: a comma-separated list or a file with one ticker per line"""
+    value = os.environ.get("SCREENER_UNIVERSE", "") if value is None else value
+    if not value.strip():
+        return list(DEFAULT_UNIVERSE)
+    return parse_tickers(value)
+
+
+def _number(value) -> float:
+    # Quotes report missing values as "N/A" and a missing price as 0
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not value:
+        return np.nan
+    return float(value)
+
+
+class FundamentalsSnapshot:
+    """Immutable columnar snapshot of quote fundamentals with precomputed indexes.
+
+    Each numeric column keeps its values in ascending order alongside the
+    row positions, so a range filter is two binary searches and sorting a
+    filtered set is a pass over the precomputed order. Sector and industry
+    map each lower-cased value to its rows.
+    """
+
+    def __init__(self, columns: dict, as_of: float):
+        self.as_of = as_of
+        self.size = len(columns["ticker"])
+        self.columns = {field: np.asarray(columns[field], dtype=object) for field in TEXT_FIELDS}
+        for field in NUMERIC_FIELDS:
+            self.columns[field] = np.asarray(columns[field], dtype=float)
+
+        # Stable argsort puts NaN last; sorted_values excludes them so searchsorted sees only real numbers
+        self.order, self.sorted_values = {}, {}
+        for field in NUMERIC_FIELDS:
+            values = self.columns[field]
+            order = np.argsort(values, kind="stable")
+            valid = int(np.isfinite(values).sum())
+            self.order[field] = order
+            self.sorted_values[field] = values[order[:valid]]
+        self.order["ticker"] = np.argsort(self.columns["ticker"].astype(str), kind="stable")
+
+        self.categories = {}
+        for field in CATEGORY_FIELDS:
+            index = {}
+            for row, value in enumerate(self.columns[field]):
+                index.setdefault(str(value).lower(), []).append(row)
+            self.categories[field] = {value: np.array(rows) for value, rows in index.items()}
+
+    @classmethod
+    def from_quotes(cls, quotes: list, as_of: float = None):
+        columns = {field: [] for field in TEXT_FIELDS + NUMERIC_FIELDS}
+        for quote in quotes:
+            for field in TEXT_FIELDS:
+                columns[field].append(quote.get(field) or "N/A")
+            for field in NUMERIC_FIELDS:
+                columns[field].append(_number(quote.get(field)))
+        return cls(columns, as_of if as_of is not None else time.time())
+
+    def to_dict(self) -> dict:
+        columns = {field: self.columns[field].tolist() for field in TEXT_FIELDS}
+        for field in NUMERIC_FIELDS:
+            columns[field] = [value if np.isfinite(value) else None for value in self.columns[field].tolist()]
+        return {"as_of": self.as_of, "columns": columns}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        columns = dict(data["columns"])
+        for field in NUMERIC_FIELDS:
+            columns[field] = [np.nan if value is None else value for value in columns[field]]
+        return cls(columns, data["as_of"])
+
+    def _range_mask(self, field: str, low: float = None, high: float = None):
+        values = self.sorted_values[field]
+        start = 0 if low is None else int(np.searchsorted(values, low, side="left"))
+        stop = len(values) if high is None else int(np.searchsorted(values, high, side="right"))
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self.order[field][start:stop]] = True
+        return mask
+
+    def screen(self, ranges: dict = None, categories: dict = None, sort_by: str = "marketCap",
+               descending: bool = True, limit: int = 50) -> dict:
+        """Rows matching every filter, ordered by sort_by with missing values last.
+
+        ranges maps numeric fields to (low, high) with None for an open end;
+        categories maps sector/industry to a value or list of values.
+        """
+        mask = np.ones(self.size, dtype=bool)
+        for field, (low, high) in (ranges or {}).items():
+            if low is not None or high is not None:
+                mask &= self._range_mask(field, low, high)
+        for field, wanted in (categories or {}).items():
+            wanted = [wanted] if isinstance(wanted, str) else wanted
+            selected = np.zeros(self.size, dtype=bool)
+            for value in wanted:
+                rows = self.categories[field].get(value.strip().lower())
+                if rows is not None:
+                    selected[rows] = True
+            mask &= selected
+
+        order = self.order[sort_by]
+        if descending:
+            valid = len(self.sorted_values[sort_by]) if sort_by in NUMERIC_FIELDS else self.size
+            order = np.concatenate([order[:valid][::-1], order[valid:]])
+        rows = order[mask[order]]
+
+        fields = TEXT_FIELDS + NUMERIC_FIELDS
+        results = []
+        for row in rows[:limit]:
+            item = {field: self.columns[field][row] for field in fields}
+            for field in NUMERIC_FIELDS:
+                item[field] = float(item[field]) if np.isfinite(item[field]) else None
+            results.append(item)
+        return {"matches": int(len(rows)), "results": results}
+
+
+class Screener:
+    """Screens a ticker universe against a periodically refreshed fundamentals snapshot.
+
+    The snapshot is rebuilt in the background from the quote loader and
+    swapped in atomically, so screens never wait on upstream fetches and
+    are served from the previous snapshot while a refresh runs. It is
+    persisted to disk so restarts and other workers start warm.
+    """
+
+    def __init__(self, loader, executor=None, universe: list = None, refresh_seconds: float = None,
+                 path: str = None):
+        self.loader = loader
+        self.executor = executor
+        self.universe = universe if universe is not None else load_universe()
+        self.refresh_seconds = (
+            refresh_seconds if refresh_seconds is not None
+            else float(os.environ.get("SCREENER_REFRESH_SECONDS", 6 * 3600))
+        )
+        self.path = path if path is not None else os.environ.get("SCREENER_SNAPSHOT_PATH", DEFAULT_SNAPSHOT_PATH)
+        # Seconds a screen arriving before the first snapshot is told to wait
+        self.loading_retry_after = float(os.environ.get("SCREENER_LOADING_RETRY_AFTER", 5))
+
+        self.snapshot = None
+        self.errors = {}
+        self._refreshing = threading.Event()
+        self._lock = threading.Lock()
+        self._load_persisted()
+
+    def _load_persisted(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            # A snapshot taken for a different universe is rebuilt rather than served
+            if data.get("universe") == self.universe and (self.snapshot is None or data["as_of"] > self.snapshot.as_of):
+                self.snapshot = FundamentalsSnapshot.from_dict(data)
+                logger.info("Loaded fundamentals snapshot of %s tickers from %s", self.snapshot.size, self.path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Ignoring unreadable fundamentals snapshot at %s: %s", self.path, e)
+
+    def _persist(self, snapshot: FundamentalsSnapshot):
+        if not self.path:
+            return
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Write then rename so concurrent workers never read a partial file
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(dict(snapshot.to_dict(), universe=self.universe), f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning("Failed to persist fundamentals snapshot to %s: %s", self.path, e)
+
+    def stale(self) -> bool:
+        return self.snapshot is None or time.time() - self.snapshot.as_of > self.refresh_seconds
+
+    def refresh(self):
+        """Fetch every ticker in the universe and swap in a new snapshot"""
+        started = time.perf_counter()
+        if self.executor is not None:
+            futures = [(ticker, self.executor.submit(self.loader, ticker)) for ticker in self.universe]
+            outcomes = []
+            for ticker, future in futures:
+                try:
+                    outcomes.append((ticker, future.result(), None))
+                except Exception as e:
+                    outcomes.append((ticker, None, e))
+        else:
+            outcomes = []
+            for ticker in self.universe:
+                try:
+                    outcomes.append((ticker, self.loader(ticker), None))
+                except Exception as e:
+                    outcomes.append((ticker, None, e))
+
+        quotes, errors = [], {}
+        for ticker, quote, error in outcomes:
+            if error is not None:
+                errors[ticker] = str(error)
+            else:
+                quotes.append(dict(quote, ticker=ticker))
+        # Keep the last known row for tickers that failed this round
+        if self.snapshot is not None and errors:
+            previous = self.snapshot
+            rows = [i for i, ticker in enumerate(previous.columns["ticker"]) if ticker in errors]
+            for row in rows:
+                quotes.append({field: previous.columns[field][row] for field in TEXT_FIELDS + NUMERIC_FIELDS})
+
+        snapshot = FundamentalsSnapshot.from_quotes(quotes)
+        with self._lock:
+            self.snapshot = snapshot
+            self.errors = errors
+        self._persist(snapshot)
+        logger.info(
+            "Refreshed fundamentals snapshot: %s tickers, %s errors in %.1fs",
+            snapshot.size, len(errors), time.perf_counter() - started
+        )
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.error("Fundamentals snapshot refresh failed: %s", e)
+        finally:
+            self._refreshing.clear()
+
+    def ensure_fresh(self):
+        """Start a background refresh when the snapshot is missing or older than refresh_seconds"""
+        with self._lock:
+            if not self.stale() or self._refreshing.is_set():
+                return
+            # Another worker may already have refreshed the persisted copy
+            self._load_persisted()
+            if not self.stale():
+                return
+            self._refreshing.set()
+        threading.Thread(target=self._refresh_in_background, name="screener-refresh", daemon=True).start()
+
+    def screen(self, **criteria) -> dict:
+        """Screen the current snapshot; raises SnapshotLoading until the first one has been built"""
+        self.ensure_fresh()
+        snapshot = self.snapshot
+        if snapshot is None:
+            # An empty result would read as "nothing matches"
+            raise SnapshotLoading(
+                f"fundamentals snapshot of {len(self.universe)} tickers is still loading",
+                retry_after=self.loading_retry_after,
+            )
+        result = snapshot.screen(**criteria)
+        result.update({
+            "as_of": snapshot.as_of,
+            "universe_size": len(self.universe),
+            "snapshot_size": snapshot.size,
+            "refreshing": self._refreshing.is_set(),
+        })
+        return result
+
+    def stats(self) -> dict:
+        snapshot = self.snapshot
+        return {
+            "universe_size": len(self.universe),
+            "snapshot_size": snapshot.size if snapshot is not None else 0,
+            "age_seconds": round(time.time() - snapshot.as_of, 1) if snapshot is not None else None,
+            "refreshing": self._refreshing.is_set(),
+            "errors": len(self.errors),
+        }
@@ -1,97 +1,545 @@
-import yfinance as yf
+import os
+import time
+import pandas as pd
 import logging
 
+# MARKET_DATA_PROVIDER=offline swaps in recorded/synthetic data for benchmarks and offline runs
+if os.environ.get("MARKET_DATA_PROVIDER", "yahoo").lower() == "offline":
+    from . import offline_provider as yf
+else:
+    import yfinance as yf
+
+from upstream_scheduler import get_scheduler, UpstreamError
+from metrics import stage
+
+from .bar_store import get_bar_store
+from .quote_cache import build_quote
+from . import indicators
+from .resample import INTERVALS, resample_bars, downsample
+from . import portfolio
+
 logger = logging.getLogger(__name__)
 
+# Calendar days covered by each yfinance period that the bar store can serve
+PERIOD_DAYS = {
+    "1mo": 30, "3mo": 91, "6mo": 182,
+    "1y": 365, "2y": 730, "5y": 1826, "10y": 3652,
+}
+
+# Periods Yahoo counts in trading sessions; loaded with a week of calendar slack for weekends and holidays
+SESSION_PERIODS = {"1d": 1, "5d": 5}
+
+# Wire formats accepted by fetch_historical_data
+HISTORY_FORMATS = ("records", "columnar")
+
+# Bar intervals fetch_historical_data can return; all are resampled from stored daily bars
+HISTORY_INTERVALS = INTERVALS
+STORE_INTERVAL = "1d"
+
+# Default cap on returned bars; longer ranges are downsampled with LTTB (0 disables)
+HISTORY_MAX_POINTS = int(os.environ.get("HISTORY_MAX_POINTS", 1000))
+
+# Longer period loaded behind each indicator period so 200-bar averages are warmed up
+INDICATOR_LOOKBACK = {
+    "1mo": "1y", "3mo": "1y", "6mo": "2y", "ytd": "2y",
+    "1y": "5y", "2y": "10y", "5y": "10y", "10y": "10y",
+}
+
+# Periods accepted by fetch_portfolio_analytics (served from stored daily bars)
+PORTFOLIO_PERIODS = ("1mo", "3mo", "6mo", "ytd", "1y", "2y", "5y", "10y")
+
+# Portfolios up to this many holdings get covariance/correlation matrices by default
+PORTFOLIO_MATRIX_MAX = int(os.environ.get("PORTFOLIO_MATRIX_MAX", 25))
+
+# Minimum seconds between tail refreshes of a stored series
+BAR_STORE_REFRESH_SECONDS = float(os.environ.get("BAR_STORE_REFRESH_SECONDS", 60))
+
+def _yahoo(fn, *args, **kwargs):
+    """Call Yahoo through the shared upstream scheduler (rate limit, priority, 429 backoff)"""
+    return get_scheduler().call("yahoo", fn, *args, **kwargs)
+
 class YahooFinanceFetcher:
     @staticmethod
-    def fetch_stock_price(ticker: str) -> dict:
+    def fetch_quote(ticker: str) -> dict:
+        """Price fields from the lightweight fast_info quote, without the full info scrape"""
         try:
-            logger.info(f"Fetching stock price for {ticker} from yfinance")
+            logger.info("Fetching quote for %s from yfinance", ticker)
             stock = yf.Ticker(ticker)
-            
-            # Get basic info
-            info = stock.info
-            logger.debug(f"Got info for {ticker}")
-            
-            # Extract key data with fallbacks
-            price = info.get("currentPrice") or info.get("regularMarketPrice", 0)
-            
+
+            def read_fast_info():
+                # fast_info loads lazily per attribute, so read everything inside the scheduled call
+                fast = stock.fast_info
+                try:
+                    market_cap = fast.market_cap
+                except (KeyError, TypeError):
+                    # Funds and indices have no share count to derive it from
+                    market_cap = None
+                return fast.last_price, fast.currency, market_cap
+
+            price, currency, market_cap = _yahoo(read_fast_info, operation="fast_info")
+            logger.debug("Got fast_info for %s", ticker)
+
             return {
                 "ticker": ticker,
                 "price": float(price) if price else 0,
-                "currency": info.get("currency", "USD"),
-                "marketCap": info.get("marketCap", "N/A"),
-                "pe_ratio": info.get("trailingPE", "N/A"),
-                "name": info.get("longName", ticker),
-                "sector": info.get("sector", "N/A"),
-                "industry": info.get("industry", "N/A"),
-                "description": info.get("longBusinessSummary", "N/A")[:200] if info.get("longBusinessSummary") else "N/A"
+                "currency": currency or "USD",
+                "marketCap": int(market_cap) if market_cap else "N/A",
             }
+        except UpstreamError:
+            raise
         except Exception as e:
-            logger.error(f"Failed to fetch stock price for {ticker}: {str(e)}")
+            logger.error("Failed to fetch quote for %s: %s", ticker, str(e))
             raise Exception(f"Failed to fetch stock price for {ticker}: {str(e)}")
 
     @staticmethod
-    def fetch_historical_data(ticker: str, period: str = "1mo") -> dict:
+    def fetch_profile(ticker: str) -> dict:
+        """Slow-changing company fields plus trailing EPS, from the full info scrape"""
         try:
-            logger.info(f"Fetching historical data for {ticker} with period {period}")
+            logger.info("Fetching profile for %s from yfinance", ticker)
             stock = yf.Ticker(ticker)
-            
-            # Determine interval based on period
-            if period in ["1y", "2y", "5y", "10y"]:
-                # Use weekly data for longer timeframes
-                interval = "1wk"
-                hist = stock.history(period=period, interval=interval)
-                logger.info(f"Fetching {period} data with weekly interval for {ticker}")
-            else:
-                # Use daily data for shorter timeframes
-                interval = "1d"
-                hist = stock.history(period=period)
-                logger.info(f"Fetching {period} data with daily interval for {ticker}")
-            
-            if hist.empty:
-                raise Exception(f"No historical data found for {ticker}")
-            
+            info = _yahoo(lambda: stock.info, operation="info")
+            logger.debug("Got info for %s", ticker)
+
+            return {
+                "ticker": ticker,
+                "name": info.get("longName", ticker),
+                "sector": info.get("sector", "N/A"),
+                "industry": info.get("industry", "N/A"),
+                "description": info.get("longBusinessSummary", "N/A")[:200] if info.get("longBusinessSummary") else "N/A",
+                # Kept so P/E can be derived from the live price between profile refreshes
+                "trailingEps": info.get("trailingEps"),
+            }
+        except UpstreamError:
+            raise
+        except Exception as e:
+            logger.error("Failed to fetch profile for %s: %s", ticker, str(e))
+            raise Exception(f"Failed to fetch profile for {ticker}: {str(e)}")
+
+    @staticmethod
+    def fetch_stock_price(ticker: str) -> dict:
+        """Full quote (price and profile fields); the server goes through QuoteCache instead"""
+        parts = {
+            "price": YahooFinanceFetcher.fetch_quote(ticker),
+            "profile": YahooFinanceFetcher.fetch_profile(ticker),
+        }
+        return build_quote(ticker, parts)
+
+    @staticmethod
+    def _interval_for_period(period: str) -> str:
+        # Use weekly data for longer timeframes, daily data for shorter ones
+        return "1wk" if period in ["1y", "2y", "5y", "10y"] else "1d"
+
+    @staticmethod
+    def _format_history(ticker: str, period: str, interval: str, hist, format: str = "records",
+                        max_points: int = None) -> dict:
+        # Frame -> dict conversion, timed separately from the upstream fetch
+        with stage("format_history"):
+            rows = len(hist)
+
+            # Bound the payload for long ranges, keeping the shape of the close series
+            hist = downsample(hist, HISTORY_MAX_POINTS if max_points is None else max_points)
+
+            result = {
+                "ticker": ticker,
+                "period": period,
+                "interval": interval,
+                "rows": rows,
+                "points": len(hist),
+                "timezone": str(hist.index.tz) if hist.index.tz is not None else None,
+            }
+
+            if format == "columnar":
+                # One array per column with epoch-second timestamps, so keys aren't repeated per row
+                index = hist.index
+                utc_index = index.tz_convert("UTC") if index.tz is not None else index.tz_localize("UTC")
+                data = {"Date": ((utc_index - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(seconds=1)).tolist()}
+                for column in hist.columns:
+                    data[column] = hist[column].tolist()
+                result.update({
+                    "format": "columnar",
+                    "columns": list(data.keys()),
+                    "data": data
+                })
+                return result
+
             # Convert DataFrame to JSON-serializable format
             hist_reset = hist.reset_index()
             # Convert dates to strings
             hist_reset['Date'] = hist_reset['Date'].astype(str)
             # Convert to dictionary with orient='records' for cleaner format
-            hist_data = hist_reset.to_dict(orient='records')
+            result["data"] = hist_reset.to_dict(orient='records')
+            return result
+
+    @staticmethod
+    def _period_start(period: str):
+        """UTC timestamp a period starts at, or None when it can't be served from the bar store"""
+        now = pd.Timestamp.now(tz="UTC").normalize()
+        if period == "ytd":
+            return now.replace(month=1, day=1)
+        if period in SESSION_PERIODS:
+            return now - pd.Timedelta(days=SESSION_PERIODS[period] + 7)
+        days = PERIOD_DAYS.get(period)
+        return now - pd.Timedelta(days=days) if days else None
+
+    @staticmethod
+    def _has_corporate_action(hist) -> bool:
+        # Adjusted prices before a split/dividend change, so stored bars must be refetched
+        actions = hist.reindex(columns=["Dividends", "Stock Splits"]).fillna(0)
+        return bool((actions != 0).any().any())
+
+    @staticmethod
+    def _download(tickers: list, interval: str, **kwargs) -> dict:
+        frame = _yahoo(
+            yf.download,
+            tickers,
+            interval=interval,
+            group_by="ticker",
+            auto_adjust=True,
+            actions=True,
+            threads=True,
+            ignore_tz=False,
+            progress=False,
+            **kwargs
+        )
+        return {
+            ticker: hist.rename_axis('Date')
+            for ticker, hist in YahooFinanceFetcher._split_download(tickers, frame).items()
+        }
+
+    @staticmethod
+    def _load_history(ticker: str, period: str, interval: str = STORE_INTERVAL):
+        """Return bars for a period at any interval, resampled from daily bars"""
+        daily = YahooFinanceFetcher._load_daily_history(ticker, period)
+        if period in SESSION_PERIODS:
+            daily = daily.iloc[-SESSION_PERIODS[period]:]
+        return resample_bars(daily, interval)
+
+    @staticmethod
+    def _load_daily_history(ticker: str, period: str):
+        """Return daily bars for a period, reading the local bar store first and downloading only the missing tail"""
+        interval = STORE_INTERVAL
+        store = get_bar_store()
+        start = YahooFinanceFetcher._period_start(period)
+        stock = yf.Ticker(ticker)
+        if store is None or start is None:
+            return _yahoo(stock.history, period=period, interval=interval)
+
+        key = ticker.upper()
+        start_ts = int(start.timestamp())
+        coverage = store.coverage(key, interval)
+
+        if coverage is not None and coverage["start_ts"] <= start_ts:
+            if time.time() - coverage["updated_at"] >= BAR_STORE_REFRESH_SECONDS:
+                # Re-request from the last stored bar, which may still have been forming
+                last = pd.Timestamp(coverage["last_ts"], unit="s", tz="UTC")
+                delta = _yahoo(stock.history, start=last.strftime("%Y-%m-%d"), interval=interval)
+                logger.info("Fetched %s new %s bars for %s since %s", len(delta), interval, ticker, last.date())
+                if delta.empty:
+                    store.touch(key, interval)
+                else:
+                    if delta.index.tz is None:
+                        delta = delta.tz_localize("UTC")
+                    if YahooFinanceFetcher._has_corporate_action(delta[delta.index > last]):
+                        logger.info("Corporate action for %s; refetching stored %s history", ticker, interval)
+                        store.clear(key, interval)
+                        coverage = None
+                    else:
+                        store.write(key, interval, delta)
+
+        if coverage is None or coverage["start_ts"] > start_ts:
+            hist = _yahoo(stock.history, start=start.strftime("%Y-%m-%d"), interval=interval)
+            store.write(key, interval, hist, start_ts=start_ts)
+            return hist
+
+        return store.read(key, interval, start_ts)
+
+    @staticmethod
+    def _load_history_batch(tickers: list, period: str, interval: str = STORE_INTERVAL) -> dict:
+        """Multi-ticker _load_history: at most one tail download and one full download"""
+        daily = YahooFinanceFetcher._load_daily_history_batch(tickers, period)
+        if period in SESSION_PERIODS:
+            daily = {ticker: hist.iloc[-SESSION_PERIODS[period]:] for ticker, hist in daily.items()}
+        return {ticker: resample_bars(hist, interval) for ticker, hist in daily.items()}
+
+    @staticmethod
+    def _load_daily_history_batch(tickers: list, period: str) -> dict:
+        interval = STORE_INTERVAL
+        store = get_bar_store()
+        start = YahooFinanceFetcher._period_start(period)
+        if store is None or start is None:
+            return YahooFinanceFetcher._download(tickers, interval, period=period)
+
+        start_ts = int(start.timestamp())
+        now = time.time()
+        stale, missing = {}, []
+        for ticker in tickers:
+            coverage = store.coverage(ticker, interval)
+            if coverage is None or coverage["start_ts"] > start_ts:
+                missing.append(ticker)
+            elif now - coverage["updated_at"] >= BAR_STORE_REFRESH_SECONDS:
+                stale[ticker] = pd.Timestamp(coverage["last_ts"], unit="s", tz="UTC")
+
+        if stale:
+            since = min(stale.values())
+            deltas = YahooFinanceFetcher._download(list(stale), interval, start=since.strftime("%Y-%m-%d"))
+            logger.info("Fetched %s tails for %s stored tickers since %s", interval, len(stale), since.date())
+            for ticker, last in stale.items():
+                delta = deltas.get(ticker)
+                if delta is None or delta.empty:
+                    store.touch(ticker, interval)
+                    continue
+                if delta.index.tz is None:
+                    delta = delta.tz_localize("UTC")
+                if YahooFinanceFetcher._has_corporate_action(delta[delta.index > last]):
+                    store.clear(ticker, interval)
+                    missing.append(ticker)
+                else:
+                    store.write(ticker, interval, delta)
+
+        if missing:
+            full = YahooFinanceFetcher._download(missing, interval, start=start.strftime("%Y-%m-%d"))
+            for ticker, hist in full.items():
+                store.write(ticker, interval, hist, start_ts=start_ts)
+
+        return {
+            ticker: hist for ticker in tickers
+            if not (hist := store.read(ticker, interval, start_ts)).empty
+        }
+
+    @staticmethod
+    def prefetch_history(tickers: list, period: str) -> int:
+        """Bring stored daily bars for tickers up to date ahead of demand; returns how many are covered.
+
+        A no-op without a bar store, since there is nowhere to keep the bars.
+        """
+        if get_bar_store() is None:
+            return 0
+        return len(YahooFinanceFetcher._load_daily_history_batch([t.upper() for t in tickers], period))
+
+    @staticmethod
+    def fetch_historical_data(ticker: str, period: str = "1mo", format: str = "records",
+                              interval: str = None, max_points: int = None) -> dict:
+        try:
+            logger.info("Fetching historical data for %s with period %s", ticker, period)
             
-            # Return appropriate number of data points based on period
-            if period == "1mo":
-                hist_data = hist_data[-20:]  # Last 20 daily data points
-            elif period == "3mo":
-                hist_data = hist_data[-40:]  # Last 40 daily data points
-            elif period == "6mo":
-                hist_data = hist_data[-100:]  # Last 100 daily data points
-            elif period in ["1y", "2y", "5y", "10y"]:
-                hist_data = hist_data[-52:]  # Last 52 weeks (approximately 1 year of weekly data)
-            # For "all" or other periods, return all data
+            interval = interval or YahooFinanceFetcher._interval_for_period(period)
+            hist = YahooFinanceFetcher._load_history(ticker, period, interval)
+            logger.info("Loaded %s data with %s interval for %s", period, interval, ticker)
             
-            return {
+            if hist.empty:
+                raise Exception(f"No historical data found for {ticker}")
+            
+            return YahooFinanceFetcher._format_history(ticker, period, interval, hist, format, max_points)
+        except UpstreamError:
+            raise
+        except Exception as e:
+            logger.error("Failed to fetch historical data for %s: %s", ticker, str(e))
+            raise Exception(f"Failed to fetch historical data for {ticker}: {str(e)}")
+
+    @staticmethod
+    def _indicator_closes(hist) -> tuple:
+        """Non-missing closes of hist and their bar times in epoch seconds"""
+        closes = hist["Close"].dropna()
+        index = closes.index
+        timestamps = ((index.tz_convert("UTC") if index.tz is not None else index.tz_localize("UTC"))
+                      - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(seconds=1)
+        return closes, timestamps.to_numpy()
+
+    @staticmethod
+    def _latest_indicators(ticker: str, interval: str, lookback: str) -> dict:
+        """Latest indicator values from the persisted online state, advanced by any new completed bars.
+
+        Only the stored bars from the state's last bar onwards are read,
+        so a request costs O(new bars). Every bar but the last is committed
+        to the state; the last one may still be forming, so it is only
+        peeked. The state is rebuilt from the full lookback history when it
+        is missing or no longer lines up with the stored bars.
+        """
+        key = ticker.upper()
+        store = get_bar_store()
+        saved = store.read_indicator_state(key, interval) if store is not None else None
+        state = indicators.IndicatorState.from_dict(saved) if saved is not None else None
+
+        if state is not None:
+            # The caller has just brought the stored daily bars up to date
+            tail = resample_bars(store.read(key, STORE_INTERVAL, state.last_ts), interval)
+            closes, timestamps = YahooFinanceFetcher._indicator_closes(tail)
+            if len(closes) < 2 or timestamps[0] != state.last_ts:
+                logger.debug("Indicator state for %s %s no longer matches stored bars; rebuilding", key, interval)
+                state = None
+            else:
+                for ts, close in zip(timestamps[1:-1], closes.iloc[1:-1]):
+                    state.update(int(ts), close)
+                changed = len(closes) > 2
+                if changed:
+                    logger.debug("Advanced indicator state for %s %s by %s bars", key, interval, len(closes) - 2)
+
+        if state is None:
+            hist = YahooFinanceFetcher._load_history(ticker, lookback, interval)
+            closes, timestamps = YahooFinanceFetcher._indicator_closes(hist)
+            if closes.empty:
+                return {}
+            state = indicators.IndicatorState.from_closes(closes.iloc[:-1], interval)
+            changed = True
+
+        if changed and store is not None and state.count:
+            store.write_indicator_state(key, interval, state.to_dict())
+        return state.peek(int(timestamps[-1]), closes.iloc[-1])
+
+    @staticmethod
+    def fetch_indicators(ticker: str, period: str = "6mo", series: bool = False) -> dict:
+        """Technical indicators over a period, computed from stored bars and cached next to them"""
+        try:
+            logger.info("Fetching indicators for %s with period %s", ticker, period)
+
+            interval = YahooFinanceFetcher._interval_for_period(period)
+            lookback = INDICATOR_LOOKBACK.get(period, period)
+            # Latest values come from the online state, which reads the lookback only to rebuild itself
+            hist = YahooFinanceFetcher._load_history(ticker, lookback if series else period, interval)
+            if hist.empty:
+                raise Exception(f"No historical data found for {ticker}")
+
+            key = ticker.upper()
+            store = get_bar_store()
+            start = YahooFinanceFetcher._period_start(period)
+            window = hist
+            if start is not None:
+                window = hist[hist.index >= (start if hist.index.tz is not None else start.tz_localize(None))]
+            payload = {
                 "ticker": ticker,
                 "period": period,
                 "interval": interval,
-                "rows": len(hist),
-                "data": hist_data
+                "bars": len(window),
+                "as_of": indicators.epoch_seconds(window.index[-1]),
             }
+
+            if not series:
+                # Latest values come from the online state, so a new bar costs O(1) instead of a full recompute
+                with stage("indicators"):
+                    payload["latest"] = YahooFinanceFetcher._latest_indicators(ticker, interval, lookback)
+                    payload["period_stats"] = indicators.period_stats(window, interval)
+                return payload
+
+            # The last bar may still be forming, so its close is part of the cache version
+            version = f"{hist.index[0].isoformat()}:{hist.index[-1].isoformat()}:{len(hist)}:{hist['Close'].iloc[-1]!r}"
+            cached = store.read_indicators(key, interval, period, version) if store is not None else None
+            if cached is not None:
+                logger.debug("Indicator cache hit for %s %s", ticker, period)
+                return cached
+
+            with stage("indicators"):
+                frame = indicators.compute_indicators(hist, interval).loc[window.index]
+            payload.update({
+                "latest": indicators.latest_values(frame),
+                "period_stats": indicators.period_stats(window, interval),
+                "series": indicators.to_columnar(frame),
+            })
+            if store is not None:
+                store.write_indicators(key, interval, period, version, payload)
+            return payload
+        except UpstreamError:
+            raise
         except Exception as e:
-            logger.error(f"Failed to fetch historical data for {ticker}: {str(e)}")
-            raise Exception(f"Failed to fetch historical data for {ticker}: {str(e)}")
+            logger.error("Failed to compute indicators for %s: %s", ticker, str(e))
+            raise Exception(f"Failed to compute indicators for {ticker}: {str(e)}")
+
+    @staticmethod
+    def _split_download(tickers: list, frame) -> dict:
+        """Split a wide multi-symbol yf.download frame into one OHLCV frame per ticker"""
+        per_ticker = {}
+        if isinstance(frame.columns, pd.MultiIndex):
+            available = set(frame.columns.get_level_values(0))
+            for ticker in tickers:
+                if ticker in available:
+                    per_ticker[ticker] = frame[ticker].dropna(how='all')
+        elif len(tickers) == 1:
+            per_ticker[tickers[0]] = frame.dropna(how='all')
+        return per_ticker
+
+    @staticmethod
+    def fetch_historical_data_batch(tickers: list, period: str = "1mo", format: str = "records",
+                                    interval: str = None, max_points: int = None) -> dict:
+        """Download history for many tickers with one multi-symbol request"""
+        tickers = list(dict.fromkeys(t.strip().upper() for t in tickers if t and t.strip()))
+        if not tickers:
+            raise Exception("No tickers provided for batch historical data")
+        try:
+            interval = interval or YahooFinanceFetcher._interval_for_period(period)
+            logger.info("Loading %s data with %s interval for %s tickers", period, interval, len(tickers))
+            per_ticker = YahooFinanceFetcher._load_history_batch(tickers, period, interval)
+        except UpstreamError:
+            raise
+        except Exception as e:
+            logger.error("Failed to download historical data for %s tickers: %s", len(tickers), str(e))
+            raise Exception(f"Failed to download historical data for {len(tickers)} tickers: {str(e)}")
+
+        results, errors = {}, {}
+        for ticker in tickers:
+            hist = per_ticker.get(ticker)
+            if hist is None or hist.empty:
+                errors[ticker] = f"No historical data found for {ticker}"
+                continue
+            results[ticker] = YahooFinanceFetcher._format_history(ticker, period, interval, hist, format, max_points)
+
+        return {"period": period, "interval": interval, "results": results, "errors": errors}
+
+    @staticmethod
+    def fetch_portfolio_analytics(holdings: dict, period: str = "1y", benchmark: str = "^GSPC",
+                                  confidence: float = 0.95, include_matrices: bool = None) -> dict:
+        """Return, volatility, covariance, beta and VaR for weighted holdings, from one batch history load"""
+        weights = {}
+        for ticker, weight in holdings.items():
+            key = ticker.strip().upper()
+            weights[key] = weights.get(key, 0.0) + float(weight)
+        if not weights:
+            raise Exception("No holdings provided for portfolio analytics")
+        benchmark = benchmark.strip().upper() if benchmark else None
+
+        try:
+            logger.info("Computing %s portfolio analytics for %s holdings", period, len(weights))
+            symbols = list(weights) + ([benchmark] if benchmark and benchmark not in weights else [])
+            daily = YahooFinanceFetcher._load_history_batch(symbols, period)
+
+            prices, dropped = portfolio.align_closes({t: daily[t]["Close"] for t in weights if t in daily})
+            for ticker in weights:
+                if ticker not in daily:
+                    dropped[ticker] = f"No historical data found for {ticker}"
+            if prices.empty:
+                raise Exception("none of the holdings have enough overlapping price history")
+
+            bench_close = None
+            if benchmark and benchmark in daily:
+                bench_prices, _ = portfolio.align_closes({benchmark: daily[benchmark]["Close"]})
+                bench_close = bench_prices.get(benchmark)
+
+            # Holdings without usable history are excluded and the remaining weights rescaled
+            kept = portfolio.normalize_weights({t: weights[t] for t in prices.columns})
+            if include_matrices is None:
+                include_matrices = len(kept) <= PORTFOLIO_MATRIX_MAX
+            with stage("portfolio_analytics"):
+                result = portfolio.portfolio_analytics(prices, kept, bench_close, confidence, include_matrices)
+        except UpstreamError:
+            raise
+        except Exception as e:
+            logger.error("Failed to compute portfolio analytics for %s holdings: %s", len(weights), str(e))
+            raise Exception(f"Failed to compute portfolio analytics: {str(e)}")
+
+        result.update({"period": period, "benchmark": benchmark if bench_close is not None else None, "errors": dropped})
+        return result
 
     @staticmethod
     def fetch_financials(ticker: str) -> dict:
         try:
-            logger.info(f"Fetching financials for {ticker}")
+            logger.info("Fetching financials for %s", ticker)
             stock = yf.Ticker(ticker)
+            financials = _yahoo(lambda: stock.financials, operation="financials")
             
             return {
                 "ticker": ticker,
-                "financials": stock.financials.to_dict() if stock.financials is not None else {}
+                "financials": financials.to_dict() if financials is not None else {}
             }
+        except UpstreamError:
+            raise
         except Exception as e:
-            logger.error(f"Failed to fetch financials for {ticker}: {str(e)}")
+            logger.error("Failed to fetch financials for %s: %s", ticker, str(e))
             raise Exception(f"Failed to fetch financials for {ticker}: {str(e)}")
\ No newline at end of file
@@ -1,40 +1,355 @@
 import os
+import json
+import time
+import asyncio
+import functools
+import contextvars
 import requests
+import pandas as pd
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
+import tracing
+
 load_dotenv()
 
 MCP_SERVER_URL = os.environ.get("MCP_SERVER_URL", "http://localhost:5001")
 
+def history_to_dataframe(historical_data: dict) -> pd.DataFrame:
+    """Build a Date-sorted DataFrame from a records or columnar historical response"""
+    data = historical_data.get('data') if historical_data else None
+    if not data:
+        return pd.DataFrame()
+
+    timezone = historical_data.get('timezone')
+    if historical_data.get('format') == 'columnar':
+        df = pd.DataFrame(data, columns=historical_data.get('columns'))
+        dates = pd.to_datetime(df['Date'], unit='s', utc=True)
+        df['Date'] = dates.dt.tz_convert(timezone) if timezone else dates.dt.tz_localize(None)
+        return df
+
+    df = pd.DataFrame(data)
+    # Record dates carry UTC offsets that change across daylight saving, so parse via UTC
+    dates = pd.to_datetime(df['Date'], utc=True)
+    df['Date'] = dates.dt.tz_convert(timezone) if timezone else dates.dt.tz_localize(None)
+    return df.sort_values('Date')
+
+def _sse_events(response):
+    """Parse a text/event-stream response; yields event dicts, and None for keepalive comments"""
+    data = []
+    # chunk_size=None hands over each chunk as it arrives instead of waiting for a full buffer
+    for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+        if not line:
+            if data:
+                yield json.loads("\n".join(data))
+                data = []
+        elif line.startswith(":"):
+            yield None
+        else:
+            field, _, value = line.partition(":")
+            if field == "data":
+                data.append(value[1:] if value.startswith(" ") else value)
+
+# Tools that only read data, so a failed attempt can safely be retried
+IDEMPOTENT_TOOLS = {
+    "fetch_stock_data",
+    "fetch_stock_data_batch",
+    "fetch_historical_data",
+    "fetch_historical_data_batch",
+    "fetch_indicators",
+    "fetch_portfolio_analytics",
+    "screen_stocks",
+}
+# Read timeouts on these are not retried: the server is most likely still working through the
+# first attempt, and sending the whole batch again would multiply the upstream load
+BATCH_TOOLS = {"fetch_stock_data_batch", "fetch_historical_data_batch"}
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+# Longest Retry-After the client will sleep before retrying instead of giving up
+MAX_RETRY_AFTER = 10
+
 class FinanceClient:
-    def __init__(self):
+    def __init__(self, pool_size: int = None, connect_timeout: float = None, read_timeout: float = None,
+                 max_retries: int = None, backoff_factor: float = None):
         self.base_url = MCP_SERVER_URL
+        self.timeout = (
+            connect_timeout if connect_timeout is not None else float(os.environ.get("MCP_CONNECT_TIMEOUT", 3.05)),
+            read_timeout if read_timeout is not None else float(os.environ.get("MCP_READ_TIMEOUT", 30))
+        )
+        # Added to the read timeout per ticker of a batch call, which can queue that long for Yahoo
+        self.batch_seconds_per_ticker = float(os.environ.get("MCP_BATCH_SECONDS_PER_TICKER", 0.2))
+        self.max_retries = max_retries if max_retries is not None else int(os.environ.get("MCP_MAX_RETRIES", 2))
+        self.backoff_factor = backoff_factor if backoff_factor is not None else float(os.environ.get("MCP_RETRY_BACKOFF", 0.3))
+
+        pool_size = pool_size if pool_size is not None else int(os.environ.get("MCP_POOL_SIZE", 10))
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
 
-    def fetch_stock_data(self, ticker: str):
+        # Most recent calls as {tool, seconds, status, attempts}
+        self.call_log = deque(maxlen=1000)
+
+    def close(self):
+        self.session.close()
+
+    def _call_tool(self, name: str, parameters: dict) -> dict:
+        """POST a tool call over the pooled session, retrying idempotent tools with exponential backoff"""
         url = f"{self.base_url}/tool_call"
-        payload = {
-            "name": "fetch_stock_data",
-            "parameters": {"ticker": ticker}
-        }
-        try:
-            response = requests.post(url, json=payload)
-            response.raise_for_status()
-            return response.json()
+        payload = {"name": name, "parameters": parameters}
+        retries = self.max_retries if name in IDEMPOTENT_TOOLS else 0
+        timeout = self.timeout
+        if name in BATCH_TOOLS:
+            connect_timeout, read_timeout = self.timeout
+            timeout = (connect_timeout, read_timeout + self.batch_seconds_per_ticker * len(parameters.get("tickers", ())))
+
+        started = time.perf_counter()
+        attempt = 0
+        status = None
+        server_timing = None
+        try:
+            while True:
+                attempt += 1
+                try:
+                    response = self.session.post(url, json=payload, timeout=timeout)
+                    status = response.status_code
+                    if status in RETRY_STATUS_CODES and attempt <= retries:
+                        delay = self.backoff_factor * (2 ** (attempt - 1))
+                        # The server sends Retry-After when an upstream is throttled; honor it up to a cap
+                        retry_after = response.headers.get("Retry-After", "")
+                        if retry_after.isdigit():
+                            delay = max(delay, min(float(retry_after), MAX_RETRY_AFTER))
+                        response.close()
+                        time.sleep(delay)
+                        continue
+                    server_timing = response.headers.get("Server-Timing")
+                    response.raise_for_status()
+                    return response.json()
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    if attempt > retries or (isinstance(e, requests.exceptions.ReadTimeout) and name in BATCH_TOOLS):
+                        raise
+                    time.sleep(self.backoff_factor * (2 ** (attempt - 1)))
+        finally:
+            elapsed = time.perf_counter() - started
+            self.call_log.append({
+                "tool": name,
+                "seconds": elapsed,
+                "status": status,
+                "attempts": attempt
+            })
+            trace = tracing.current_trace()
+            if trace is not None:
+                trace.record(f"tool.{name}", elapsed, start=started, status=status, attempts=attempt)
+                # The server's own stages, placed at the start of the round trip they happened in
+                for stage, seconds in tracing.parse_server_timing(server_timing):
+                    if stage != "total":
+                        trace.record(f"server.{stage}", seconds, start=started, tool=name)
+
+    def latency_summary(self) -> dict:
+        """Per-tool call count and mean/max latency in seconds over the recent call log"""
+        summary = {}
+        for call in list(self.call_log):
+            stats = summary.setdefault(call["tool"], {"calls": 0, "total": 0.0, "max": 0.0})
+            stats["calls"] += 1
+            stats["total"] += call["seconds"]
+            stats["max"] = max(stats["max"], call["seconds"])
+        for stats in summary.values():
+            stats["mean"] = stats.pop("total") / stats["calls"]
+        return summary
+
+    def fetch_stock_data(self, ticker: str, fields: list = None):
+        """fields selects quote fields (e.g. ["price"]); price-only quotes skip the slow profile lookup"""
+        parameters = {"ticker": ticker}
+        if fields is not None:
+            parameters["fields"] = list(fields)
+        try:
+            return self._call_tool("fetch_stock_data", parameters)
         except requests.exceptions.RequestException as e:
             print(f"Error fetching data for {ticker}: {e}")
             return {"error": str(e)}
 
-    def fetch_historical_data(self, ticker: str, period: str = "1mo"):
-        url = f"{self.base_url}/tool_call"
-        payload = {
-            "name": "fetch_historical_data",
-            "parameters": {"ticker": ticker, "period": period}
-        }
-        
-        try:
-            response = requests.post(url, json=payload)
-            response.raise_for_status()
-            return response.json()
+    def fetch_stock_data_batch(self, tickers: list, fields: list = None):
+        parameters = {"tickers": list(tickers)}
+        if fields is not None:
+            parameters["fields"] = list(fields)
+        try:
+            return self._call_tool("fetch_stock_data_batch", parameters)
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching batch data for {len(tickers)} tickers: {e}")
+            return {"error": str(e)}
+
+    def fetch_historical_data(self, ticker: str, period: str = "1mo", format: str = "records",
+                              interval: str = None, max_points: int = None):
+        """interval (1d/1wk/1mo) defaults by period on the server; max_points caps the bars returned"""
+        parameters = {"ticker": ticker, "period": period, "format": format}
+        if interval is not None:
+            parameters["interval"] = interval
+        if max_points is not None:
+            parameters["max_points"] = max_points
+        try:
+            return self._call_tool("fetch_historical_data", parameters)
         except requests.exceptions.RequestException as e:
             print(f"Error fetching historical data for {ticker}: {e}")
-            return {"error": str(e)}
\ No newline at end of file
+            return {"error": str(e)}
+
+    def fetch_historical_data_batch(self, tickers: list, period: str = "1mo", format: str = "records",
+                                    interval: str = None, max_points: int = None):
+        parameters = {"tickers": list(tickers), "period": period, "format": format}
+        if interval is not None:
+            parameters["interval"] = interval
+        if max_points is not None:
+            parameters["max_points"] = max_points
+        try:
+            return self._call_tool("fetch_historical_data_batch", parameters)
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching historical data for {len(tickers)} tickers: {e}")
+            return {"error": str(e)}
+
+    def fetch_indicators(self, ticker: str, period: str = "6mo", series: bool = False):
+        try:
+            return self._call_tool(
+                "fetch_indicators",
+                {"ticker": ticker, "period": period, "series": series}
+            )
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching indicators for {ticker}: {e}")
+            return {"error": str(e)}
+
+    def fetch_portfolio_analytics(self, holdings: dict, period: str = "1y", benchmark: str = "^GSPC",
+                                  confidence: float = 0.95, include_matrices: bool = None):
+        """holdings maps ticker to weight or position value; weights are normalized server-side"""
+        parameters = {"holdings": dict(holdings), "period": period, "benchmark": benchmark, "confidence": confidence}
+        if include_matrices is not None:
+            parameters["include_matrices"] = include_matrices
+        try:
+            return self._call_tool("fetch_portfolio_analytics", parameters)
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching portfolio analytics for {len(holdings)} holdings: {e}")
+            return {"error": str(e)}
+
+    def screen_stocks(self, **criteria):
+        """Filter the server's fundamentals snapshot.
+
+        Accepts min_/max_price, min_/max_market_cap, min_/max_pe, sector,
+        industry, sort_by, descending and limit; unset criteria are omitted.
+        """
+        parameters = {name: value for name, value in criteria.items() if value is not None}
+        try:
+            return self._call_tool("screen_stocks", parameters)
+        except requests.exceptions.RequestException as e:
+            print(f"Error screening stocks: {e}")
+            return {"error": str(e)}
+
+    def subscribe_quotes(self, tickers: list, stop=None):
+        """Yield live quote events for tickers from the server's /stream/quotes endpoint.
+
+        Each event is a dict with "type" ("quote" or "error"), "ticker",
+        "as_of" and, for quotes, price, currency and marketCap. Quotes are
+        only sent when they change. Dropped connections are re-opened with
+        backoff. Setting stop (a threading.Event) ends the generator
+        within one server heartbeat.
+        """
+        url = f"{self.base_url}/stream/quotes"
+        params = {"tickers": ",".join(tickers)}
+        failures = 0
+        while stop is None or not stop.is_set():
+            try:
+                with self.session.get(url, params=params, stream=True, timeout=self.timeout) as response:
+                    if response.status_code == 503 and failures < self.max_retries:
+                        # The server is at its stream limit; wait as long as it asks
+                        failures += 1
+                        retry_after = response.headers.get("Retry-After", "")
+                        time.sleep(min(float(retry_after), MAX_RETRY_AFTER) if retry_after.isdigit() else self.backoff_factor)
+                        continue
+                    response.raise_for_status()
+                    failures = 0
+                    for event in _sse_events(response):
+                        if stop is not None and stop.is_set():
+                            return
+                        if event is not None:
+                            yield event
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                    requests.exceptions.ChunkedEncodingError):
+                failures += 1
+                if failures > self.max_retries:
+                    raise
+                time.sleep(self.backoff_factor * (2 ** (failures - 1)))
+
+class AsyncFinanceClient:
+    """asyncio version of FinanceClient; calls run on worker threads sharing one pooled session"""
+
+    def __init__(self, client: FinanceClient = None, max_workers: int = None):
+        self.client = client if client is not None else FinanceClient()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or int(os.environ.get("MCP_POOL_SIZE", 10)),
+            thread_name_prefix="finance-client"
+        )
+
+    async def _run(self, method, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        # run_in_executor doesn't carry contextvars over; copy them so calls land in the caller's trace
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._executor, functools.partial(context.run, method, *args, **kwargs))
+
+    async def fetch_stock_data(self, ticker: str, fields: list = None):
+        return await self._run(self.client.fetch_stock_data, ticker, fields)
+
+    async def fetch_stock_data_batch(self, tickers: list, fields: list = None):
+        return await self._run(self.client.fetch_stock_data_batch, tickers, fields)
+
+    async def fetch_historical_data(self, ticker: str, period: str = "1mo", format: str = "records",
+                                    interval: str = None, max_points: int = None):
+        return await self._run(self.client.fetch_historical_data, ticker, period, format, interval, max_points)
+
+    async def fetch_historical_data_batch(self, tickers: list, period: str = "1mo", format: str = "records",
+                                          interval: str = None, max_points: int = None):
+        return await self._run(self.client.fetch_historical_data_batch, tickers, period, format, interval, max_points)
+
+    async def fetch_indicators(self, ticker: str, period: str = "6mo", series: bool = False):
+        return await self._run(self.client.fetch_indicators, ticker, period, series)
+
+    async def fetch_portfolio_analytics(self, holdings: dict, period: str = "1y", benchmark: str = "^GSPC",
+                                        confidence: float = 0.95, include_matrices: bool = None):
+        return await self._run(self.client.fetch_portfolio_analytics, holdings, period, benchmark,
+                               confidence, include_matrices)
+
+    async def screen_stocks(self, **criteria):
+        return await self._run(self.client.screen_stocks, **criteria)
+
+    async def gather(self, *calls):
+        """Run several tool coroutines concurrently and return their results in order"""
+        return await asyncio.gather(*calls)
+
+    async def fetch_quote_and_history(self, ticker: str, period: str = None, format: str = "columnar"):
+        """Fetch the quote and, when a period is given, the history concurrently.
+
+        Returns (quote_response, history_response_or_None).
+        """
+        if not period:
+            return await self.fetch_stock_data(ticker), None
+        quote, history = await self.gather(
+            self.fetch_stock_data(ticker),
+            self.fetch_historical_data(ticker, period, format)
+        )
+        return quote, history
+
+    async def fetch_analysis_inputs(self, ticker: str, period: str = None, format: str = "columnar",
+                                    series: bool = False):
+        """Quote, history and indicators for an analysis, fetched concurrently.
+
+        Returns (quote_response, history_response_or_None, indicators_response_or_None);
+        history and indicators are only fetched when a period is given.
+        """
+        if not period:
+            return await self.fetch_stock_data(ticker), None, None
+        quote, history, indicators = await self.gather(
+            self.fetch_stock_data(ticker),
+            self.fetch_historical_data(ticker, period, format),
+            self.fetch_indicators(ticker, period, series)
+        )
+        return quote, history, indicators
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.client.close()
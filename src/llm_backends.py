@@ -0,0 +1,269 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+from collections import namedtuple
+
+import requests
+
+from upstream_scheduler import get_scheduler
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "llama-3.3-70b-versatile"
+
+ToolCall = namedtuple("ToolCall", ["id", "name", "arguments"])
+
+
+class ChatResult:
+    """A completed chat turn: text content, requested tool calls and token usage"""
+
+    def __init__(self, content: str = None, tool_calls: list = None, usage: dict = None):
+        self.content = content
+        self.tool_calls = tool_calls or []
+        self.usage = usage or {}
+
+
+def _usage_dict(usage) -> dict:
+    if usage is None:
+        return {}
+    if isinstance(usage, dict):
+        return {"prompt_tokens": usage.get("prompt_tokens"), "completion_tokens": usage.get("completion_tokens")}
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "completion_tokens": getattr(usage, "completion_tokens", None),
+    }
+
+
+class LLMBackend:
+    """Chat completion interface used by TickerParser and the agent pipeline.
+
+    Messages and tool definitions use the OpenAI chat format.
+    """
+
+    name = "base"
+
+    def __init__(self, model: str = None):
+        self.model = model or os.environ.get("LLM_MODEL", DEFAULT_MODEL)
+
+    def chat(self, messages: list, max_tokens: int, temperature: float = 0,
+             tools: list = None, tool_choice: str = None) -> ChatResult:
+        raise NotImplementedError
+
+    def stream_chat(self, messages: list, max_tokens: int, temperature: float = 0, on_usage=None):
+        """Yield text chunks as they are generated; on_usage receives the usage dict if reported"""
+        result = self.chat(messages, max_tokens, temperature)
+        if on_usage is not None and result.usage:
+            on_usage(result.usage)
+        if result.content:
+            yield result.content
+
+
+class GroqBackend(LLMBackend):
+    name = "groq"
+
+    def __init__(self, api_key: str = None, model: str = None):
+        super().__init__(model)
+        from groq import Groq
+
+        api_key = api_key or os.environ.get("GROQ_API_KEY")
+        if not api_key:
+            raise ValueError("GROQ_API_KEY not found in environment variables")
+        # Retries on 429 are left to the upstream scheduler so backoff is shared across threads
+        self.client = Groq(api_key=api_key, max_retries=0)
+
+    def chat(self, messages, max_tokens, temperature=0, tools=None, tool_choice=None):
+        request = {"model": self.model, "messages": messages, "max_tokens": max_tokens, "temperature": temperature}
+        if tools:
+            request.update({"tools": tools, "tool_choice": tool_choice or "auto"})
+        completion = get_scheduler().call(self.name, self.client.chat.completions.create, operation="chat", **request)
+        message = completion.choices[0].message
+        return ChatResult(
+            content=message.content,
+            tool_calls=[
+                ToolCall(call.id, call.function.name, call.function.arguments)
+                for call in (message.tool_calls or [])
+            ],
+            usage=_usage_dict(completion.usage)
+        )
+
+    def stream_chat(self, messages, max_tokens, temperature=0, on_usage=None):
+        # The scheduled call covers opening the stream (time to first byte), not reading it
+        stream = get_scheduler().call(
+            self.name,
+            self.client.chat.completions.create,
+            operation="stream",
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True
+        )
+        for chunk in stream:
+            # Groq reports usage for streamed completions on the final chunk
+            x_groq = getattr(chunk, "x_groq", None)
+            if on_usage is not None and x_groq is not None and getattr(x_groq, "usage", None) is not None:
+                on_usage(_usage_dict(x_groq.usage))
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    """Any server exposing POST {base_url}/chat/completions (vLLM, llama.cpp, Ollama, OpenAI)"""
+
+    name = "openai"
+
+    def __init__(self, base_url: str = None, api_key: str = None, model: str = None, timeout: float = None):
+        super().__init__(model)
+        self.base_url = (base_url or os.environ.get("LLM_BASE_URL", "http://localhost:8000/v1")).rstrip("/")
+        self.timeout = timeout if timeout is not None else float(os.environ.get("LLM_TIMEOUT", 120))
+        self.session = requests.Session()
+        api_key = api_key or os.environ.get("LLM_API_KEY")
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+
+    def _post(self, payload: dict, stream: bool = False):
+        response = self.session.post(f"{self.base_url}/chat/completions", json=payload,
+                                     timeout=self.timeout, stream=stream)
+        response.raise_for_status()
+        return response
+
+    def chat(self, messages, max_tokens, temperature=0, tools=None, tool_choice=None):
+        payload = {"model": self.model, "messages": messages, "max_tokens": max_tokens, "temperature": temperature}
+        if tools:
+            payload.update({"tools": tools, "tool_choice": tool_choice or "auto"})
+        response = get_scheduler().call(self.name, self._post, payload, operation="chat")
+        body = response.json()
+        message = body["choices"][0]["message"]
+        return ChatResult(
+            content=message.get("content"),
+            tool_calls=[
+                ToolCall(call["id"], call["function"]["name"], call["function"].get("arguments", "{}"))
+                for call in (message.get("tool_calls") or [])
+            ],
+            usage=_usage_dict(body.get("usage"))
+        )
+
+    def stream_chat(self, messages, max_tokens, temperature=0, on_usage=None):
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "stream": True,
+            "stream_options": {"include_usage": True},
+        }
+        with get_scheduler().call(self.name, self._post, payload, stream=True, operation="stream") as response:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                if on_usage is not None and chunk.get("usage"):
+                    on_usage(_usage_dict(chunk["usage"]))
+                choices = chunk.get("choices") or []
+                content = choices[0].get("delta", {}).get("content") if choices else None
+                if content:
+                    yield content
+
+
+class StubBackend(LLMBackend):
+    """Deterministic offline backend for tests and throughput benchmarks.
+
+    Answers extraction prompts from the local alias tables, requests
+    fetch_stock_data when given tools, and otherwise produces a fixed-length
+    pseudo-analysis. STUB_LLM_LATENCY_MS delays the first token and
+    STUB_LLM_TOKEN_MS each following token.
+    """
+
+    name = "stub"
+
+    def __init__(self, model: str = None, latency_ms: float = None, token_ms: float = None, completion_tokens: int = None):
+        super().__init__(model or "stub")
+        self.latency = (latency_ms if latency_ms is not None else float(os.environ.get("STUB_LLM_LATENCY_MS", 200))) / 1000
+        self.token_latency = (token_ms if token_ms is not None else float(os.environ.get("STUB_LLM_TOKEN_MS", 5))) / 1000
+        self.completion_tokens = completion_tokens if completion_tokens is not None else int(
+            os.environ.get("STUB_LLM_COMPLETION_TOKENS", 200)
+        )
+
+    @staticmethod
+    def _prompt_tokens(messages: list) -> int:
+        return sum(len(str(message.get("content") or "")) for message in messages) // 4
+
+    @staticmethod
+    def _guess_ticker(text: str):
+        from llm_parser import COMPANY_ALIASES, COMPANY_TICKERS, fast_extract_ticker_and_timeframe
+
+        extracted = fast_extract_ticker_and_timeframe(text)
+        if extracted is not None:
+            return extracted
+        # Queries the fast path defers still name a company; read "quarter" as 3mo like the extraction prompt
+        lowered = text.lower()
+        timeframe = "3mo" if re.search(r"\bquarter\b", lowered) else None
+        for name, ticker in list(COMPANY_TICKERS.items()) + list(COMPANY_ALIASES.items()):
+            if re.search(r"\b" + re.escape(name.lower()) + r"\b", lowered):
+                return ticker, timeframe
+        tokens = re.findall(r"\b[A-Z]{2,5}\b", text)
+        return (tokens[0], timeframe) if tokens else (None, None)
+
+    def _reply(self, messages: list, max_tokens: int, tools: list = None) -> ChatResult:
+        prompt = str(messages[-1].get("content") or "")
+
+        if "TICKER,TIMEFRAME" in prompt:
+            match = re.search(r'User: "(.*)"', prompt)
+            ticker, timeframe = self._guess_ticker(match.group(1) if match else prompt)
+            return ChatResult(f"{ticker or 'INVALID'},{timeframe or 'NONE'}")
+        if "Return ONLY the ticker symbol" in prompt:
+            ticker, _ = self._guess_ticker(prompt.split("User request:")[-1])
+            return ChatResult(ticker or "INVALID")
+
+        if tools and not any(message.get("role") == "tool" for message in messages):
+            user_text = next((m["content"] for m in messages if m.get("role") == "user"), "")
+            ticker, timeframe = self._guess_ticker(user_text)
+            calls = [ToolCall("call_quote", "fetch_stock_data", json.dumps({"ticker": ticker or "AAPL"}))]
+            if timeframe:
+                calls.append(ToolCall("call_history", "fetch_historical_data",
+                                      json.dumps({"ticker": ticker or "AAPL", "period": timeframe})))
+            return ChatResult("", calls)
+
+        seed = hashlib.sha256(json.dumps(messages, sort_keys=True, default=str).encode()).hexdigest()
+        words = [f"insight-{seed[i % len(seed)]}{i}" for i in range(min(self.completion_tokens, max_tokens))]
+        return ChatResult("Stub analysis: " + " ".join(words))
+
+    def chat(self, messages, max_tokens, temperature=0, tools=None, tool_choice=None):
+        result = self._reply(messages, max_tokens, tools)
+        completion_tokens = len((result.content or "").split()) + len(result.tool_calls)
+        time.sleep(self.latency + self.token_latency * completion_tokens)
+        result.usage = {"prompt_tokens": self._prompt_tokens(messages), "completion_tokens": completion_tokens}
+        return result
+
+    def stream_chat(self, messages, max_tokens, temperature=0, on_usage=None):
+        result = self._reply(messages, max_tokens)
+        words = (result.content or "").split(" ")
+        time.sleep(self.latency)
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self.token_latency)
+            yield word if i == 0 else " " + word
+        if on_usage is not None:
+            on_usage({"prompt_tokens": self._prompt_tokens(messages), "completion_tokens": len(words)})
+
+
+BACKENDS = {
+    GroqBackend.name: GroqBackend,
+    OpenAICompatibleBackend.name: OpenAICompatibleBackend,
+    StubBackend.name: StubBackend,
+}
+
+
+def create_backend(name: str = None) -> LLMBackend:
+    """Instantiate the backend named by LLM_BACKEND (groq, openai or stub; default groq)"""
+    name = (name or os.environ.get("LLM_BACKEND", "groq")).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM_BACKEND '{name}', expected one of {', '.join(BACKENDS)}")
+    logger.debug("Using %s LLM backend", name)
+    return BACKENDS[name]()
@@ -1,29 +1,290 @@
 import os
+import re
+import json
+import time
 import logging
-from groq import Groq
+import threading
+from collections import OrderedDict
 from dotenv import load_dotenv
+import tracing
+from llm_backends import create_backend
+from response_cache import AnalysisCache, quantize
+from token_budget import TokenBudget
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+# Company name -> ticker, shared by the extraction prompt and the local fast path
+COMPANY_TICKERS = {
+    "Tesla": "TSLA", "Apple": "AAPL", "Microsoft": "MSFT", "Amazon": "AMZN", "Google": "GOOGL",
+    "Alphabet": "GOOGL", "Meta": "META", "Nvidia": "NVDA", "John Deere": "DE", "Toyota": "TM",
+    "Ford": "F", "Coca Cola": "KO", "McDonald's": "MCD", "Netflix": "NFLX", "Uber": "UBER",
+    "Adani Ports": "ADANIPORTS",
+}
+
+# Spelling variants the fast path accepts in addition to COMPANY_TICKERS
+COMPANY_ALIASES = {"Coca-Cola": "KO", "McDonalds": "MCD", "Mcdonald": "MCD"}
+
+# Timeframe phrases from the extraction prompt, longest first so "past 3 months" wins over "3 months".
+# "Quarter" is left to the LLM: "last quarter" usually means a reported fiscal quarter, not the trailing 3 months
+TIMEFRAME_PHRASES = sorted([
+    ("past month", "1mo"), ("this month", "1mo"), ("1 month", "1mo"), ("one month", "1mo"),
+    ("past 3 months", "3mo"), ("3 months", "3mo"), ("three months", "3mo"),
+    ("past 6 months", "6mo"), ("6 months", "6mo"), ("six months", "6mo"), ("half year", "6mo"),
+    ("past year", "1y"), ("1 year", "1y"), ("one year", "1y"), ("12 months", "1y"),
+    ("past 2 years", "2y"), ("2 years", "2y"), ("two years", "2y"),
+    ("past 5 years", "5y"), ("5 years", "5y"), ("five years", "5y"),
+], key=lambda item: -len(item[0]))
+
+# Words that signal a time period the phrase table didn't understand, so the LLM should decide
+TIME_WORDS = re.compile(r"\b(day|days|week|weeks|month|months|year|years|quarter|quarters|decade|ytd|ago|since|today|yesterday)\b")
+
+TICKER_TOKEN = re.compile(r"\b[A-Z]{1,5}(?:\.[A-Z]{1,2})?\b")
+
+# Upper-case tokens that are common finance words rather than tickers
+NON_TICKER_WORDS = {
+    "I", "A", "P", "E", "PE", "CEO", "CFO", "EPS", "USD", "ETF", "IPO", "AI", "US", "USA", "UK",
+    "YTD", "NYSE", "OK", "VS", "EV", "Q", "ROI", "ROE", "GDP", "IS", "IT", "AM", "PM",
+}
+
+DEFAULT_TICKER_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".financehub", "ticker_cache.json")
+
+
+def load_fast_path_tickers(value: str = None) -> frozenset:
+    """Alias table tickers plus FAST_PATH_TICKERS: a comma-separated list or a file with one ticker per line"""
+    value = os.environ.get("FAST_PATH_TICKERS", "") if value is None else value
+    symbols = []
+    if os.path.isfile(value):
+        with open(value) as f:
+            symbols = [line.split("#")[0] for line in f]
+    elif value.strip():
+        symbols = value.split(",")
+    known = {symbol.strip().upper() for symbol in symbols if symbol.strip()}
+    return frozenset(known | set(COMPANY_TICKERS.values()) | set(COMPANY_ALIASES.values()))
+
+
+# Tickers the fast path accepts as written in a query; other upper-case words (FOMC, CEO...) go to the LLM
+FAST_PATH_TICKERS = load_fast_path_tickers()
+
+
+def normalize_query(user_input: str) -> str:
+    """Case-, whitespace- and trailing-punctuation-insensitive cache key for a query"""
+    return re.sub(r"\s+", " ", user_input).strip().strip("?!.").strip().lower()
+
+
+def fast_extract_ticker_and_timeframe(user_input: str):
+    """Resolve unambiguous queries from the alias and timeframe tables without the LLM.
+
+    Returns (ticker, timeframe), or None when the LLM should decide.
+    """
+    text = user_input.strip()
+    lowered = text.lower()
+
+    candidates = set()
+    for name, ticker in list(COMPANY_TICKERS.items()) + list(COMPANY_ALIASES.items()):
+        if re.search(r"\b" + re.escape(name.lower()) + r"\b", lowered):
+            candidates.add(ticker)
+    for token in TICKER_TOKEN.findall(text):
+        if token not in NON_TICKER_WORDS and token in FAST_PATH_TICKERS:
+            candidates.add(token)
+    if not candidates and lowered.upper() in FAST_PATH_TICKERS:
+        candidates.add(lowered.upper())
+
+    if len(candidates) != 1:
+        return None
+
+    timeframe = None
+    remainder = lowered
+    for phrase, period in TIMEFRAME_PHRASES:
+        pattern = r"\b" + re.escape(phrase) + r"\b"
+        if re.search(pattern, remainder):
+            if timeframe is not None and timeframe != period:
+                return None
+            timeframe = period
+            remainder = re.sub(pattern, " ", remainder)
+    if TIME_WORDS.search(remainder):
+        return None
+
+    return candidates.pop(), timeframe
+
+
+def history_close_endpoints(historical_data: dict) -> tuple:
+    """First and last Close of a records or columnar historical response, or (None, None)"""
+    if not historical_data or not historical_data.get('data'):
+        return None, None
+    hist_list = historical_data.get('data')
+    if historical_data.get('format') == 'columnar':
+        # Columnar responses carry one array per column rather than per-row dicts
+        closes = hist_list.get('Close', [])
+        return (closes[0], closes[-1]) if closes else (None, None)
+    if isinstance(hist_list, list) and len(hist_list) > 0:
+        return hist_list[0].get('Close', 0), hist_list[-1].get('Close', 0)
+    return None, None
+
+
+# Indicator values format_indicators includes in the analysis prompt
+PROMPT_INDICATORS = (
+    "rsi_14", "macd", "macd_signal", "macd_hist", "sma_20", "sma_50", "sma_200", "bb_percent_b",
+    "volatility", "max_drawdown_pct", "vwap",
+)
+
+
+def format_indicators(indicators: dict) -> str:
+    """Compact prompt lines for a fetch_indicators response; empty when nothing is available"""
+    if not indicators:
+        return ""
+    latest = indicators.get('latest', {})
+    stats = indicators.get('period_stats', {})
+    lines = []
+
+    def add(label, value, fmt):
+        if value is not None:
+            lines.append(f"- {label}: {fmt.format(value)}")
+
+    add("RSI(14)", latest.get('rsi_14'), "{:.1f}")
+    if latest.get('macd') is not None and latest.get('macd_signal') is not None:
+        lines.append(f"- MACD: {latest['macd']:.2f} vs signal {latest['macd_signal']:.2f} (histogram {latest['macd_hist']:+.2f})")
+    moving_averages = [
+        f"{name.upper().replace('_', ' ')} ${latest[name]:.2f}"
+        for name in ('sma_20', 'sma_50', 'sma_200') if latest.get(name) is not None
+    ]
+    if moving_averages:
+        lines.append(f"- Moving averages: {', '.join(moving_averages)}")
+    add("Bollinger %B", latest.get('bb_percent_b'), "{:.2f}")
+    add("Annualized volatility", stats.get('volatility'), "{:.1%}")
+    add("Max drawdown", stats.get('max_drawdown_pct'), "{:.1f}%")
+    add("VWAP", stats.get('vwap'), "${:.2f}")
+    if not lines:
+        return ""
+    return f"\nTechnical Indicators ({indicators.get('period')}, {indicators.get('interval')} bars):\n" + "\n".join(lines) + "\n"
+
+def analysis_fingerprint(data: dict, historical_data: dict = None, indicators: dict = None) -> dict:
+    """Quantized snapshot of the numbers an analysis depends on, used in the analysis cache key"""
+    fingerprint = {
+        "price": quantize(data.get('price')),
+        "pe_ratio": quantize(data.get('pe_ratio')),
+    }
+    first_price, last_price = history_close_endpoints(historical_data)
+    if first_price and last_price:
+        fingerprint["change_pct"] = round((last_price - first_price) / first_price * 100)
+    if format_indicators(indicators):
+        # The values format_indicators puts in the prompt, so answers given without them aren't reused
+        values = {**indicators.get('latest', {}), **indicators.get('period_stats', {})}
+        fingerprint["indicators"] = {
+            "period": indicators.get('period'),
+            "interval": indicators.get('interval'),
+            **{name: quantize(values.get(name)) for name in PROMPT_INDICATORS if values.get(name) is not None},
+        }
+    return fingerprint
+
+
 class TickerParser:
-    def __init__(self):
-        api_key = os.environ.get("GROQ_API_KEY")
-        if not api_key:
-            raise ValueError("GROQ_API_KEY not found in environment variables")
-        self.client = Groq(api_key=api_key)
-        self.model = "llama-3.3-70b-versatile"
+    def __init__(self, backend=None):
+        # Groq by default; LLM_BACKEND selects the OpenAI-compatible or offline stub backend
+        self.backend = backend if backend is not None else create_backend()
+        self.model = self.backend.model
+
+        self._cache_lock = threading.Lock()
+        self._extraction_cache = OrderedDict()
+        self._extraction_cache_size = int(os.environ.get("TICKER_CACHE_SIZE", 1024))
+        self._extraction_cache_path = os.environ.get("TICKER_CACHE_PATH", DEFAULT_TICKER_CACHE_PATH)
+        self._extraction_counts = {"fast_path": 0, "cache_hits": 0, "llm_calls": 0}
+        self._load_extraction_cache()
+        self.last_stream_timing = None
+        self.analysis_cache = AnalysisCache()
+        # Cumulative LLM token usage of this parser, for comparing pipeline modes
+        self.token_usage = TokenBudget()
+
+    def _load_extraction_cache(self):
+        if not self._extraction_cache_path or not os.path.exists(self._extraction_cache_path):
+            return
+        try:
+            with open(self._extraction_cache_path) as f:
+                for key, value in json.load(f).items():
+                    # Earlier versions also stored misses as [null, null]
+                    if value and value[0]:
+                        self._extraction_cache[key] = tuple(value)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable ticker cache %s: %s", self._extraction_cache_path, e)
+
+    def _save_extraction_cache(self):
+        if not self._extraction_cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self._extraction_cache_path) or ".", exist_ok=True)
+            tmp_path = f"{self._extraction_cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({key: list(value) for key, value in self._extraction_cache.items()}, f)
+            os.replace(tmp_path, self._extraction_cache_path)
+        except OSError as e:
+            logger.warning("Failed to write ticker cache %s: %s", self._extraction_cache_path, e)
+
+    def get_extraction_stats(self) -> dict:
+        """Counts and rates for how extractions were resolved: fast path, cache, or LLM"""
+        with self._cache_lock:
+            stats = dict(self._extraction_counts)
+            stats["cache_size"] = len(self._extraction_cache)
+        total = stats["fast_path"] + stats["cache_hits"] + stats["llm_calls"]
+        stats["total"] = total
+        stats["fast_path_rate"] = round(stats["fast_path"] / total, 4) if total else 0.0
+        stats["cache_hit_rate"] = round(stats["cache_hits"] / total, 4) if total else 0.0
+        stats["llm_rate"] = round(stats["llm_calls"] / total, 4) if total else 0.0
+        return stats
 
     def extract_ticker_and_timeframe(self, user_input: str) -> tuple:
-        """Extract stock ticker and time period from natural language input using Groq LLM"""
+        """Extract stock ticker and time period, trying the local fast path and query cache before the LLM"""
+        with tracing.span("extract") as span:
+            return self._extract_ticker_and_timeframe(user_input, span)
+
+    def _extract_ticker_and_timeframe(self, user_input: str, span: dict) -> tuple:
+        fast = fast_extract_ticker_and_timeframe(user_input)
+        if fast is not None:
+            with self._cache_lock:
+                self._extraction_counts["fast_path"] += 1
+            logger.debug("Fast path extracted %s", fast)
+            span["source"] = "fast_path"
+            return fast
+
+        key = normalize_query(user_input)
+        with self._cache_lock:
+            cached = self._extraction_cache.get(key)
+            if cached is not None:
+                self._extraction_cache.move_to_end(key)
+                self._extraction_counts["cache_hits"] += 1
+            else:
+                self._extraction_counts["llm_calls"] += 1
+        if cached is not None:
+            logger.debug("Ticker cache hit for %r", key)
+            span["source"] = "cache"
+            return cached
+
+        span["source"] = "llm"
+        result = self._llm_extract_ticker_and_timeframe(user_input)
+        if result is None:
+            # The LLM call itself failed; don't cache a transient error
+            return None, None
+        if result[0] is None:
+            # Nor a miss: the company may be one the model resolves on a retry, and misses are rare anyway
+            return result
+
+        with self._cache_lock:
+            self._extraction_cache[key] = result
+            while len(self._extraction_cache) > self._extraction_cache_size:
+                self._extraction_cache.popitem(last=False)
+            self._save_extraction_cache()
+        return result
+
+    def _llm_extract_ticker_and_timeframe(self, user_input: str):
+        """Extract stock ticker and time period using the LLM backend; None if the call failed"""
         
+        company_mappings = ", ".join(f"{name}={ticker}" for name, ticker in COMPANY_TICKERS.items())
         prompt = f"""EXTRACT ONLY - NO EXPLANATIONS
 
 Extract the stock ticker and time period from this request.
 Return EXACTLY in this format: TICKER,TIMEFRAME
 
 Company ticker mappings:
-Tesla=TSLA, Apple=AAPL, Microsoft=MSFT, Amazon=AMZN, Google=GOOGL, Alphabet=GOOGL, Meta=META, Nvidia=NVDA, John Deere=DE, Toyota=TM, Ford=F, Coca Cola=KO, McDonald's=MCD, Netflix=NFLX, Uber=UBER, Adani Ports=ADANIPORTS
+{company_mappings}
 
 Time period mappings:
 past month OR this month OR 1 month=1mo
@@ -38,16 +299,17 @@ User: "{user_input}"
 Response: TICKER,TIMEFRAME"""
         
         try:
-            logger.debug(f"Calling Groq API to extract ticker and timeframe")
-            message = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=15,
-                temperature=0
-            )
-            response = message.choices[0].message.content.strip()
+            logger.debug(f"Calling {self.backend.name} LLM to extract ticker and timeframe")
+            with tracing.span("llm.extract", backend=self.backend.name):
+                result = self.backend.chat(
+                    messages=[
+                        {"role": "user", "content": prompt}
+                    ],
+                    max_tokens=15,
+                    temperature=0
+                )
+            self.token_usage.record(result.usage)
+            response = (result.content or "").strip()
             logger.debug(f"LLM response: {response}")
             
             if not response:
@@ -78,10 +340,10 @@ Response: TICKER,TIMEFRAME"""
                 
         except Exception as e:
             logger.error(f"LLM error: {e}", exc_info=True)
-            return None, None
+            return None
 
     def extract_ticker(self, user_input: str) -> str:
-        """Extract stock ticker from natural language input using Groq LLM"""
+        """Extract stock ticker from natural language input using the LLM backend"""
         prompt = f"""Extract the stock ticker symbol from the user's request. 
         Return ONLY the ticker symbol (e.g., AAPL, TSLA, GOOGL) with no additional text.
         If no valid ticker is found, return 'INVALID'.
@@ -91,24 +353,25 @@ Response: TICKER,TIMEFRAME"""
         Ticker:"""
         
         try:
-            logger.debug(f"Calling Groq API with model {self.model}")
-            message = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=10,
-                temperature=0
-            )
-            ticker = message.choices[0].message.content.strip().upper()
+            logger.debug(f"Calling {self.backend.name} LLM with model {self.model}")
+            with tracing.span("llm.extract", backend=self.backend.name):
+                result = self.backend.chat(
+                    messages=[
+                        {"role": "user", "content": prompt}
+                    ],
+                    max_tokens=10,
+                    temperature=0
+                )
+            self.token_usage.record(result.usage)
+            ticker = (result.content or "").strip().upper()
             logger.debug(f"Extracted ticker: {ticker}")
             return ticker if ticker != "INVALID" else None
         except Exception as e:
             logger.error(f"LLM error: {e}", exc_info=True)
             return None
 
-    def generate_analysis_summary(self, ticker: str, data: dict, user_query: str = None, historical_data: dict = None) -> str:
-        """Generate a contextual summary of stock data based on user's query using Groq LLM"""
+    def _build_analysis_prompt(self, ticker: str, data: dict, user_query: str = None, historical_data: dict = None,
+                               indicators: dict = None) -> str:
         # Format market cap safely
         market_cap = data.get('marketCap', 'N/A')
         if isinstance(market_cap, int):
@@ -146,16 +409,13 @@ Current Data:
 """
         
         # Add historical data if available
-        if historical_data and historical_data.get('data'):
-            hist_list = historical_data.get('data', [])
-            if isinstance(hist_list, list) and len(hist_list) > 0:
-                first_price = hist_list[0].get('Close', 0)
-                last_price = hist_list[-1].get('Close', 0)
-                period = historical_data.get('period', '1mo')
-                
-                if first_price and last_price:
-                    change = ((last_price - first_price) / first_price) * 100
-                    prompt += f"\nHistorical Performance ({period}): ${first_price:.2f} → ${last_price:.2f} ({change:+.1f}%)\n"
+        first_price, last_price = history_close_endpoints(historical_data)
+        if first_price and last_price:
+            period = historical_data.get('period', '1mo')
+            change = ((last_price - first_price) / first_price) * 100
+            prompt += f"\nHistorical Performance ({period}): ${first_price:.2f} → ${last_price:.2f} ({change:+.1f}%)\n"
+        
+        prompt += format_indicators(indicators)
         
         prompt += f"""
 Please provide a comprehensive and detailed analysis addressing the user's question. Include:
@@ -167,17 +427,92 @@ Please provide a comprehensive and detailed analysis addressing the user's quest
 6. Investment perspective (if relevant)
 
 Be thorough, informative, and use specific data points to support your analysis."""
+        return prompt
+
+    def _analysis_cache_key(self, ticker: str, data: dict, user_query: str = None, historical_data: dict = None,
+                            indicators: dict = None) -> str:
+        question = normalize_query(user_query) if user_query else ""
+        period = historical_data.get('period') if historical_data else None
+        return AnalysisCache.make_key(ticker, question, analysis_fingerprint(data, historical_data, indicators), period)
+
+    def generate_analysis_summary(self, ticker: str, data: dict, user_query: str = None, historical_data: dict = None,
+                                  indicators: dict = None) -> str:
+        """Generate a contextual summary of stock data based on user's query using the LLM backend"""
+        cache_key = self._analysis_cache_key(ticker, data, user_query, historical_data, indicators)
+        cached = self.analysis_cache.get(cache_key)
+        if cached is not None:
+            logger.debug("Analysis cache hit for %s", ticker)
+            return cached
+
+        prompt = self._build_analysis_prompt(ticker, data, user_query, historical_data, indicators)
+        
+        try:
+            with tracing.span("llm.analysis", backend=self.backend.name):
+                result = self.backend.chat(
+                    messages=[
+                        {"role": "user", "content": prompt}
+                    ],
+                    max_tokens=800,  # Increased from 350 to 800
+                    temperature=0.3
+                )
+            self.token_usage.record(result.usage)
+            summary = (result.content or "").strip()
+            self.analysis_cache.put(cache_key, ticker, summary)
+            return summary
+        except Exception as e:
+            logger.error(f"LLM error: {e}", exc_info=True)
+            return None
+
+    def stream_analysis_summary(self, ticker: str, data: dict, user_query: str = None, historical_data: dict = None,
+                                indicators: dict = None):
+        """Yield the analysis summary in chunks as the LLM produces them.
+
+        Timings for the finished stream are left in self.last_stream_timing
+        as {"time_to_first_token": seconds, "total": seconds, "cached": bool}.
+        """
+        started = time.perf_counter()
+        # Captured up front: the consumer may resume this generator from a different context
+        trace = tracing.current_trace()
+        cache_key = self._analysis_cache_key(ticker, data, user_query, historical_data, indicators)
+        cached = self.analysis_cache.get(cache_key)
+        if cached is not None:
+            elapsed = time.perf_counter() - started
+            self.last_stream_timing = {"time_to_first_token": elapsed, "total": elapsed, "cached": True}
+            if trace is not None:
+                trace.record("llm.analysis", elapsed, start=started, cached=True)
+            yield cached
+            return
+
+        prompt = self._build_analysis_prompt(ticker, data, user_query, historical_data, indicators)
+        self.last_stream_timing = {"time_to_first_token": None, "total": None, "cached": False}
+        parts = []
+        completed = False
         
         try:
-            message = self.client.chat.completions.create(
-                model=self.model,
+            stream = self.backend.stream_chat(
                 messages=[
                     {"role": "user", "content": prompt}
                 ],
-                max_tokens=800,  # Increased from 350 to 800
-                temperature=0.3
+                max_tokens=800,
+                temperature=0.3,
+                on_usage=self.token_usage.record
             )
-            return message.choices[0].message.content.strip()
+            for content in stream:
+                if self.last_stream_timing["time_to_first_token"] is None:
+                    self.last_stream_timing["time_to_first_token"] = time.perf_counter() - started
+                parts.append(content)
+                yield content
+            completed = True
         except Exception as e:
             logger.error(f"LLM error: {e}", exc_info=True)
-            return None
\ No newline at end of file
+        finally:
+            self.last_stream_timing["total"] = time.perf_counter() - started
+            if trace is not None:
+                first_token = self.last_stream_timing["time_to_first_token"]
+                trace.record(
+                    "llm.analysis", self.last_stream_timing["total"], start=started, backend=self.backend.name,
+                    first_token_ms=round(first_token * 1000, 1) if first_token is not None else None
+                )
+            # Only cache complete answers, not streams cut short by errors or a closed consumer
+            if completed:
+                self.analysis_cache.put(cache_key, ticker, "".join(parts).strip())
\ No newline at end of file
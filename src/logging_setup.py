@@ -0,0 +1,82 @@
+import os
+import queue
+import random
+import atexit
+import logging
+import logging.handlers
+
+LOG_FORMAT = '%(name)s - %(levelname)s - %(message)s'
+
+_listener = None
+
+
+def _start_listener(handler: logging.handlers.QueueHandler, target: logging.Handler):
+    global _listener
+    # A fresh queue per process: a forked worker must not share the parent's listener
+    handler.queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(handler.queue, target, respect_handler_level=True)
+    _listener.start()
+
+
+def _stop_listener():
+    global _listener
+    # QueueListener.stop() fails when called twice, e.g. at exit after an explicit stop
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def configure_logging(level: str = None):
+    """Configure root logging from LOG_LEVEL, optionally through a background queue (LOG_ASYNC=1)"""
+    level = (level or os.environ.get("LOG_LEVEL", "INFO")).upper()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+
+    if os.environ.get("LOG_ASYNC", "0").lower() in ("1", "true", "yes"):
+        queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+        _start_listener(queue_handler, stream_handler)
+        atexit.register(_stop_listener)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=lambda: _start_listener(queue_handler, stream_handler))
+        root.addHandler(queue_handler)
+    else:
+        root.addHandler(stream_handler)
+
+
+def summarize(value, depth: int = 0):
+    """Shape of a payload for logging: sizes of lists and strings instead of their contents"""
+    if isinstance(value, dict):
+        if depth >= 1:
+            return f"<dict {len(value)} keys>"
+        return {key: summarize(item, depth + 1) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return f"<list {len(value)} items>"
+    if isinstance(value, str) and len(value) > 40:
+        return f"<str {len(value)} chars>"
+    return value
+
+
+class RequestLogger:
+    """Structured, sampled one-line-per-request log; failed requests are always logged"""
+
+    def __init__(self, name: str = "request", sample_rate: float = None):
+        self.logger = logging.getLogger(name)
+        self.sample_rate = sample_rate if sample_rate is not None else float(
+            os.environ.get("REQUEST_LOG_SAMPLE_RATE", 1.0)
+        )
+
+    def log(self, method: str, path: str, status: int, duration: float, tool: str = None,
+            parameters: dict = None, response_bytes: int = None):
+        failed = status >= 400
+        if not failed and (not self.logger.isEnabledFor(logging.INFO) or random.random() >= self.sample_rate):
+            return
+        self.logger.log(
+            logging.WARNING if failed else logging.INFO,
+            "method=%s path=%s tool=%s status=%d duration_ms=%.1f response_bytes=%s params=%s",
+            method, path, tool, status, duration * 1000, response_bytes, summarize(parameters)
+        )
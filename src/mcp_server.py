@@ -1,88 +1,636 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, g, redirect
 import os
 import sys
+import json
+import math
+import time
 import logging
 import traceback
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import tracing
+from logging_setup import configure_logging, RequestLogger
+from metrics import REGISTRY
+from upstream_scheduler import get_scheduler, UpstreamError, INTERACTIVE, BATCH
 
 # Configure logging
-logging.basicConfig(level=logging.DEBUG, format='%(name)s - %(levelname)s - %(message)s')
+configure_logging()
 logger = logging.getLogger(__name__)
-
-sys.path.insert(0, os.path.dirname(__file__))
+request_logger = RequestLogger("mcp_server.requests")
 
 try:
-    from data_fetchers.yahoo_finance import YahooFinanceFetcher
+    from data_fetchers.yahoo_finance import (
+        YahooFinanceFetcher, HISTORY_FORMATS, HISTORY_INTERVALS, INDICATOR_LOOKBACK, PORTFOLIO_PERIODS
+    )
+    from data_fetchers.quote_cache import QuoteCache, QUOTE_FIELDS, PRICE_FIELDS
+    from data_fetchers.screener import Screener, SnapshotLoading, SORT_FIELDS, CATEGORY_FIELDS
+    from data_fetchers.prefetcher import Prefetcher
+    from data_fetchers.quote_stream import QuoteStream, StreamFull, STREAM_FIELDS
     logger.info("Successfully imported YahooFinanceFetcher")
 except ImportError as e:
-    logger.error(f"Failed to import YahooFinanceFetcher: {e}")
+    logger.error("Failed to import YahooFinanceFetcher: %s", e)
     logger.error(traceback.format_exc())
     YahooFinanceFetcher = None
+    HISTORY_FORMATS = ("records",)
+    HISTORY_INTERVALS = ()
+    INDICATOR_LOOKBACK = {}
+    PORTFOLIO_PERIODS = ()
+    QUOTE_FIELDS = ()
+    PRICE_FIELDS = ()
+    Screener = None
+    Prefetcher = None
+    QuoteStream = None
+
+scheduler = get_scheduler()
+quote_cache = QuoteCache({
+    "price": YahooFinanceFetcher.fetch_quote,
+    "profile": YahooFinanceFetcher.fetch_profile,
+}) if YahooFinanceFetcher is not None else None
+
+BATCH_MAX_TICKERS = int(os.environ.get("BATCH_MAX_TICKERS", 500))
+# Batches default to the price tier: a cold profile costs a second, much slower Yahoo call per ticker
+BATCH_DEFAULT_FIELDS = list(PRICE_FIELDS)
+batch_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("BATCH_MAX_WORKERS", 8)),
+    thread_name_prefix="batch-quote"
+)
+
+def unique_tickers(tickers: list) -> list:
+    # De-duplicate while keeping the caller's order
+    return list(dict.fromkeys(t.strip().upper() for t in tickers if t and t.strip()))
+
+def batch_admission_error(tickers: list, fields: list):
+    """An error response when the batch's cold quotes can't all be loaded within the batch deadline, else None.
+
+    Rejecting up front beats queueing calls that would end in per-ticker
+    deadline errors: a 400 when the batch could never fit, a 429 with
+    Retry-After when it fits once the Yahoo token bucket has refilled.
+    """
+    loads = sum(len(quote_cache.cold_classes(ticker, fields)) for ticker in unique_tickers(tickers))
+    yahoo = scheduler.upstream("yahoo")
+    most = yahoo.capacity(scheduler.batch_wait, full=True)
+    if loads > most:
+        logger.warning("Rejected batch needing %s Yahoo calls; at most %s fit in the batch deadline", loads, int(most))
+        return jsonify({
+            "error": f"batch needs {loads} Yahoo calls but at most {int(most)} fit in the "
+                     f"{scheduler.batch_wait:.0f}s batch deadline; request fewer tickers or only price fields"
+        }), 400
+    available = yahoo.capacity(scheduler.batch_wait)
+    if loads > available:
+        retry_after = math.ceil((loads - available) / yahoo.rate)
+        logger.warning("Deferred batch needing %s Yahoo calls for %ss", loads, retry_after)
+        response = jsonify({
+            "error": f"batch needs {loads} Yahoo calls but only {int(available)} are available now",
+            "upstream": "yahoo",
+            "retry_after": retry_after,
+        })
+        response.headers["Retry-After"] = str(retry_after)
+        return response, 429
+    return None
+
+def fetch_stock_data_batch(tickers: list, fields: list = None) -> dict:
+    unique = unique_tickers(tickers)
+    # Run each fetch in a copy of the caller's context so it keeps the request's upstream priority and deadline
+    futures = {
+        ticker: batch_executor.submit(contextvars.copy_context().run, quote_cache.get, ticker, fields)
+        for ticker in unique
+    }
+
+    results, errors = {}, {}
+    for ticker, future in futures.items():
+        try:
+            results[ticker] = future.result()
+        except Exception as e:
+            logger.error("Error fetching stock price for %s in batch: %s", ticker, str(e))
+            errors[ticker] = str(e)
+
+    return {"results": results, "errors": errors, "requested": len(unique)}
+
+def parse_quote_fields(fields) -> list:
+    """Validated quote field names from a list or comma-separated string; None selects every field"""
+    if fields is None:
+        return None
+    if isinstance(fields, str):
+        fields = [field.strip() for field in fields.split(",") if field.strip()]
+    if not isinstance(fields, list) or not fields or not all(isinstance(field, str) for field in fields):
+        raise ValueError("fields must be a non-empty list of field names")
+    unknown = sorted(set(fields) - set(QUOTE_FIELDS))
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(unknown)}; expected any of {', '.join(QUOTE_FIELDS)}")
+    return fields
+
+def screener_quote(ticker: str) -> dict:
+    # Snapshot refreshes are background work and queue behind interactive requests
+    with scheduler.request(BATCH):
+        # A warming load: refresh traffic must not count as lookups in the cache hit rate
+        return quote_cache.warm(ticker, 0)
+
+screener = Screener(
+    screener_quote,
+    ThreadPoolExecutor(max_workers=int(os.environ.get("SCREENER_MAX_WORKERS", 4)), thread_name_prefix="screener")
+) if quote_cache is not None else None
+# Daily bars kept warm per prefetched ticker; 5y covers every history and indicator period up to 1y
+PREFETCH_HISTORY_PERIOD = os.environ.get("PREFETCH_HISTORY_PERIOD", "5y")
+
+def prefetch_quote(ticker: str):
+    # Warming is background work and queues behind interactive requests
+    with scheduler.request(BATCH):
+        quote_cache.warm(ticker, ahead=prefetcher.interval)
+
+def prefetch_history(tickers: list):
+    with scheduler.request(BATCH):
+        YahooFinanceFetcher.prefetch_history(tickers, PREFETCH_HISTORY_PERIOD)
+
+prefetcher = Prefetcher(
+    prefetch_quote,
+    prefetch_history,
+    ThreadPoolExecutor(max_workers=int(os.environ.get("PREFETCH_MAX_WORKERS", 2)), thread_name_prefix="prefetch")
+) if quote_cache is not None else None
+
+QUOTE_STREAM_MAX_TICKERS = int(os.environ.get("QUOTE_STREAM_MAX_TICKERS", 20))
+QUOTE_STREAM_HEARTBEAT = float(os.environ.get("QUOTE_STREAM_HEARTBEAT_SECONDS", 15))
+
+def stream_quote(ticker: str) -> dict:
+    # Polls are background work; the price is reloaded once it is older than one poll interval
+    with scheduler.request(BATCH):
+        return quote_cache.warm(
+            ticker, ahead=max(0.0, quote_cache.ttls["price"] - quote_stream.interval), fields=STREAM_FIELDS
+        )
+
+# Each open stream holds a server thread. serve.py raises the limit in its dedicated stream process;
+# when streams are served in-process, by default they may take half of a worker's threads
+quote_stream = QuoteStream(
+    stream_quote,
+    max_subscribers=int(os.environ.get(
+        "QUOTE_STREAM_MAX_SUBSCRIBERS", max(1, int(os.environ.get("MCP_THREADS", 4)) // 2)
+    ))
+) if quote_cache is not None else None
+
+def requested_tickers(parameters) -> list:
+    """Tickers a tool call asks about, counted towards prefetch popularity"""
+    if not isinstance(parameters, dict):
+        return []
+    tickers = []
+    if isinstance(parameters.get("ticker"), str):
+        tickers.append(parameters["ticker"])
+    if isinstance(parameters.get("tickers"), list):
+        tickers.extend(t for t in parameters["tickers"] if isinstance(t, str))
+    if isinstance(parameters.get("holdings"), dict):
+        tickers.extend(parameters["holdings"])
+    return [t.strip().upper() for t in tickers if t.strip()]
+
+SCREENER_RANGES = {
+    "price": ("min_price", "max_price"),
+    "marketCap": ("min_market_cap", "max_market_cap"),
+    "pe_ratio": ("min_pe", "max_pe"),
+}
+
+TOOL_SECONDS = REGISTRY.histogram(
+    "financehub_tool_request_duration_seconds", "Duration of /tool_call requests by tool and status", ("tool", "status")
+)
+HTTP_REQUESTS = REGISTRY.counter("financehub_http_requests_total", "HTTP requests by path and status", ("path", "status"))
+
+def cache_metrics() -> list:
+    families = []
+    if quote_cache is not None:
+        stats = quote_cache.stats()
+        classes = stats["classes"]
+        families.append(("financehub_quote_cache_lookups_total", "counter", "Quote cache lookups by field class and result", [
+            ({"field_class": cls, "result": result}, counters[result])
+            for cls, counters in classes.items() for result in ("hits", "misses", "coalesced")
+        ]))
+        families.append(("financehub_quote_cache_prefetches_total", "counter", "Quote loads made by the prefetcher by field class", [
+            ({"field_class": cls}, counters["prefetches"]) for cls, counters in classes.items()
+        ]))
+        families.append(("financehub_quote_cache_evictions_total", "counter", "Quotes evicted from the LRU", [({}, stats["evictions"])]))
+        families.append(("financehub_quote_cache_errors_total", "counter", "Upstream errors while loading quotes by field class", [
+            ({"field_class": cls}, counters["errors"]) for cls, counters in classes.items()
+        ]))
+        families.append(("financehub_quote_cache_entries", "gauge", "Quotes currently cached", [({}, stats["size"])]))
+    if prefetcher is not None:
+        stats = prefetcher.stats()
+        last_pass = stats["last_pass"] or {}
+        families.append(("financehub_prefetch_targets", "gauge", "Tickers kept warm by the prefetcher", [({}, len(stats["targets"]))]))
+        families.append(("financehub_prefetch_last_pass_seconds", "gauge", "Duration of the last prefetch pass", [({}, last_pass.get("seconds"))]))
+        families.append(("financehub_prefetch_last_pass_errors", "gauge", "Failed fetches in the last prefetch pass", [({}, len(last_pass["errors"]) if last_pass else None)]))
+    if quote_stream is not None:
+        stats = quote_stream.stats()
+        families.append(("financehub_quote_stream_subscribers", "gauge", "Open quote stream connections", [({}, stats["subscribers"])]))
+        families.append(("financehub_quote_stream_pollers", "gauge", "Tickers polled for quote stream subscribers", [({}, len(stats["pollers"]))]))
+    if screener is not None:
+        stats = screener.stats()
+        families.append(("financehub_screener_snapshot_tickers", "gauge", "Tickers in the fundamentals snapshot", [({}, stats["snapshot_size"])]))
+        families.append(("financehub_screener_snapshot_age_seconds", "gauge", "Age of the fundamentals snapshot", [({}, stats["age_seconds"])]))
+    return families
+
+def upstream_metrics() -> list:
+    stats = scheduler.stats()
+    counters = ("granted", "deadline_exceeded", "rate_limited", "retries", "errors")
+    families = [
+        (f"financehub_upstream_{name}_total", "counter", f"Upstream calls {name.replace('_', ' ')}",
+         [({"upstream": upstream}, values[name]) for upstream, values in stats.items()])
+        for name in counters
+    ]
+    families.append(("financehub_upstream_in_flight", "gauge", "Upstream calls in progress",
+                     [({"upstream": upstream}, values["in_flight"]) for upstream, values in stats.items()]))
+    families.append(("financehub_upstream_queued", "gauge", "Calls waiting for an upstream slot",
+                     [({"upstream": upstream}, values["queued"]) for upstream, values in stats.items()]))
+    return families
+
+REGISTRY.register_collector(cache_metrics)
+REGISTRY.register_collector(upstream_metrics)
+
+def upstream_error_response(error: UpstreamError):
+    """429 when Yahoo is throttling us, 503 when the request timed out waiting for an upstream slot"""
+    logger.warning("Upstream %s unavailable: %s", error.upstream, error)
+    response = jsonify({"error": str(error), "upstream": error.upstream, "retry_after": error.retry_after})
+    if error.retry_after:
+        response.headers["Retry-After"] = str(max(1, int(round(error.retry_after))))
+    return response, error.status_code
 
 app = Flask(__name__)
 
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    # Stages recorded while handling the request are returned in the Server-Timing header
+    g.trace = tracing.start_trace(request.path)
+    if prefetcher is not None:
+        prefetcher.ensure_running()
+    REGISTRY.ensure_flushing()
+
+@app.after_request
+def log_request(response):
+    payload = request.get_json(silent=True) if request.method == "POST" else None
+    payload = payload if isinstance(payload, dict) else {}
+    duration = time.perf_counter() - g.get("request_started", time.perf_counter())
+    HTTP_REQUESTS.inc(path=request.url_rule.rule if request.url_rule else "unmatched", status=response.status_code)
+    if g.get("tool"):
+        TOOL_SECONDS.observe(duration, tool=g.tool, status=response.status_code)
+    if g.get("trace") is not None:
+        response.headers["Server-Timing"] = g.trace.server_timing(total=duration)
+    if prefetcher is not None and response.status_code == 200 and g.get("tickers"):
+        prefetcher.record(g.tickers)
+    request_logger.log(
+        request.method,
+        request.path,
+        response.status_code,
+        duration,
+        tool=payload.get("name"),
+        parameters=payload.get("parameters"),
+        # Measuring a streamed body would buffer it, which never finishes for event streams
+        response_bytes=None if response.is_streamed else response.calculate_content_length()
+    )
+    return response
+
 @app.route("/health", methods=["GET"])
 def health_check():
     return jsonify({"status": "ok"})
 
+@app.route("/stats", methods=["GET"])
+def stats():
+    return jsonify({
+        "quote_cache": quote_cache.stats() if quote_cache is not None else None,
+        "upstreams": scheduler.stats(),
+        "screener": screener.stats() if screener is not None else None,
+        "prefetcher": prefetcher.stats() if prefetcher is not None else None,
+        "quote_stream": quote_stream.stats() if quote_stream is not None else None
+    })
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/stream/quotes", methods=["GET"])
+def stream_quotes():
+    """Server-sent events for ?tickers=A,B: a "quote" event per price change, an "error" event per failed poll"""
+    tickers = [t for t in request.args.get("tickers", "").split(",") if t.strip()]
+    if not tickers:
+        return jsonify({"error": "tickers parameter is required"}), 400
+    if len(tickers) > QUOTE_STREAM_MAX_TICKERS:
+        return jsonify({"error": f"at most {QUOTE_STREAM_MAX_TICKERS} tickers per stream"}), 400
+    if quote_stream is None:
+        logger.error("QuoteStream is None")
+        return jsonify({"error": "Quote stream not loaded"}), 500
+    stream_port = app.config.get("QUOTE_STREAM_PORT")
+    if stream_port:
+        # Streams live in serve.py's single stream process, where all viewers share one poller per ticker
+        host = request.host.rsplit(":", 1)[0] if not request.host.endswith("]") else request.host
+        return redirect(f"{request.scheme}://{host}:{stream_port}{request.full_path}", code=307)
+
+    try:
+        subscription = quote_stream.subscribe(tickers)
+    except StreamFull as e:
+        logger.warning("Rejected quote stream: %s", e)
+        response = jsonify({"error": str(e)})
+        response.headers["Retry-After"] = str(int(QUOTE_STREAM_HEARTBEAT))
+        return response, 503
+
+    def events():
+        try:
+            # Tells EventSource clients how long to wait before reconnecting
+            yield "retry: 5000\n\n"
+            while True:
+                published = subscription.get(timeout=QUOTE_STREAM_HEARTBEAT)
+                if not published:
+                    # Comment line: keeps proxies from closing an idle stream and surfaces disconnects
+                    yield ": keepalive\n\n"
+                for event in published:
+                    yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            subscription.close()
+
+    response = Response(events(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    # A generator that never started won't run its finally block
+    response.call_on_close(subscription.close)
+    return response
+
 @app.route("/tool_call", methods=["POST"])
 def tool_call():
-    logger.debug(f"Received request: {request.json}")
-    
     if not request.json:
         logger.error("No JSON in request")
         return jsonify({"error": "invalid request"}), 400
     
     tool_name = request.json.get("name")
     parameters = request.json.get("parameters", {})
-    logger.debug(f"Tool name: {tool_name}, Parameters: {parameters}")
+    g.tool = tool_name
+    # Single-ticker calls are interactive unless the caller marks them as background work
+    priority = BATCH if request.json.get("priority") == "batch" else INTERACTIVE
+    # Background work doesn't say what users look at, so only interactive calls count towards popularity
+    g.tickers = requested_tickers(parameters) if priority == INTERACTIVE else []
+    logger.debug("Tool name: %s", tool_name)
 
     if tool_name == "fetch_stock_data":
         ticker = parameters.get("ticker")
         if not ticker:
             logger.error("No ticker provided")
             return jsonify({"error": "ticker parameter is required"}), 400
+        try:
+            fields = parse_quote_fields(parameters.get("fields"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
         try:
-            logger.info(f"Fetching stock data for {ticker}")
+            logger.debug("Fetching stock data for %s", ticker)
             if YahooFinanceFetcher is None:
                 logger.error("YahooFinanceFetcher is None")
                 return jsonify({"error": "YahooFinanceFetcher not loaded"}), 500
-            data = YahooFinanceFetcher.fetch_stock_price(ticker)
-            logger.info(f"Successfully fetched data for {ticker}: {data}")
+            with scheduler.request(priority):
+                data = quote_cache.get(ticker, fields)
+            logger.debug("Successfully fetched data for %s", ticker)
             return jsonify({"data": data})
+        except UpstreamError as e:
+            return upstream_error_response(e)
         except Exception as e:
-            logger.error(f"Error fetching stock price: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.error("Error fetching stock price: %s", str(e))
+            logger.debug("%s", traceback.format_exc())
             return jsonify({"error": str(e), "details": traceback.format_exc()}), 500
     
+    elif tool_name == "fetch_stock_data_batch":
+        tickers = parameters.get("tickers")
+        if not tickers or not isinstance(tickers, list):
+            logger.error("No tickers provided")
+            return jsonify({"error": "tickers parameter must be a non-empty list"}), 400
+        if len(tickers) > BATCH_MAX_TICKERS:
+            logger.error("Batch of %s tickers exceeds limit of %s", len(tickers), BATCH_MAX_TICKERS)
+            return jsonify({"error": f"at most {BATCH_MAX_TICKERS} tickers per batch"}), 400
+        if not all(isinstance(t, str) for t in tickers):
+            return jsonify({"error": "tickers must be strings"}), 400
+        try:
+            fields = parse_quote_fields(parameters.get("fields")) or BATCH_DEFAULT_FIELDS
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        try:
+            logger.debug("Fetching stock data batch for %s tickers", len(tickers))
+            if YahooFinanceFetcher is None:
+                logger.error("YahooFinanceFetcher is None")
+                return jsonify({"error": "YahooFinanceFetcher not loaded"}), 500
+            rejected = batch_admission_error(tickers, fields)
+            if rejected is not None:
+                return rejected
+            with scheduler.request(BATCH):
+                data = fetch_stock_data_batch(tickers, fields)
+            logger.debug("Fetched batch: %s ok, %s failed", len(data['results']), len(data['errors']))
+            return jsonify({"data": data})
+        except UpstreamError as e:
+            return upstream_error_response(e)
+        except Exception as e:
+            logger.error("Error fetching stock data batch: %s", str(e))
+            logger.debug("%s", traceback.format_exc())
+            return jsonify({"error": str(e), "details": traceback.format_exc()}), 500
+
     elif tool_name == "fetch_historical_data":
         ticker = parameters.get("ticker")
         period = parameters.get("period", "1mo")
+        format = parameters.get("format", "records")
+        interval = parameters.get("interval")
+        max_points = parameters.get("max_points")
         
         if not ticker:
             logger.error("No ticker provided")
             return jsonify({"error": "ticker parameter is required"}), 400
+        if format not in HISTORY_FORMATS:
+            return jsonify({"error": f"format must be one of {', '.join(HISTORY_FORMATS)}"}), 400
+        if interval is not None and interval not in HISTORY_INTERVALS:
+            return jsonify({"error": f"interval must be one of {', '.join(HISTORY_INTERVALS)}"}), 400
+        if max_points is not None and (not isinstance(max_points, int) or isinstance(max_points, bool) or max_points < 0):
+            return jsonify({"error": "max_points must be a non-negative integer"}), 400
         
         try:
-            logger.info(f"Fetching historical data for {ticker} with period {period}")
+            logger.debug("Fetching historical data for %s with period %s", ticker, period)
             
             if YahooFinanceFetcher is None:
                 logger.error("YahooFinanceFetcher is None")
                 return jsonify({"error": "YahooFinanceFetcher not loaded"}), 500
             
-            data = YahooFinanceFetcher.fetch_historical_data(ticker, period)
-            logger.info(f"Successfully fetched historical data for {ticker}")
+            with scheduler.request(priority):
+                data = YahooFinanceFetcher.fetch_historical_data(ticker, period, format, interval, max_points)
+            logger.debug("Successfully fetched historical data for %s", ticker)
             return jsonify({"data": data})
+        except UpstreamError as e:
+            return upstream_error_response(e)
         except Exception as e:
-            logger.error(f"Error fetching historical data: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.error("Error fetching historical data: %s", str(e))
+            logger.debug("%s", traceback.format_exc())
             return jsonify({"error": str(e), "details": traceback.format_exc()}), 500
     
+    elif tool_name == "fetch_historical_data_batch":
+        tickers = parameters.get("tickers")
+        period = parameters.get("period", "1mo")
+        format = parameters.get("format", "records")
+        interval = parameters.get("interval")
+        max_points = parameters.get("max_points")
+
+        if format not in HISTORY_FORMATS:
+            return jsonify({"error": f"format must be one of {', '.join(HISTORY_FORMATS)}"}), 400
+        if interval is not None and interval not in HISTORY_INTERVALS:
+            return jsonify({"error": f"interval must be one of {', '.join(HISTORY_INTERVALS)}"}), 400
+        if max_points is not None and (not isinstance(max_points, int) or isinstance(max_points, bool) or max_points < 0):
+            return jsonify({"error": "max_points must be a non-negative integer"}), 400
+        if not tickers or not isinstance(tickers, list):
+            logger.error("No tickers provided")
+            return jsonify({"error": "tickers parameter must be a non-empty list"}), 400
+        if len(tickers) > BATCH_MAX_TICKERS:
+            logger.error("Batch of %s tickers exceeds limit of %s", len(tickers), BATCH_MAX_TICKERS)
+            return jsonify({"error": f"at most {BATCH_MAX_TICKERS} tickers per batch"}), 400
+        if not all(isinstance(t, str) for t in tickers):
+            return jsonify({"error": "tickers must be strings"}), 400
+
+        try:
+            logger.debug("Fetching historical data batch for %s tickers with period %s", len(tickers), period)
+
+            if YahooFinanceFetcher is None:
+                logger.error("YahooFinanceFetcher is None")
+                return jsonify({"error": "YahooFinanceFetcher not loaded"}), 500
+
+            with scheduler.request(BATCH):
+                data = YahooFinanceFetcher.fetch_historical_data_batch(tickers, period, format, interval, max_points)
+            logger.debug("Fetched historical batch: %s ok, %s failed", len(data['results']), len(data['errors']))
+            return jsonify({"data": data})
+        except UpstreamError as e:
+            return upstream_error_response(e)
+        except Exception as e:
+            logger.error("Error fetching historical data batch: %s", str(e))
+            logger.debug("%s", traceback.format_exc())
+            return jsonify({"error": str(e), "details": traceback.format_exc()}), 500
+
+    elif tool_name == "fetch_indicators":
+        ticker = parameters.get("ticker")
+        period = parameters.get("period", "6mo")
+        series = parameters.get("series", False)
+
+        if not ticker:
+            logger.error("No ticker provided")
+            return jsonify({"error": "ticker parameter is required"}), 400
+        if period not in INDICATOR_LOOKBACK:
+            return jsonify({"error": f"period must be one of {', '.join(INDICATOR_LOOKBACK)}"}), 400
+        if not isinstance(series, bool):
+            return jsonify({"error": "series must be a boolean"}), 400
+
+        try:
+            logger.debug("Fetching indicators for %s with period %s", ticker, period)
+
+            if YahooFinanceFetcher is None:
+                logger.error("YahooFinanceFetcher is None")
+                return jsonify({"error": "YahooFinanceFetcher not loaded"}), 500
+
+            with scheduler.request(priority):
+                data = YahooFinanceFetcher.fetch_indicators(ticker, period, series)
+            logger.debug("Successfully computed indicators for %s", ticker)
+            return jsonify({"data": data})
+        except UpstreamError as e:
+            return upstream_error_response(e)
+        except Exception as e:
+            logger.error("Error computing indicators: %s", str(e))
+            logger.debug("%s", traceback.format_exc())
+            return jsonify({"error": str(e), "details": traceback.format_exc()}), 500
+
+    elif tool_name == "fetch_portfolio_analytics":
+        holdings = parameters.get("holdings")
+        period = parameters.get("period", "1y")
+        benchmark = parameters.get("benchmark", "^GSPC")
+        confidence = parameters.get("confidence", 0.95)
+        include_matrices = parameters.get("include_matrices")
+
+        if not holdings or not isinstance(holdings, dict):
+            logger.error("No holdings provided")
+            return jsonify({"error": "holdings parameter must be a non-empty object of ticker: weight"}), 400
+        if len(holdings) > BATCH_MAX_TICKERS:
+            logger.error("Portfolio of %s holdings exceeds limit of %s", len(holdings), BATCH_MAX_TICKERS)
+            return jsonify({"error": f"at most {BATCH_MAX_TICKERS} holdings per portfolio"}), 400
+        if not all(isinstance(w, (int, float)) and not isinstance(w, bool) for w in holdings.values()):
+            return jsonify({"error": "holding weights must be numbers"}), 400
+        if period not in PORTFOLIO_PERIODS:
+            return jsonify({"error": f"period must be one of {', '.join(PORTFOLIO_PERIODS)}"}), 400
+        if benchmark is not None and not isinstance(benchmark, str):
+            return jsonify({"error": "benchmark must be a ticker string"}), 400
+        if not isinstance(confidence, (int, float)) or not 0.5 <= confidence < 1:
+            return jsonify({"error": "confidence must be between 0.5 and 1"}), 400
+        if include_matrices is not None and not isinstance(include_matrices, bool):
+            return jsonify({"error": "include_matrices must be a boolean"}), 400
+
+        try:
+            logger.debug("Computing portfolio analytics for %s holdings with period %s", len(holdings), period)
+
+            if YahooFinanceFetcher is None:
+                logger.error("YahooFinanceFetcher is None")
+                return jsonify({"error": "YahooFinanceFetcher not loaded"}), 500
+
+            with scheduler.request(priority):
+                data = YahooFinanceFetcher.fetch_portfolio_analytics(
+                    holdings, period, benchmark, confidence, include_matrices
+                )
+            logger.debug("Computed portfolio analytics: %s holdings, %s dropped", len(data['holdings']), len(data['errors']))
+            return jsonify({"data": data})
+        except UpstreamError as e:
+            return upstream_error_response(e)
+        except Exception as e:
+            logger.error("Error computing portfolio analytics: %s", str(e))
+            logger.debug("%s", traceback.format_exc())
+            return jsonify({"error": str(e), "details": traceback.format_exc()}), 500
+
+    elif tool_name == "screen_stocks":
+        ranges = {}
+        for field, (low_name, high_name) in SCREENER_RANGES.items():
+            low, high = parameters.get(low_name), parameters.get(high_name)
+            for name, value in ((low_name, low), (high_name, high)):
+                if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+                    return jsonify({"error": f"{name} must be a number"}), 400
+            ranges[field] = (low, high)
+        categories = {}
+        for field in CATEGORY_FIELDS:
+            value = parameters.get(field)
+            if value is None:
+                continue
+            values = [value] if isinstance(value, str) else value
+            if not isinstance(values, list) or not values or not all(isinstance(v, str) for v in values):
+                return jsonify({"error": f"{field} must be a string or a list of strings"}), 400
+            categories[field] = values
+        sort_by = parameters.get("sort_by", "marketCap")
+        descending = parameters.get("descending", True)
+        limit = parameters.get("limit", 25)
+
+        if sort_by not in SORT_FIELDS:
+            return jsonify({"error": f"sort_by must be one of {', '.join(SORT_FIELDS)}"}), 400
+        if not isinstance(descending, bool):
+            return jsonify({"error": "descending must be a boolean"}), 400
+        if isinstance(limit, bool) or not isinstance(limit, int) or not 1 <= limit <= BATCH_MAX_TICKERS:
+            return jsonify({"error": f"limit must be an integer between 1 and {BATCH_MAX_TICKERS}"}), 400
+
+        try:
+            if screener is None:
+                logger.error("Screener is None")
+                return jsonify({"error": "Screener not loaded"}), 500
+
+            data = screener.screen(
+                ranges=ranges, categories=categories, sort_by=sort_by, descending=descending, limit=limit
+            )
+            logger.debug("Screen matched %s of %s tickers", data["matches"], data["snapshot_size"])
+            return jsonify({"data": data})
+        except SnapshotLoading as e:
+            # 503 with Retry-After so clients retry instead of reading "no matches"
+            response = jsonify({"error": str(e), "status": "loading", "retry_after": e.retry_after})
+            response.headers["Retry-After"] = str(max(1, int(round(e.retry_after))))
+            return response, 503
+        except Exception as e:
+            logger.error("Error screening stocks: %s", str(e))
+            logger.debug("%s", traceback.format_exc())
+            return jsonify({"error": str(e), "details": traceback.format_exc()}), 500
+
     else:
-        logger.error(f"Unknown tool name: {tool_name}")
+        logger.error("Unknown tool name: %s", tool_name)
+        # Keep arbitrary client-supplied names out of the metric labels
+        g.tool = "unknown"
         return jsonify({"error": "unknown tool name"}), 400
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5001))
-    logger.info(f"Starting server on port {port}")
-    app.run(host="0.0.0.0", port=port, debug=True)
\ No newline at end of file
+    debug = os.environ.get("FLASK_DEBUG", "0").lower() in ("1", "true", "yes")
+    logger.info("Starting development server on port %s (use serve.py in production)", port)
+    app.run(host="0.0.0.0", port=port, debug=debug, threaded=True)
\ No newline at end of file
@@ -0,0 +1,268 @@
+import os
+import re
+import json
+import math
+import time
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from cache hits up to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Per-process snapshot files in a shared metrics directory; nothing else there is read or removed
+SNAPSHOT_NAME = "metrics-{pid}.json"
+SNAPSHOT_PATTERN = re.compile(r"metrics-(\d+)\.json")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> list:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in values]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels, rendered in the Prometheus text format"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> list:
+        with self._lock:
+            series = sorted((key, dict(value, counts=list(value["counts"]))) for key, value in self._series.items())
+        samples = []
+        for key, value in series:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, value["counts"]):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", dict(labels, le=_number(bound)), cumulative))
+            samples.append((f"{self.name}_sum", labels, value["sum"]))
+            samples.append((f"{self.name}_count", labels, value["count"]))
+        return samples
+
+
+class Registry:
+    """Named metrics plus collectors that report point-in-time values (cache counters, queue depths) at scrape time.
+
+    A collector returns [(name, kind, help, [(labels dict, value)])].
+
+    Under gunicorn every worker has its own registry behind one port, so
+    serve.py calls share() with a directory. Each process then writes a
+    snapshot there every flush_interval seconds, and any worker's scrape
+    merges them: counters and histograms are summed over every process
+    that has run, including exited ones, and gauges of live processes are
+    reported with a pid label.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self.directory = None
+        self.flush_interval = None
+        self._flushing_pid = None
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: tuple = ()) -> Counter:
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def histogram(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labelnames, buckets)
+
+    def register_collector(self, collector):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def collect(self) -> list:
+        """[(name, kind, help, [(sample name, labels dict, value)])] for this process"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        families = [(metric.name, metric.kind, metric.help, metric.samples()) for metric in metrics]
+        for collector in collectors:
+            for name, kind, help, samples in collector():
+                families.append((name, kind, help, [
+                    (name, dict(labels), value) for labels, value in samples if value is not None
+                ]))
+        return families
+
+    def share(self, directory: str, flush_interval: float = None):
+        """Aggregate metrics across processes through snapshots in directory; call before forking workers"""
+        os.makedirs(directory, exist_ok=True)
+        # Snapshots of a previous run would be summed into this one's counters
+        for filename in os.listdir(directory):
+            if SNAPSHOT_PATTERN.fullmatch(filename):
+                os.remove(os.path.join(directory, filename))
+        self.directory = directory
+        self.flush_interval = (
+            flush_interval if flush_interval is not None else float(os.environ.get("METRICS_FLUSH_SECONDS", 5))
+        )
+
+    def ensure_flushing(self):
+        """Start this process's snapshot writer if metrics are shared. Cheap enough to call per request."""
+        pid = os.getpid()
+        if self.directory is None or self._flushing_pid == pid:
+            return
+        with self._lock:
+            if self._flushing_pid == pid:
+                return
+            self._flushing_pid = pid
+        threading.Thread(target=self._flush_forever, name="metrics-flush", daemon=True).start()
+        # Keep the last increments of a worker that exits, e.g. after max_requests
+        atexit.register(self.flush)
+
+    def _flush_forever(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        if self.directory is None:
+            return
+        path = os.path.join(self.directory, SNAPSHOT_NAME.format(pid=os.getpid()))
+        try:
+            # Write then rename so a scrape never reads a partial snapshot
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.collect(), f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Failed to write metrics snapshot to %s: %s", path, e)
+
+    def _snapshots(self) -> list:
+        """(pid, families, live) for every process's snapshot, this one freshly collected first"""
+        own_pid = os.getpid()
+        snapshots = [(own_pid, self.collect(), True)]
+        stale_before = time.time() - 3 * self.flush_interval
+        for filename in sorted(os.listdir(self.directory)):
+            match = SNAPSHOT_PATTERN.fullmatch(filename)
+            if match is None or int(match.group(1)) == own_pid:
+                continue
+            path = os.path.join(self.directory, filename)
+            try:
+                live = os.path.getmtime(path) >= stale_before
+                with open(path) as f:
+                    snapshots.append((int(match.group(1)), json.load(f), live))
+            except (OSError, ValueError) as e:
+                logger.warning("Skipping unreadable metrics snapshot %s: %s", path, e)
+        return snapshots
+
+    def _merged(self) -> list:
+        families = {}
+        for pid, snapshot, live in self._snapshots():
+            for name, kind, help, samples in snapshot:
+                family = families.setdefault(name, (kind, help, {}))
+                merged = family[2]
+                for sample_name, labels, value in samples:
+                    if kind == "gauge":
+                        # Point-in-time values don't add up across processes, and exited ones have none
+                        if not live:
+                            continue
+                        labels = dict(labels, pid=str(pid))
+                    key = (sample_name, tuple(labels.items()))
+                    merged[key] = merged.get(key, 0) + value
+        return [
+            (name, kind, help, [(sample_name, dict(labels), value) for (sample_name, labels), value in merged.items()])
+            for name, (kind, help, merged) in families.items()
+        ]
+
+    def render(self) -> str:
+        families = self._merged() if self.directory is not None else self.collect()
+        lines = []
+        for name, kind, help, samples in families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{_labels(tuple(labels), tuple(labels.values()))} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "financehub_stage_duration_seconds", "Time spent in internal processing stages", ("stage",)
+)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a processing stage into the stage histogram and the active query trace"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        tracing.record(name, elapsed, start=started)
@@ -0,0 +1,112 @@
+import os
+import json
+import math
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ANALYSIS_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".financehub", "analysis_cache.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    key TEXT PRIMARY KEY,
+    ticker TEXT NOT NULL,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS analyses_accessed_at ON analyses (accessed_at);
+"""
+
+
+def quantize(value, significant_digits: int = 3):
+    """Round a number to a few significant digits so tiny ticks map to the same cache key"""
+    if not isinstance(value, (int, float)) or isinstance(value, bool) or not math.isfinite(value) or value == 0:
+        return value
+    digits = significant_digits - int(math.floor(math.log10(abs(value)))) - 1
+    return round(value, digits)
+
+
+class AnalysisCache:
+    """SQLite-backed cache of generated analyses, shared by every process on the machine.
+
+    Keys combine the ticker, the normalized question, a quantized snapshot
+    of the quote and the historical period, so the same question over
+    essentially the same data returns the stored answer.
+    """
+
+    def __init__(self, path: str = None, ttl: float = None, max_entries: int = None):
+        self.path = path if path is not None else os.environ.get("ANALYSIS_CACHE_PATH", DEFAULT_ANALYSIS_CACHE_PATH)
+        self.ttl = ttl if ttl is not None else float(os.environ.get("ANALYSIS_CACHE_TTL", 900))
+        self.max_entries = max_entries if max_entries is not None else int(os.environ.get("ANALYSIS_CACHE_MAX_ENTRIES", 5000))
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0}
+        self._conn = None
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+        except (OSError, sqlite3.Error) as e:
+            logger.warning("Analysis cache disabled, cannot open %s: %s", self.path, e)
+            self._conn = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._conn is not None
+
+    @staticmethod
+    def make_key(ticker: str, question: str, fingerprint: dict, period: str = None) -> str:
+        parts = {"ticker": ticker.upper(), "question": question, "data": fingerprint, "period": period}
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+    def get(self, key: str):
+        if not self.enabled:
+            return None
+        now = time.time()
+        try:
+            with self._lock, self._conn:
+                row = self._conn.execute(
+                    "SELECT response FROM analyses WHERE key = ? AND created_at > ?", (key, now - self.ttl)
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute("UPDATE analyses SET accessed_at = ? WHERE key = ?", (now, key))
+                self._counters["hits" if row is not None else "misses"] += 1
+        except sqlite3.Error as e:
+            logger.warning("Analysis cache read failed: %s", e)
+            return None
+        return row[0] if row is not None else None
+
+    def put(self, key: str, ticker: str, response: str):
+        if not self.enabled or not response:
+            return
+        now = time.time()
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO analyses (key, ticker, response, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, ticker.upper(), response, now, now)
+                )
+                self._conn.execute("DELETE FROM analyses WHERE created_at <= ?", (now - self.ttl,))
+                # Evict least recently used entries beyond the size limit
+                self._conn.execute(
+                    "DELETE FROM analyses WHERE key IN ("
+                    "SELECT key FROM analyses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+        except sqlite3.Error as e:
+            logger.warning("Analysis cache write failed: %s", e)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["enabled"] = self.enabled
+        return stats
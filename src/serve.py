@@ -0,0 +1,132 @@
+import os
+import sys
+import shutil
+import logging
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gunicorn.app.base import BaseApplication
+import mcp_server
+from mcp_server import app
+from metrics import REGISTRY
+from upstream_scheduler import get_scheduler
+
+logger = logging.getLogger(__name__)
+
+
+class MCPServerApplication(BaseApplication):
+    """Runs the Flask tool server under gunicorn with options set from code instead of argv"""
+
+    def __init__(self, application, options: dict = None):
+        self.application = application
+        self.options = options or {}
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key, value)
+
+    def load(self):
+        return self.application
+
+
+def server_options() -> dict:
+    host = os.environ.get("HOST", "0.0.0.0")
+    port = int(os.environ.get("PORT", 5001))
+    return {
+        "bind": f"{host}:{port}",
+        # Caches, upstream concurrency limits and stream pollers are per process, so each worker multiplies them
+        "workers": int(os.environ.get("MCP_WORKERS", multiprocessing.cpu_count() * 2 + 1)),
+        # gthread workers keep idle keep-alive connections without pinning a whole process
+        "worker_class": "gthread",
+        "threads": int(os.environ.get("MCP_THREADS", 4)),
+        "keepalive": int(os.environ.get("MCP_KEEPALIVE", 5)),
+        "timeout": int(os.environ.get("MCP_WORKER_TIMEOUT", 60)),
+        "backlog": int(os.environ.get("MCP_BACKLOG", 2048)),
+        "max_requests": int(os.environ.get("MCP_MAX_REQUESTS", 0)),
+        "max_requests_jitter": int(os.environ.get("MCP_MAX_REQUESTS_JITTER", 0)),
+        "accesslog": os.environ.get("MCP_ACCESS_LOG") or None,
+    }
+
+
+def share_metrics():
+    """Point every process's metrics at one snapshot directory so any worker's /metrics covers the server"""
+    directory = os.environ.get("METRICS_DIR") or tempfile.mkdtemp(prefix="financehub-metrics-")
+    REGISTRY.share(directory)
+    return directory
+
+
+def share_upstreams():
+    """Give every process one token bucket per upstream, so the configured rates hold for the whole server"""
+    directory = tempfile.mkdtemp(prefix="financehub-upstreams-")
+    get_scheduler().share(directory)
+    return directory
+
+
+def stream_port():
+    """Port of the dedicated quote stream process: PORT + 1 by default, None when QUOTE_STREAM_PORT is empty"""
+    value = os.environ.get("QUOTE_STREAM_PORT", str(int(os.environ.get("PORT", 5001)) + 1))
+    return int(value) if value else None
+
+
+def stream_server_options(port: int) -> dict:
+    options = server_options()
+    options.update({
+        "bind": f"{os.environ.get('HOST', '0.0.0.0')}:{port}",
+        # One process, so every viewer of a ticker shares its poller; each open stream holds a thread
+        "workers": 1,
+        "threads": int(os.environ.get("QUOTE_STREAM_THREADS", 64)),
+        "max_requests": 0,
+    })
+    return options
+
+
+def run_stream_server(application, port: int):
+    """Serve /stream/quotes from this process only, with most of its threads available to streams"""
+    options = stream_server_options(port)
+    mcp_server.quote_stream.max_subscribers = int(os.environ.get(
+        "QUOTE_STREAM_MAX_SUBSCRIBERS", max(1, options["threads"] - 4)
+    ))
+    # The tool workers already keep the caches warm; this process only polls streamed tickers
+    mcp_server.prefetcher = None
+    logger.info(
+        "Starting quote stream server on %s with %s threads, at most %s subscribers",
+        options["bind"], options["threads"], mcp_server.quote_stream.max_subscribers
+    )
+    MCPServerApplication(application, options).run()
+
+
+def main(application=app):
+    options = server_options()
+    metrics_dir = share_metrics()
+    upstreams_dir = share_upstreams()
+    streams = None
+    port = stream_port()
+    if port is not None and mcp_server.quote_stream is not None:
+        # Forked before the tool workers, so it serves the same (possibly stubbed) application
+        streams = multiprocessing.get_context("fork").Process(
+            target=run_stream_server, args=(application, port), name="quote-stream-server"
+        )
+        streams.start()
+        # Tool workers redirect stream requests instead of tying up their own threads
+        application.config["QUOTE_STREAM_PORT"] = port
+
+    def on_exit(server):
+        if streams is not None:
+            streams.terminate()
+        if not os.environ.get("METRICS_DIR"):
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+        shutil.rmtree(upstreams_dir, ignore_errors=True)
+
+    options["on_exit"] = on_exit
+    logger.info(
+        "Starting gunicorn on %s with %s workers x %s threads", options["bind"], options["workers"], options["threads"]
+    )
+    MCPServerApplication(application, options).run()
+
+
+if __name__ == "__main__":
+    main()
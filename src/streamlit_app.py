@@ -1,14 +1,21 @@
 import streamlit as st
 import sys
 import os
+import asyncio
+import itertools
+import threading
+import time
+import uuid
 from datetime import datetime
 import pandas as pd
 
 # Add src directory to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from finance_mcp_client import FinanceClient
+import tracing
+from finance_mcp_client import FinanceClient, AsyncFinanceClient, history_to_dataframe
 from llm_parser import TickerParser
+from agent_pipeline import ToolCallingPipeline
 
 # Page configuration
 st.set_page_config(
@@ -192,6 +199,125 @@ if 'llm_parser' not in st.session_state:
     st.session_state.llm_parser = TickerParser()
 if 'finance_client' not in st.session_state:
     st.session_state.finance_client = FinanceClient()
+if 'async_finance_client' not in st.session_state:
+    st.session_state.async_finance_client = AsyncFinanceClient(st.session_state.finance_client)
+
+pipeline_mode = st.sidebar.radio(
+    "Pipeline",
+    ["Classic", "Agent (tool calling)"],
+    help="Classic extracts the ticker, fetches data, then analyzes. Agent runs one LLM conversation that calls the data tools itself."
+)
+show_timings = st.sidebar.checkbox(
+    "🔬 Show timing breakdown",
+    help="Per-stage timings of each query: LLM calls, tool round trips and the server's own stages (Yahoo calls, formatting)."
+)
+
+live_prices = st.sidebar.checkbox(
+    "📡 Live price",
+    help="Keep the analyzed tickers' prices updating from the server's quote stream, without re-running the analysis."
+)
+
+class LiveQuoteWatches:
+    """Quote stream consumers for every dashboard session in this process, one background thread each.
+
+    A watch stops once its session hasn't rendered it for idle_seconds
+    (tab closed, new analysis, toggle unticked), and at most max_watches
+    run at once, so abandoned sessions can't hold the server's stream slots.
+    """
+
+    def __init__(self, max_watches: int, idle_seconds: float):
+        self.max_watches = max_watches
+        self.idle_seconds = idle_seconds
+        self._watches = {}
+        self._lock = threading.Lock()
+        threading.Thread(target=self._reap, name="live-quotes-reaper", daemon=True).start()
+
+    def follow(self, session: str, tickers: list):
+        """The session's watch on tickers, started if needed; None when every slot is taken"""
+        now = time.monotonic()
+        with self._lock:
+            watch = self._watches.get(session)
+            if watch is not None and watch["tickers"] == tickers:
+                watch["seen"] = now
+                return watch
+            if watch is not None:
+                self._watches.pop(session)["stop"].set()
+            if len(self._watches) >= self.max_watches:
+                return None
+            watch = self._watches[session] = {
+                "tickers": tickers, "stop": threading.Event(), "quotes": {}, "errors": {}, "seen": now
+            }
+        threading.Thread(target=self._consume, args=(watch,), name="live-quotes", daemon=True).start()
+        return watch
+
+    def stop(self, session: str):
+        with self._lock:
+            watch = self._watches.pop(session, None)
+        if watch is not None:
+            watch["stop"].set()
+
+    @staticmethod
+    def _consume(watch: dict):
+        # A client of its own, so the open stream doesn't hold a connection of a session's pool
+        client = FinanceClient()
+        try:
+            for event in client.subscribe_quotes(watch["tickers"], stop=watch["stop"]):
+                if event.get("type") == "quote":
+                    watch["quotes"][event["ticker"]] = event
+                    watch["errors"].pop(event["ticker"], None)
+                elif event.get("ticker"):
+                    watch["errors"][event["ticker"]] = event.get("error", "unknown error")
+        except Exception as e:
+            watch["errors"]["stream"] = str(e)
+
+    def _reap(self):
+        while True:
+            time.sleep(self.idle_seconds / 2)
+            cutoff = time.monotonic() - self.idle_seconds
+            with self._lock:
+                idle = [session for session, watch in self._watches.items() if watch["seen"] < cutoff]
+                for session in idle:
+                    self._watches.pop(session)["stop"].set()
+
+@st.cache_resource
+def live_quote_watches() -> LiveQuoteWatches:
+    return LiveQuoteWatches(
+        max_watches=int(os.environ.get("LIVE_QUOTES_MAX_WATCHES", 8)),
+        idle_seconds=float(os.environ.get("LIVE_QUOTES_IDLE_SECONDS", 30))
+    )
+
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+if not live_prices:
+    live_quote_watches().stop(st.session_state.session_id)
+
+@st.fragment(run_every=2)
+def render_live_prices(tickers: list, analyzed_prices: dict):
+    """Live price row that refreshes on its own; deltas are against the price the analysis used"""
+    watch = live_quote_watches().follow(st.session_state.session_id, tickers)
+    if watch is None:
+        st.caption("📡 Live prices are busy right now; they will start when a slot frees up.")
+        return
+    for col, ticker in zip(st.columns(len(tickers)), tickers):
+        quote = watch["quotes"].get(ticker)
+        with col:
+            if quote is None or not isinstance(quote.get("price"), (int, float)):
+                st.metric(f"📡 {ticker} live", "…")
+                continue
+            analyzed = analyzed_prices.get(ticker)
+            delta = f"{quote['price'] - analyzed:+.2f} since analysis" if isinstance(analyzed, (int, float)) else None
+            st.metric(f"📡 {ticker} live", f"${quote['price']:.2f}", delta=delta)
+    for ticker, error in list(watch["errors"].items()):
+        st.caption(f"⚠️ Live quotes for {ticker} unavailable: {error}")
+
+def render_trace(trace):
+    """Debug panel with the stage timeline of the current query"""
+    rows = trace.rows()
+    with st.expander(f"🔬 Timing breakdown · {trace.elapsed * 1000:.0f} ms", expanded=True):
+        if rows:
+            st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+        else:
+            st.caption("No stages were recorded.")
 
 # Header section
 st.markdown('<h1 class="header-title">📈 FinanceHub</h1>', unsafe_allow_html=True)
@@ -214,7 +340,47 @@ with col2:
 st.markdown("---")
 
 # Main analysis section
-if analyze_button and user_query:
+if analyze_button and user_query and pipeline_mode.startswith("Agent"):
+    trace = tracing.start_trace(user_query)
+    with st.spinner("🤖 Running tool-calling analysis..."):
+        result = ToolCallingPipeline(
+            st.session_state.llm_parser,
+            st.session_state.finance_client
+        ).run(user_query)
+    
+    if not result["answer"]:
+        st.error("❌ The model did not produce an answer. Try the classic pipeline.", icon="⚠️")
+    else:
+        st.markdown('<h3 class="section-header">🤖 AI Analysis</h3>', unsafe_allow_html=True)
+        st.markdown(f"""
+            <div style='
+                background: linear-gradient(135deg, #1A1F26 0%, #232A33 100%);
+                border: 1px solid #2A3139;
+                border-left: 5px solid #1E88E5;
+                border-radius: 12px;
+                padding: 25px;
+                color: #E0E0E0;
+                line-height: 1.8;
+            '>
+                {result["answer"]}
+            </div>
+        """, unsafe_allow_html=True)
+        usage = result["usage"]
+        st.caption(
+            f"⏱ {result['elapsed']:.2f}s · {usage['calls']} LLM calls · "
+            f"{usage['prompt_tokens']} prompt + {usage['completion_tokens']} completion tokens"
+        )
+        with st.expander("🔧 Tool calls"):
+            for call in result["tool_calls"]:
+                status = f"❌ {call['error']}" if call["error"] else "✓"
+                st.markdown(f"{status} `{call['name']}({call['arguments']})` in {call['seconds']:.2f}s")
+        if live_prices and result["tickers"]:
+            render_live_prices(result["tickers"][:4], {})
+    if show_timings:
+        render_trace(trace)
+
+elif analyze_button and user_query:
+    trace = tracing.start_trace(user_query)
     with st.spinner("🔄 Analyzing your query..."):
         try:
             # Extract ticker and timeframe
@@ -224,9 +390,12 @@ if analyze_button and user_query:
                 st.error("❌ Could not extract a valid stock ticker from your query. Try being more specific!", icon="⚠️")
                 st.stop()
             
-            # Fetch stock data
-            with st.spinner(f"📥 Fetching data for {ticker}..."):
-                data = st.session_state.finance_client.fetch_stock_data(ticker)
+            # Fetch stock data and, if a timeframe was specified, historical data concurrently
+            spinner_text = f"📥 Fetching data for {ticker}..." if not timeframe else f"📥 Fetching data and {timeframe} history for {ticker}..."
+            with st.spinner(spinner_text):
+                data, hist_response, indicators_response = asyncio.run(
+                    st.session_state.async_finance_client.fetch_analysis_inputs(ticker, timeframe, series=True)
+                )
             
             if "error" in data:
                 st.error(f"❌ Error: {data.get('error')}", icon="⚠️")
@@ -275,34 +444,53 @@ if analyze_button and user_query:
                         </div>
                     """, unsafe_allow_html=True)
             
+            if live_prices:
+                render_live_prices([ticker], {ticker: stock_data.get('price')})
+            
             st.markdown("---")
             
-            # Fetch historical data if timeframe specified
             historical_data = None
-            if timeframe:
-                with st.spinner(f"📈 Fetching historical data for {timeframe}..."):
-                    hist_response = st.session_state.finance_client.fetch_historical_data(ticker, timeframe)
-                    if "error" not in hist_response:
-                        historical_data = hist_response.get('data', {})
+            if hist_response and "error" not in hist_response:
+                historical_data = hist_response.get('data', {})
+            
+            indicators = None
+            if indicators_response and "error" not in indicators_response:
+                indicators = indicators_response.get('data', {})
             
             # Display historical data chart
             if historical_data and historical_data.get('data'):
                 st.markdown('<h3 class="section-header">📊 Price History</h3>', unsafe_allow_html=True)
                 
-                hist_list = historical_data.get('data', [])
-                if isinstance(hist_list, list) and len(hist_list) > 0:
-                    df = pd.DataFrame(hist_list)
-                    df['Date'] = pd.to_datetime(df['Date'])
-                    df = df.sort_values('Date')
-                    
+                df = history_to_dataframe(historical_data)
+                if not df.empty:
                     # Display line chart in a styled container
                     st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-                    st.line_chart(
-                        df.set_index('Date')[['Close']],
-                        use_container_width=True
-                    )
+                    indicator_df = history_to_dataframe(indicators.get('series')) if indicators else None
+                    if indicator_df is not None and not indicator_df.empty:
+                        # Overlay the 20-bar average and Bollinger bands on the close
+                        chart_df = indicator_df.set_index('Date')[['close', 'sma_20', 'bb_upper', 'bb_lower']]
+                        chart_df.columns = ['Close', 'SMA 20', 'Bollinger upper', 'Bollinger lower']
+                        st.line_chart(chart_df, use_container_width=True)
+                    else:
+                        st.line_chart(
+                            df.set_index('Date')[['Close']],
+                            use_container_width=True
+                        )
                     st.markdown('</div>', unsafe_allow_html=True)
                     
+                    if indicators:
+                        latest = indicators.get('latest', {})
+                        stats = indicators.get('period_stats', {})
+                        indicator_cols = st.columns(4)
+                        indicator_metrics = [
+                            ("RSI (14)", f"{latest['rsi_14']:.1f}" if latest.get('rsi_14') is not None else "N/A"),
+                            ("MACD hist", f"{latest['macd_hist']:+.2f}" if latest.get('macd_hist') is not None else "N/A"),
+                            ("Volatility", f"{stats['volatility']:.1%}" if stats.get('volatility') is not None else "N/A"),
+                            ("Max drawdown", f"{stats['max_drawdown_pct']:.1f}%" if stats.get('max_drawdown_pct') is not None else "N/A"),
+                        ]
+                        for col, (label, value) in zip(indicator_cols, indicator_metrics):
+                            col.metric(label, value)
+                    
                     # Display data table
                     with st.expander("📋 View Detailed Historical Data"):
                         st.dataframe(
@@ -322,16 +510,24 @@ if analyze_button and user_query:
             # AI Analysis section
             st.markdown('<h3 class="section-header">🤖 AI Analysis</h3>', unsafe_allow_html=True)
             
+            analysis_placeholder = st.empty()
+            summary = ""
+            chunks = st.session_state.llm_parser.stream_analysis_summary(
+                ticker,
+                stock_data,
+                user_query=user_query,
+                historical_data=historical_data,
+                indicators=indicators
+            )
+            
+            # Keep the spinner up only until the first token arrives, then render incrementally
             with st.spinner("✨ Generating comprehensive analysis..."):
-                summary = st.session_state.llm_parser.generate_analysis_summary(
-                    ticker,
-                    stock_data,
-                    user_query=user_query,
-                    historical_data=historical_data
-                )
-                
-                if summary:
-                    st.markdown(f"""
+                first_chunk = next(chunks, None)
+            
+            if first_chunk is not None:
+                for chunk in itertools.chain([first_chunk], chunks):
+                    summary += chunk
+                    analysis_placeholder.markdown(f"""
                         <div style='
                             background: linear-gradient(135deg, #1A1F26 0%, #232A33 100%);
                             border: 1px solid #2A3139;
@@ -344,6 +540,12 @@ if analyze_button and user_query:
                             {summary}
                         </div>
                     """, unsafe_allow_html=True)
+                
+                timing = st.session_state.llm_parser.last_stream_timing
+                if timing and timing.get("cached"):
+                    st.caption("⚡ Served from the analysis cache")
+                elif timing and timing.get("time_to_first_token") is not None:
+                    st.caption(f"⏱ First token {timing['time_to_first_token']:.2f}s · total {timing['total']:.2f}s")
             
             st.markdown("---")
             
@@ -383,6 +585,9 @@ if analyze_button and user_query:
                     </div>
                 """, unsafe_allow_html=True)
         
+            if show_timings:
+                render_trace(trace)
+        
         except Exception as e:
             st.error(f"❌ An error occurred: {str(e)}", icon="⚠️")
 
@@ -435,5 +640,15 @@ with st.sidebar:
         </div>
     """, unsafe_allow_html=True)
     
+    extraction_stats = st.session_state.llm_parser.get_extraction_stats()
+    if extraction_stats["total"]:
+        st.caption(
+            f"Ticker extraction: {extraction_stats['fast_path_rate']:.0%} fast path · "
+            f"{extraction_stats['cache_hit_rate']:.0%} cached · {extraction_stats['llm_rate']:.0%} LLM"
+        )
+    analysis_stats = st.session_state.llm_parser.analysis_cache.stats()
+    if analysis_stats["hits"] + analysis_stats["misses"]:
+        st.caption(f"Analysis cache: {analysis_stats['hit_rate']:.0%} hit rate")
+    
     st.markdown("---")
     st.markdown("<p style='color: #9E9E9E; text-align: center; margin-top: 40px; font-size: 0.85em;'>Made with ❤️ by FinanceHub</p>", unsafe_allow_html=True)
\ No newline at end of file
@@ -0,0 +1,45 @@
+import threading
+
+
+class TokenBudget:
+    """Accumulates prompt/completion token usage across LLM calls, with an optional ceiling"""
+
+    def __init__(self, max_tokens: int = None):
+        self.max_tokens = max_tokens
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def record(self, usage):
+        """Add a Groq/OpenAI usage object (or dict); calls without usage still count"""
+        if isinstance(usage, dict):
+            prompt, completion = usage.get("prompt_tokens"), usage.get("completion_tokens")
+        else:
+            prompt = getattr(usage, "prompt_tokens", None)
+            completion = getattr(usage, "completion_tokens", None)
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt or 0
+            self.completion_tokens += completion or 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    @property
+    def remaining(self):
+        return None if self.max_tokens is None else max(0, self.max_tokens - self.total_tokens)
+
+    @property
+    def exhausted(self) -> bool:
+        return self.max_tokens is not None and self.total_tokens >= self.max_tokens
+
+    def report(self) -> dict:
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+            "max_tokens": self.max_tokens,
+        }
@@ -0,0 +1,129 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# The QueryTrace stages are recorded into; carried across asyncio tasks and copied executor contexts
+_current = contextvars.ContextVar("query_trace", default=None)
+
+
+class QueryTrace:
+    """Per-query timeline of stages: LLM calls, tool round trips and the server's own stages.
+
+    Spans are (name, start offset, duration, attributes) relative to when
+    the trace was created. Recording is thread-safe so concurrent fetches
+    of one query can share a trace.
+    """
+
+    def __init__(self, label: str = None):
+        self.label = label
+        self.started = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float, start: float = None, **attributes):
+        """Add a finished stage; start is its perf_counter() start, defaulting to now minus seconds"""
+        start = (start if start is not None else time.perf_counter() - seconds) - self.started
+        with self._lock:
+            self.spans.append({"name": name, "start": start, "seconds": seconds, **attributes})
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Time the enclosed block; the yielded dict can be filled with attributes along the way"""
+        started = time.perf_counter()
+        try:
+            yield attributes
+        finally:
+            self.record(name, time.perf_counter() - started, start=started, **attributes)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def rows(self) -> list:
+        """Spans in start order with millisecond timings, for display"""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span["start"])
+        rows = []
+        for span in spans:
+            details = {key: value for key, value in span.items() if key not in ("name", "start", "seconds")}
+            rows.append({
+                "stage": span["name"],
+                "start_ms": round(span["start"] * 1000, 1),
+                "duration_ms": round(span["seconds"] * 1000, 1),
+                "details": ", ".join(f"{key}={value}" for key, value in details.items()),
+            })
+        return rows
+
+    def totals(self) -> dict:
+        """Total seconds per stage name"""
+        totals = {}
+        with self._lock:
+            for span in self.spans:
+                totals[span["name"]] = totals.get(span["name"], 0.0) + span["seconds"]
+        return totals
+
+    def server_timing(self, total: float = None) -> str:
+        """Server-Timing header value with one entry per stage name"""
+        entries = [f"{_token(name)};dur={seconds * 1000:.1f}" for name, seconds in self.totals().items()]
+        if total is not None:
+            entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+def _token(name: str) -> str:
+    # Server-Timing metric names are HTTP tokens; our stage names only need '.' kept
+    return "".join(c if c.isalnum() or c in "._-" else "_" for c in name)
+
+
+def parse_server_timing(header: str) -> list:
+    """[(name, seconds)] from a Server-Timing header; entries without a duration are skipped"""
+    entries = []
+    for entry in (header or "").split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur" and name:
+                try:
+                    entries.append((name, float(value) / 1000))
+                except ValueError:
+                    pass
+    return entries
+
+
+def current_trace():
+    return _current.get()
+
+
+def start_trace(label: str = None) -> QueryTrace:
+    """Create a trace and make it the active one for this context, replacing any previous trace"""
+    trace = QueryTrace(label)
+    _current.set(trace)
+    return trace
+
+
+@contextmanager
+def use_trace(trace: QueryTrace):
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+def record(name: str, seconds: float, start: float = None, **attributes):
+    """Record a stage on the active trace; a no-op when nothing is being traced"""
+    trace = _current.get()
+    if trace is not None:
+        trace.record(name, seconds, start=start, **attributes)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time the enclosed block as a stage of the active trace, if any"""
+    trace = _current.get()
+    if trace is None:
+        yield attributes
+        return
+    with trace.span(name, **attributes) as attributes:
+        yield attributes
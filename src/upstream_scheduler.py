@@ -0,0 +1,382 @@
+import os
+import json
+import time
+import fcntl
+import heapq
+import logging
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+
+import tracing
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Lower values are served first
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+# Defaults per upstream: sustained requests/sec (0 = unlimited), burst size and concurrent calls.
+# Concurrency is per process. Rate and burst are too, unless the scheduler shares its token buckets
+# between processes (serve.py does), in which case they hold for the whole server
+UPSTREAM_DEFAULTS = {
+    "yahoo": {"rate": 5.0, "burst": 10, "concurrency": 8},
+    "groq": {"rate": 0.5, "burst": 5, "concurrency": 4},
+    "openai": {"rate": 0.0, "burst": 1, "concurrency": 16},
+}
+
+UPSTREAM_SECONDS = REGISTRY.histogram(
+    "financehub_upstream_request_duration_seconds",
+    "Duration of upstream calls (Yahoo, LLM APIs) by operation and outcome",
+    ("upstream", "operation", "outcome")
+)
+UPSTREAM_WAIT_SECONDS = REGISTRY.histogram(
+    "financehub_upstream_queue_wait_seconds",
+    "Time calls waited for an upstream rate-limit or concurrency slot",
+    ("upstream", "priority")
+)
+
+_priority = contextvars.ContextVar("upstream_priority", default=INTERACTIVE)
+_deadline = contextvars.ContextVar("upstream_deadline", default=None)
+
+
+class UpstreamError(Exception):
+    """An upstream call that was not made or not answered because of load; maps to an HTTP status"""
+
+    status_code = 503
+
+    def __init__(self, message: str, upstream: str, retry_after: float = None):
+        super().__init__(message)
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(UpstreamError):
+    """Still queued for an upstream slot when the request's deadline passed"""
+
+    status_code = 503
+
+
+class RateLimited(UpstreamError):
+    """The upstream kept answering 429 after all retries"""
+
+    status_code = 429
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Recognize 429s from yfinance, the Groq SDK and requests without importing them"""
+    if getattr(error, "status_code", None) == 429:
+        return True
+    response = getattr(error, "response", None)
+    if getattr(response, "status_code", None) == 429:
+        return True
+    return "RateLimit" in type(error).__name__ or "Too Many Requests" in str(error)
+
+
+def _retry_after(error: Exception):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after") or headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+class Upstream:
+    """Token bucket plus concurrency limit for one upstream, with a priority queue in front.
+
+    Waiters are granted in (priority, arrival) order once a token and a
+    concurrency slot are free. A 429 pauses the whole upstream for an
+    exponentially growing backoff instead of letting every waiter retry.
+    With shared_path the bucket and the pause live in that file, under an
+    flock, so every process using the same file draws from one bucket.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int, concurrency: int,
+                 max_retries: int = 3, backoff: float = 1.0, max_backoff: float = 60.0, shared_path: str = None):
+        self.name = name
+        self.shared_path = shared_path
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self._cond = threading.Condition()
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._consecutive_429 = 0
+        self._in_flight = 0
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._counters = {
+            "granted": 0, "deadline_exceeded": 0, "rate_limited": 0, "retries": 0, "errors": 0,
+            "wait_seconds": 0.0, "max_wait_seconds": 0.0,
+        }
+        self._granted_by_priority = {label: 0 for label in PRIORITY_NAMES.values()}
+
+    def _refill(self, now: float):
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _ready_in(self, now: float) -> float:
+        """Seconds until the head waiter could be granted, 0 when it can go now"""
+        if self._in_flight >= self.concurrency:
+            return None
+        if now < self._paused_until:
+            return self._paused_until - now
+        # A shared bucket is only read when the head waiter takes its token
+        if self.rate <= 0 or self.shared_path is not None or self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def _shared_bucket(self, take: bool = False, pause: float = None) -> tuple:
+        """Refill the shared bucket, then take a token or start a pause, in one locked step.
+
+        Returns (tokens, paused_for) as found before taking; wall time is
+        used because the file is read by other processes.
+        """
+        now = time.time()
+        with open(self.shared_path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            try:
+                tokens, refilled_at, paused_until = json.loads(f.read())
+            except (ValueError, TypeError):
+                tokens, refilled_at, paused_until = float(self.burst), now, 0.0
+            tokens = min(self.burst, tokens + max(0.0, now - refilled_at) * self.rate)
+            paused_for = max(0.0, paused_until - now)
+            left = tokens
+            if pause is not None:
+                paused_until = max(paused_until, now + pause)
+                left = min(tokens, 0.0)
+            elif take and not paused_for and tokens >= 1:
+                left = tokens - 1
+            f.truncate(0)
+            f.write(json.dumps([left, now, paused_until]))
+        return tokens, paused_for
+
+    def capacity(self, within: float, full: bool = False) -> float:
+        """Calls the rate limit can grant in the next within seconds, from the current bucket or a full one.
+
+        Ignores the concurrency limit and other waiters, so it is an upper
+        bound; infinite when the upstream has no rate limit.
+        """
+        if self.rate <= 0:
+            return float("inf")
+        if full:
+            return self.burst + self.rate * within
+        if self.shared_path is not None:
+            tokens, paused_for = self._shared_bucket()
+            return max(0.0, tokens + self.rate * max(0.0, within - paused_for))
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            within -= max(0.0, self._paused_until - now)
+            return max(0.0, self._tokens + self.rate * max(0.0, within))
+
+    def acquire(self, priority: int = INTERACTIVE, deadline: float = None):
+        """Block until a slot is granted; raises DeadlineExceeded if deadline (monotonic) passes first"""
+        entry = [priority, next(self._sequence)]
+        queued_at = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    ready_in = self._ready_in(now)
+                    if self._waiters[0] is entry and ready_in == 0:
+                        if self.shared_path is None:
+                            break
+                        tokens, paused_for = self._shared_bucket(take=True)
+                        if not paused_for and tokens >= 1:
+                            break
+                        ready_in = paused_for or (1 - tokens) / self.rate
+                    if deadline is not None and now >= deadline:
+                        self._counters["deadline_exceeded"] += 1
+                        raise DeadlineExceeded(
+                            f"{self.name} is busy, request waited {now - queued_at:.1f}s in the queue",
+                            self.name,
+                            retry_after=max(ready_in or 1.0, 1.0)
+                        )
+                    timeout = ready_in if ready_in else None
+                    if deadline is not None:
+                        timeout = min(timeout, deadline - now) if timeout else deadline - now
+                    self._cond.wait(timeout)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+            if self.rate > 0 and self.shared_path is None:
+                self._tokens -= 1
+            self._in_flight += 1
+            waited = time.monotonic() - queued_at
+            self._counters["granted"] += 1
+            self._counters["wait_seconds"] += waited
+            self._counters["max_wait_seconds"] = max(self._counters["max_wait_seconds"], waited)
+            self._granted_by_priority[PRIORITY_NAMES.get(priority, str(priority))] += 1
+
+    def release(self, rate_limited: bool = False, retry_after: float = None):
+        with self._cond:
+            self._in_flight -= 1
+            if rate_limited:
+                self._consecutive_429 += 1
+                self._counters["rate_limited"] += 1
+                pause = retry_after or min(self.max_backoff, self.backoff * 2 ** (self._consecutive_429 - 1))
+                self._paused_until = max(self._paused_until, time.monotonic() + pause)
+                self._tokens = min(self._tokens, 0.0)
+                if self.shared_path is not None:
+                    self._shared_bucket(pause=pause)
+                logger.warning("%s rate limited the request; pausing calls for %.1fs", self.name, pause)
+            else:
+                self._consecutive_429 = 0
+            self._cond.notify_all()
+
+    def call(self, fn, *args, priority: int = None, deadline: float = None, operation: str = None, **kwargs):
+        """Run fn under the limits, retrying after the shared backoff when the upstream answers 429.
+
+        operation names the call in metrics and traces, defaulting to fn's name.
+        """
+        priority = _priority.get() if priority is None else priority
+        deadline = _deadline.get() if deadline is None else deadline
+        operation = operation or getattr(fn, "__name__", "call")
+        attempt = 0
+        while True:
+            attempt += 1
+            queued_at = time.perf_counter()
+            self.acquire(priority, deadline)
+            started = time.perf_counter()
+            UPSTREAM_WAIT_SECONDS.observe(started - queued_at, upstream=self.name, priority=PRIORITY_NAMES.get(priority, priority))
+            if started - queued_at >= 0.001:
+                tracing.record(f"{self.name}.queue", started - queued_at, start=queued_at)
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                elapsed = time.perf_counter() - started
+                rate_limited = is_rate_limit_error(e)
+                outcome = "rate_limited" if rate_limited else "error"
+                UPSTREAM_SECONDS.observe(elapsed, upstream=self.name, operation=operation, outcome=outcome)
+                tracing.record(f"{self.name}.{operation}", elapsed, start=started, outcome=outcome)
+                if not rate_limited:
+                    self.release()
+                    with self._cond:
+                        self._counters["errors"] += 1
+                    raise
+                retry_after = _retry_after(e)
+                self.release(rate_limited=True, retry_after=retry_after)
+                if attempt > self.max_retries:
+                    raise RateLimited(
+                        f"{self.name} is rate limiting requests: {e}", self.name,
+                        retry_after=retry_after or self.backoff * 2 ** (attempt - 1)
+                    ) from e
+                with self._cond:
+                    self._counters["retries"] += 1
+                continue
+            elapsed = time.perf_counter() - started
+            UPSTREAM_SECONDS.observe(elapsed, upstream=self.name, operation=operation, outcome="ok")
+            tracing.record(f"{self.name}.{operation}", elapsed, start=started)
+            self.release()
+            return result
+
+    def stats(self) -> dict:
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            stats = dict(self._counters)
+            tokens = self._tokens if self.shared_path is None else self._shared_bucket()[0]
+            stats.update({
+                "granted_by_priority": dict(self._granted_by_priority),
+                "in_flight": self._in_flight,
+                "queued": len(self._waiters),
+                "tokens": round(tokens, 2) if self.rate > 0 else None,
+                "paused_for": round(max(0.0, self._paused_until - now), 2),
+                "limits": {"rate": self.rate, "burst": self.burst, "concurrency": self.concurrency},
+            })
+        stats["mean_wait_seconds"] = round(stats["wait_seconds"] / stats["granted"], 4) if stats["granted"] else 0.0
+        stats["wait_seconds"] = round(stats["wait_seconds"], 3)
+        stats["max_wait_seconds"] = round(stats["max_wait_seconds"], 3)
+        return stats
+
+
+class UpstreamScheduler:
+    """Process-wide registry of Upstream limiters, configured from UPSTREAM_<NAME>_* variables"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._upstreams = {}
+        self.interactive_wait = float(os.environ.get("UPSTREAM_MAX_WAIT", 10))
+        self.batch_wait = float(os.environ.get("UPSTREAM_BATCH_MAX_WAIT", 60))
+        # Directory of token buckets shared with other processes; None keeps them in memory
+        self.shared_dir = None
+
+    def share(self, directory: str):
+        """Keep rate-limited upstreams' token buckets in directory, shared by every process that uses it.
+
+        Call before forking workers; upstreams created earlier are dropped.
+        """
+        with self._lock:
+            self.shared_dir = directory
+            self._upstreams.clear()
+
+    def upstream(self, name: str) -> Upstream:
+        with self._lock:
+            if name not in self._upstreams:
+                defaults = UPSTREAM_DEFAULTS.get(name, {"rate": 0.0, "burst": 1, "concurrency": 8})
+                prefix = f"UPSTREAM_{name.upper()}_"
+                rate = float(os.environ.get(prefix + "RATE", defaults["rate"]))
+                self._upstreams[name] = Upstream(
+                    name,
+                    rate=rate,
+                    burst=int(os.environ.get(prefix + "BURST", defaults["burst"])),
+                    concurrency=int(os.environ.get(prefix + "CONCURRENCY", defaults["concurrency"])),
+                    max_retries=int(os.environ.get("UPSTREAM_MAX_RETRIES", 3)),
+                    backoff=float(os.environ.get("UPSTREAM_BACKOFF", 1.0)),
+                    shared_path=os.path.join(self.shared_dir, f"{name}.bucket") if self.shared_dir and rate > 0 else None,
+                )
+            return self._upstreams[name]
+
+    def call(self, name: str, fn, *args, **kwargs):
+        """Run fn through the named upstream's limiter; accepts Upstream.call's priority, deadline and operation"""
+        upstream = self.upstream(name)
+        if _deadline.get() is None and "deadline" not in kwargs:
+            # Calls made outside a request() block still get the default queueing deadline
+            with self.request(_priority.get()):
+                return upstream.call(fn, *args, **kwargs)
+        return upstream.call(fn, *args, **kwargs)
+
+    @contextmanager
+    def request(self, priority: int = INTERACTIVE, max_wait: float = None):
+        """Tag upstream calls made inside the block with a priority and a queueing deadline"""
+        if max_wait is None:
+            max_wait = self.batch_wait if priority == BATCH else self.interactive_wait
+        priority_token = _priority.set(priority)
+        deadline_token = _deadline.set(time.monotonic() + max_wait if max_wait > 0 else None)
+        try:
+            yield
+        finally:
+            _deadline.reset(deadline_token)
+            _priority.reset(priority_token)
+
+    def stats(self) -> dict:
+        with self._lock:
+            upstreams = dict(self._upstreams)
+        return {name: upstream.stats() for name, upstream in upstreams.items()}
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> UpstreamScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = UpstreamScheduler()
+        return _scheduler
@@ -0,0 +1,13 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+# Set before the server modules are imported: state files go to a throwaway home instead of
+# ~/.financehub, market data comes from the offline provider and no prefetcher runs
+os.environ["HOME"] = tempfile.mkdtemp(prefix="financehub-tests-")
+os.environ["MARKET_DATA_PROVIDER"] = "offline"
+os.environ["PREFETCH_INTERVAL_SECONDS"] = "0"
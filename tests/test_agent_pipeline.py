@@ -0,0 +1,116 @@
+import json
+
+import pytest
+
+from agent_pipeline import ANSWER_TOKENS, MIN_ANSWER_TOKENS, ToolCallingPipeline
+from llm_backends import ChatResult, ToolCall
+from token_budget import TokenBudget
+
+
+class ScriptedBackend:
+    """Replays one ChatResult per chat call and records the arguments of each call"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = []
+
+    def chat(self, messages, max_tokens, temperature=0, tools=None, tool_choice=None):
+        self.calls.append({"messages": list(messages), "max_tokens": max_tokens, "tools": tools})
+        return self.results.pop(0)
+
+
+class FakeParser:
+    def __init__(self, backend):
+        self.backend = backend
+        self.token_usage = TokenBudget()
+
+
+class FakeClient:
+    def __init__(self):
+        self.quotes = []
+
+    def fetch_stock_data(self, ticker, fields=None):
+        self.quotes.append(ticker)
+        return {"data": {"ticker": ticker, "price": 100.0}}
+
+
+def tool_round(*calls, tokens=100):
+    return ChatResult(
+        tool_calls=[ToolCall(f"call_{i}", name, arguments) for i, (name, arguments) in enumerate(calls)],
+        usage={"prompt_tokens": tokens, "completion_tokens": 0},
+    )
+
+
+def answer(text="Done.", tokens=100):
+    return ChatResult(content=text, usage={"prompt_tokens": tokens, "completion_tokens": 0})
+
+
+def make_pipeline(*results, **kwargs):
+    backend = ScriptedBackend(*results)
+    client = FakeClient()
+    return ToolCallingPipeline(FakeParser(backend), client, **kwargs), backend, client
+
+
+def test_tool_results_are_fed_back_before_the_answer():
+    pipeline, backend, client = make_pipeline(
+        tool_round(("fetch_stock_data", json.dumps({"ticker": "aapl"}))),
+        answer("AAPL trades at 100."),
+        max_rounds=4, token_budget=6000,
+    )
+    result = pipeline.run("How is Apple doing?")
+
+    assert result["answer"] == "AAPL trades at 100."
+    assert result["tickers"] == ["AAPL"]
+    assert client.quotes == ["AAPL"]
+    assert [call["name"] for call in result["tool_calls"]] == ["fetch_stock_data"]
+    tool_message = backend.calls[1]["messages"][-1]
+    assert tool_message["role"] == "tool" and json.loads(tool_message["content"])["price"] == 100.0
+    assert result["usage"]["calls"] == 2
+
+
+def test_last_round_offers_no_tools():
+    pipeline, backend, _ = make_pipeline(
+        tool_round(("fetch_stock_data", '{"ticker": "AAPL"}')),
+        answer(),
+        max_rounds=2, token_budget=6000,
+    )
+    pipeline.run("Apple?")
+    assert backend.calls[0]["tools"] is not None
+    assert backend.calls[1]["tools"] is None
+
+
+def test_spent_budget_forces_the_answer_with_a_minimum_length():
+    pipeline, backend, client = make_pipeline(
+        tool_round(("fetch_stock_data", '{"ticker": "AAPL"}'), tokens=2 * ANSWER_TOKENS),
+        answer(),
+        max_rounds=4, token_budget=2 * ANSWER_TOKENS + 100,
+    )
+    result = pipeline.run("Apple?")
+
+    assert backend.calls[0]["tools"] is not None
+    assert backend.calls[1]["tools"] is None
+    assert backend.calls[1]["max_tokens"] == MIN_ANSWER_TOKENS
+    assert result["answer"] == "Done."
+    assert client.quotes == ["AAPL"]
+
+
+def test_tool_calls_in_the_final_round_are_not_executed():
+    pipeline, _, client = make_pipeline(
+        ChatResult(content="Partial.", tool_calls=[ToolCall("call_0", "fetch_stock_data", '{"ticker": "AAPL"}')]),
+        max_rounds=1, token_budget=6000,
+    )
+    result = pipeline.run("Apple?")
+    assert result["answer"] == "Partial."
+    assert client.quotes == []
+
+
+@pytest.mark.parametrize("arguments", ["[\"AAPL\"]", "\"AAPL\"", "42", "null"])
+def test_non_object_arguments_are_reported_to_the_model(arguments):
+    pipeline, _, client = make_pipeline()
+    assert pipeline._execute("fetch_stock_data", arguments) == {"error": "arguments must be a JSON object"}
+    assert client.quotes == []
+
+
+def test_invalid_json_arguments_are_reported():
+    pipeline, _, _ = make_pipeline()
+    assert "invalid arguments" in pipeline._execute("fetch_stock_data", "{ticker")["error"]
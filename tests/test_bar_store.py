@@ -0,0 +1,82 @@
+import pandas as pd
+import pytest
+
+from data_fetchers.bar_store import BarStore, get_bar_store
+
+
+def bars(closes, start="2024-01-02", tz="America/New_York"):
+    index = pd.date_range(start, periods=len(closes), freq="B", tz=tz, name="Date")
+    return pd.DataFrame({
+        "Open": closes, "High": closes, "Low": closes, "Close": closes, "Volume": 1000,
+        "Dividends": 0.0, "Stock Splits": 0.0,
+    }, index=index)
+
+
+def epoch(timestamp) -> int:
+    return int(timestamp.tz_convert("UTC").timestamp())
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BarStore(str(tmp_path / "bars.db"))
+
+
+def test_bars_round_trip_with_their_timezone(store):
+    hist = bars([1.0, 2.0, float("nan"), 4.0])
+    store.write("AAPL", "1d", hist)
+    pd.testing.assert_frame_equal(store.read("AAPL", "1d"), hist, check_freq=False, check_index_type=False)
+    assert store.read("MSFT", "1d").empty
+
+
+def test_coverage_spans_the_written_history(store):
+    hist = bars([1.0, 2.0, 3.0])
+    assert store.coverage("AAPL", "1d") is None
+    store.write("AAPL", "1d", hist)
+    coverage = store.coverage("AAPL", "1d")
+    assert coverage["start_ts"] == epoch(hist.index[0])
+    assert coverage["last_ts"] == epoch(hist.index[-1])
+    assert coverage["tz"] == "America/New_York"
+
+    # A complete history from an earlier start widens the coverage
+    earlier = int(pd.Timestamp("2023-06-01", tz="UTC").timestamp())
+    store.write("AAPL", "1d", bars([0.5], start="2023-12-29"), start_ts=earlier)
+    assert store.coverage("AAPL", "1d")["start_ts"] == earlier
+
+
+def test_tail_writes_append_and_replace_the_forming_bar(store):
+    store.write("AAPL", "1d", bars([1.0, 2.0, 3.0]))
+    # The tail starts at the last stored bar, whose close has since changed
+    store.write("AAPL", "1d", bars([3.5, 4.0], start="2024-01-04"))
+    hist = store.read("AAPL", "1d")
+    assert hist["Close"].tolist() == [1.0, 2.0, 3.5, 4.0]
+    assert store.read("AAPL", "1d", epoch(hist.index[2]))["Close"].tolist() == [3.5, 4.0]
+
+
+def test_tz_naive_tails_keep_the_stored_timezone(store):
+    store.write("AAPL", "1d", bars([1.0, 2.0]))
+    store.write("AAPL", "1d", bars([3.0], start="2024-01-05", tz="UTC"))
+    assert str(store.read("AAPL", "1d").index.tz) == "America/New_York"
+
+
+def test_clear_drops_bars_and_derived_indicators(store):
+    store.write("AAPL", "1d", bars([1.0, 2.0]))
+    store.write_indicators("AAPL", "1wk", "1y", "v1", {"rsi": 50})
+    store.write_indicator_state("AAPL", "1d", {"last_ts": 1})
+    store.clear("AAPL", "1d")
+    assert store.coverage("AAPL", "1d") is None
+    assert store.read_indicators("AAPL", "1wk", "1y", "v1") is None
+    assert store.read_indicator_state("AAPL", "1d") is None
+
+
+def test_touch_marks_the_series_fresh(store):
+    store.write("AAPL", "1d", bars([1.0]))
+    before = store.coverage("AAPL", "1d")["updated_at"]
+    store.touch("AAPL", "1d")
+    assert store.coverage("AAPL", "1d")["updated_at"] >= before
+
+
+def test_empty_bar_store_path_disables_the_store(monkeypatch, tmp_path):
+    monkeypatch.setenv("BAR_STORE_PATH", "")
+    assert get_bar_store() is None
+    monkeypatch.setenv("BAR_STORE_PATH", str(tmp_path / "bars.db"))
+    assert get_bar_store().path == str(tmp_path / "bars.db")
@@ -0,0 +1,39 @@
+"""Smoke tests: each benchmark starts its server, runs briefly and reports results without errors"""
+import os
+import re
+import sys
+import subprocess
+
+import pytest
+
+BENCHMARKS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks")
+
+
+def run_benchmark(script, *args, home):
+    env = dict(os.environ, HOME=str(home))
+    completed = subprocess.run(
+        [sys.executable, os.path.join(BENCHMARKS, script), "--duration", "1", "--concurrency", "2", *args],
+        capture_output=True, text=True, timeout=120, env=env,
+    )
+    assert completed.returncode == 0, completed.stderr
+    return completed.stdout
+
+
+@pytest.mark.parametrize("mode", ["dev", "gunicorn"])
+def test_bench_server(mode, tmp_path):
+    output = run_benchmark("bench_server.py", "--mode", mode, "--workers", "2", home=tmp_path)
+    requests, errors = map(int, re.search(r"requests:\s+(\d+) \((\d+) errors\)", output).groups())
+    assert requests > 0
+    assert errors == 0
+
+
+@pytest.mark.parametrize("pipeline", ["classic", "agent"])
+@pytest.mark.parametrize("fetcher", ["stub", "offline"])
+def test_bench_pipeline(pipeline, fetcher, tmp_path):
+    output = run_benchmark(
+        "bench_pipeline.py", "--pipeline", pipeline, "--fetcher", fetcher, "--mode", "dev",
+        "--llm-latency-ms", "0", "--llm-token-ms", "0", home=tmp_path,
+    )
+    queries, errors = map(int, re.search(r"queries:\s+(\d+) \((\d+) errors\)", output).groups())
+    assert queries > 0
+    assert errors == 0
@@ -0,0 +1,134 @@
+import asyncio
+import threading
+
+import pytest
+import requests
+
+import tracing
+from finance_mcp_client import AsyncFinanceClient, FinanceClient
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.body = body or {}
+        self.headers = headers or {}
+
+    def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code}")
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    """Replays one outcome per POST (a response or an exception) and records the calls"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.posts = []
+
+    def post(self, url, json=None, timeout=None):
+        self.posts.append({"name": json["name"], "timeout": timeout})
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def make_client(*outcomes):
+    client = FinanceClient(connect_timeout=1, read_timeout=30, max_retries=2, backoff_factor=0)
+    client.base_url = "http://finance.test"
+    client.session = FakeSession(*outcomes)
+    return client
+
+
+def test_single_ticker_read_timeouts_are_retried():
+    client = make_client(requests.exceptions.ReadTimeout(), FakeResponse(200, {"data": {"price": 1.0}}))
+    assert client.fetch_stock_data("AAPL") == {"data": {"price": 1.0}}
+    assert len(client.session.posts) == 2
+    assert client.call_log[-1]["attempts"] == 2
+
+
+def test_batch_read_timeouts_are_not_retried():
+    client = make_client(requests.exceptions.ReadTimeout(), FakeResponse(200))
+    result = client.fetch_stock_data_batch(["AAPL", "MSFT"])
+    assert "error" in result
+    assert len(client.session.posts) == 1
+
+
+@pytest.mark.parametrize("failure", [
+    requests.exceptions.ConnectionError(),
+    requests.exceptions.ConnectTimeout(),
+    FakeResponse(503, headers={"Retry-After": "0"}),
+])
+def test_batches_retry_connect_errors_and_unavailable_servers(failure):
+    client = make_client(failure, FakeResponse(200, {"data": {"results": {}}}))
+    assert client.fetch_historical_data_batch(["AAPL"]) == {"data": {"results": {}}}
+    assert len(client.session.posts) == 2
+
+
+def test_batch_read_timeout_scales_with_tickers():
+    client = make_client(FakeResponse(200), FakeResponse(200))
+    client.fetch_stock_data_batch([f"T{i}" for i in range(100)])
+    client.fetch_stock_data("AAPL")
+    assert client.session.posts[0]["timeout"] == (1, 30 + 100 * client.batch_seconds_per_ticker)
+    assert client.session.posts[1]["timeout"] == (1, 30)
+
+
+def test_tools_with_side_effects_are_not_retried():
+    client = make_client(requests.exceptions.ConnectionError(), FakeResponse(200))
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client._call_tool("not_idempotent", {})
+    assert len(client.session.posts) == 1
+
+
+class BlockingClient:
+    """Sync client whose calls wait until `parties` calls are in flight at once, recording the trace of each"""
+
+    def __init__(self, parties):
+        self.barrier = threading.Barrier(parties, timeout=5)
+        self.calls = []
+
+    def _call(self, name):
+        self.calls.append((name, tracing.current_trace()))
+        self.barrier.wait()
+        return {"data": name}
+
+    def fetch_stock_data(self, ticker, fields=None):
+        return self._call("quote")
+
+    def fetch_historical_data(self, ticker, period="1mo", format="records", interval=None, max_points=None):
+        return self._call("history")
+
+    def fetch_indicators(self, ticker, period="6mo", series=False):
+        return self._call("indicators")
+
+    def close(self):
+        pass
+
+
+def test_analysis_inputs_are_fetched_concurrently_in_the_callers_trace():
+    # The barrier only opens once all three calls are in flight, so serial calls would time out
+    client = AsyncFinanceClient(BlockingClient(3), max_workers=3)
+
+    async def fetch():
+        trace = tracing.start_trace("query")
+        return trace, await client.fetch_analysis_inputs("AAPL", "1mo")
+
+    trace, results = asyncio.run(fetch())
+    client.close()
+    assert results == ({"data": "quote"}, {"data": "history"}, {"data": "indicators"})
+    assert all(call_trace is trace for _, call_trace in client.client.calls)
+
+
+def test_quote_alone_without_a_period():
+    client = AsyncFinanceClient(BlockingClient(1), max_workers=1)
+    assert asyncio.run(client.fetch_quote_and_history("AAPL")) == ({"data": "quote"}, None)
+    assert asyncio.run(client.fetch_analysis_inputs("AAPL")) == ({"data": "quote"}, None, None)
+    client.close()
+    assert [name for name, _ in client.client.calls] == ["quote", "quote"]
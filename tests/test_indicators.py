@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_fetchers.indicators import (
+    IndicatorState, compute_indicators, latest_values, epoch_seconds, max_drawdown, period_stats, rsi, sma,
+    to_columnar, vwap,
+)
+
+
+def make_history(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    index = pd.date_range("2024-01-01", periods=n, freq="B", tz="America/New_York")
+    return pd.DataFrame({"Close": close}, index=index)
+
+
+def assert_matches(actual, expected):
+    assert actual.keys() == expected.keys()
+    for key, value in expected.items():
+        if value is None:
+            assert actual[key] is None, key
+        else:
+            assert actual[key] == pytest.approx(value, abs=2e-4), key
+
+
+@pytest.mark.parametrize("n", [1, 10, 15, 30, 60, 250])
+def test_from_closes_matches_compute_indicators(n):
+    hist = make_history(n)
+    state = IndicatorState.from_closes(hist["Close"])
+    assert_matches(state.values(), latest_values(compute_indicators(hist)))
+
+
+def test_updates_match_compute_indicators_bar_by_bar():
+    hist = make_history(260, seed=1)
+    state = IndicatorState.from_closes(hist["Close"].iloc[:5])
+    for i in range(5, len(hist)):
+        ts, close = hist.index[i], hist["Close"].iloc[i]
+        state.update(epoch_seconds(ts), close)
+        if i % 17 == 0 or i == len(hist) - 1:
+            assert_matches(state.values(), latest_values(compute_indicators(hist.iloc[:i + 1])))
+    assert state.anchor_ts == epoch_seconds(hist.index[0])
+    assert state.last_ts == epoch_seconds(hist.index[-1])
+
+
+def test_update_from_empty_state():
+    hist = make_history(40, seed=2)
+    state = IndicatorState()
+    for ts, close in hist["Close"].items():
+        state.update(epoch_seconds(ts), close)
+    assert_matches(state.values(), latest_values(compute_indicators(hist)))
+
+
+def test_peek_does_not_commit_the_bar():
+    hist = make_history(61, seed=3)
+    state = IndicatorState.from_closes(hist["Close"].iloc[:60])
+    before = state.values()
+    peeked = state.peek(epoch_seconds(hist.index[60]), hist["Close"].iloc[60])
+    assert_matches(peeked, latest_values(compute_indicators(hist)))
+    assert state.values() == before
+    assert state.count == 60
+
+
+def test_round_trips_through_dict():
+    hist = make_history(80, seed=4)
+    state = IndicatorState.from_closes(hist["Close"])
+    restored = IndicatorState.from_dict(state.to_dict())
+    assert restored.values() == state.values()
+    restored.update(state.last_ts + 86400, 123.0)
+    state.update(state.last_ts + 86400, 123.0)
+    assert restored.values() == state.values()
+
+
+def test_flat_prices_give_rsi_100_and_no_percent_b():
+    hist = pd.DataFrame({"Close": [50.0] * 30}, index=pd.date_range("2024-01-01", periods=30, freq="D"))
+    values = IndicatorState.from_closes(hist["Close"]).values()
+    assert values["rsi_14"] == 100.0
+    assert values["bb_percent_b"] is None
+    assert values["volatility"] == 0.0
+
+
+def series(values):
+    return pd.Series(values, index=pd.date_range("2024-01-01", periods=len(values), freq="B"), dtype=float)
+
+
+def test_sma_needs_a_full_window():
+    assert sma(series([1, 2, 3, 4, 5]), 3).tolist()[2:] == [2.0, 3.0, 4.0]
+    assert sma(series([1, 2, 3, 4, 5]), 3).isna().sum() == 2
+
+
+def test_rsi_of_a_steady_rise_is_100_and_of_a_steady_fall_is_0():
+    rising = series(range(1, 31))
+    assert rsi(rising).dropna().eq(100).all()
+    assert rsi(rising[::-1].set_axis(rising.index)).dropna().eq(0).all()
+
+
+def test_max_drawdown_finds_the_deepest_peak_to_trough():
+    close = series([100, 120, 90, 110, 60, 130])
+    result = max_drawdown(close)
+    assert result["max_drawdown_pct"] == pytest.approx(-50.0)
+    assert (result["peak"], result["trough"]) == (close.index[1], close.index[4])
+
+
+def test_vwap_weights_the_typical_price_by_volume():
+    hist = pd.DataFrame({
+        "High": [11.0, 21.0], "Low": [9.0, 19.0], "Close": [10.0, 20.0], "Volume": [100, 300],
+    }, index=series([0, 0]).index)
+    assert vwap(hist).tolist() == [10.0, pytest.approx((10 * 100 + 20 * 300) / 400)]
+
+
+def test_period_stats_summarize_the_window():
+    hist = make_history(60)
+    hist["High"], hist["Low"], hist["Volume"] = hist["Close"] * 1.01, hist["Close"] * 0.99, 1000
+    stats = period_stats(hist)
+    first, last = hist["Close"].iloc[0], hist["Close"].iloc[-1]
+    assert stats["change_pct"] == pytest.approx((last - first) / first * 100, abs=1e-4)
+    assert stats["high"] == pytest.approx(hist["High"].max(), abs=1e-4)
+    assert stats["max_drawdown_pct"] <= 0
+    assert period_stats(hist.iloc[:0]) == {}
+
+
+def test_to_columnar_sends_missing_values_as_null():
+    frame = compute_indicators(make_history(30))
+    payload = to_columnar(frame)
+    assert payload["columns"][0] == "Date" and payload["timezone"] == "America/New_York"
+    assert payload["data"]["sma_50"] == [None] * 30
+    assert payload["data"]["close"][-1] == pytest.approx(frame["close"].iloc[-1], abs=1e-4)
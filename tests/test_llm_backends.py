@@ -0,0 +1,118 @@
+import json
+
+import pytest
+
+from llm_backends import OpenAICompatibleBackend, StubBackend, create_backend
+from agent_pipeline import TOOL_DEFINITIONS
+
+
+class FakeResponse:
+    def __init__(self, body=None, lines=None):
+        self.body = body
+        self.lines = lines or []
+
+    def json(self):
+        return self.body
+
+    def iter_lines(self, decode_unicode=False):
+        return iter(self.lines)
+
+    def raise_for_status(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class FakeSession:
+    def __init__(self, response):
+        self.response = response
+        self.headers = {}
+        self.payloads = []
+
+    def post(self, url, json=None, timeout=None, stream=False):
+        self.payloads.append(json)
+        return self.response
+
+
+def openai_backend(response):
+    backend = OpenAICompatibleBackend(base_url="http://llm.test/v1", model="test-model", timeout=5)
+    backend.session = FakeSession(response)
+    return backend
+
+
+@pytest.fixture
+def stub():
+    return StubBackend(latency_ms=0, token_ms=0, completion_tokens=12)
+
+
+def test_create_backend_by_name(monkeypatch):
+    monkeypatch.setenv("LLM_BACKEND", "STUB")
+    assert isinstance(create_backend(), StubBackend)
+    with pytest.raises(ValueError, match="Unknown LLM_BACKEND"):
+        create_backend("mystery")
+
+
+def test_stub_answers_extraction_prompts(stub):
+    prompt = 'Return EXACTLY in this format: TICKER,TIMEFRAME\nUser: "How has Nvidia done over the past year?"'
+    assert stub.chat([{"role": "user", "content": prompt}], max_tokens=15).content == "NVDA,1y"
+    unknown = 'Return EXACTLY in this format: TICKER,TIMEFRAME\nUser: "what about the weather"'
+    assert stub.chat([{"role": "user", "content": unknown}], max_tokens=15).content == "INVALID,NONE"
+
+
+def test_stub_requests_tools_then_answers(stub):
+    messages = [{"role": "user", "content": "How has Apple done over the past 6 months?"}]
+    first = stub.chat(messages, max_tokens=800, tools=TOOL_DEFINITIONS)
+    assert [(call.name, json.loads(call.arguments)) for call in first.tool_calls] == [
+        ("fetch_stock_data", {"ticker": "AAPL"}),
+        ("fetch_historical_data", {"ticker": "AAPL", "period": "6mo"}),
+    ]
+    messages.append({"role": "tool", "tool_call_id": "call_quote", "content": "{}"})
+    final = stub.chat(messages, max_tokens=5, tools=TOOL_DEFINITIONS)
+    assert not final.tool_calls
+    # "Stub analysis:" plus max_tokens generated words
+    assert final.usage["completion_tokens"] == len(final.content.split()) == 2 + 5
+
+
+def test_stub_stream_matches_chat_and_reports_usage(stub):
+    messages = [{"role": "user", "content": "Analyze MSFT"}]
+    usage = []
+    streamed = "".join(stub.stream_chat(messages, max_tokens=800, on_usage=usage.append))
+    assert streamed == stub.chat(messages, max_tokens=800).content
+    assert usage[0]["completion_tokens"] > 1
+
+
+def test_openai_backend_parses_content_tool_calls_and_usage():
+    body = {
+        "choices": [{"message": {"content": None, "tool_calls": [
+            {"id": "c1", "function": {"name": "fetch_stock_data", "arguments": "{\"ticker\": \"AAPL\"}"}},
+        ]}}],
+        "usage": {"prompt_tokens": 50, "completion_tokens": 7, "total_tokens": 57},
+    }
+    backend = openai_backend(FakeResponse(body))
+    result = backend.chat([{"role": "user", "content": "Apple?"}], max_tokens=100, tools=TOOL_DEFINITIONS)
+    assert result.tool_calls[0].name == "fetch_stock_data"
+    assert result.usage == {"prompt_tokens": 50, "completion_tokens": 7}
+    payload = backend.session.payloads[0]
+    assert (payload["model"], payload["tool_choice"]) == ("test-model", "auto")
+
+
+def test_openai_backend_streams_server_sent_events():
+    lines = [
+        'data: {"choices": [{"delta": {"content": "Hello"}}]}',
+        "",
+        ": keepalive",
+        'data: {"choices": [{"delta": {"content": " world"}}]}',
+        'data: {"choices": [], "usage": {"prompt_tokens": 9, "completion_tokens": 2}}',
+        "data: [DONE]",
+        'data: {"choices": [{"delta": {"content": "ignored"}}]}',
+    ]
+    backend = openai_backend(FakeResponse(lines=lines))
+    usage = []
+    chunks = list(backend.stream_chat([{"role": "user", "content": "Hi"}], max_tokens=10, on_usage=usage.append))
+    assert chunks == ["Hello", " world"]
+    assert usage == [{"prompt_tokens": 9, "completion_tokens": 2}]
+    assert backend.session.payloads[0]["stream"] is True
@@ -0,0 +1,193 @@
+import pytest
+
+from llm_backends import ChatResult, StubBackend
+from llm_parser import TickerParser, fast_extract_ticker_and_timeframe, normalize_query
+from response_cache import AnalysisCache
+
+
+class ScriptedBackend:
+    """Answers every extraction with the next scripted reply (None raises) and counts the calls"""
+
+    name = "scripted"
+    model = "scripted"
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.calls = 0
+
+    def chat(self, messages, max_tokens, temperature=0, tools=None, tool_choice=None):
+        self.calls += 1
+        reply = self.replies.pop(0)
+        if reply is None:
+            raise RuntimeError("LLM unavailable")
+        return ChatResult(reply, usage={"prompt_tokens": 10, "completion_tokens": 2})
+
+
+class BrokenStreamBackend(StubBackend):
+    """Stub whose streams fail after a couple of chunks"""
+
+    def stream_chat(self, messages, max_tokens, temperature=0, on_usage=None):
+        yield "Partial"
+        yield " answer"
+        raise RuntimeError("connection reset")
+
+
+QUOTE = {"ticker": "AAPL", "price": 190.0, "marketCap": 3.0e12, "pe_ratio": 30.0, "name": "Apple Inc."}
+
+
+@pytest.fixture
+def analysis_cache_path(tmp_path, monkeypatch):
+    monkeypatch.setenv("ANALYSIS_CACHE_PATH", str(tmp_path / "analysis_cache.db"))
+
+
+@pytest.fixture
+def cache_path(tmp_path, monkeypatch):
+    path = tmp_path / "ticker_cache.json"
+    monkeypatch.setenv("TICKER_CACHE_PATH", str(path))
+    return path
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("Tell me about Apple", ("AAPL", None)),
+    ("How has MSFT done over the past 3 months?", ("MSFT", "3mo")),
+    ("coca-cola over five years", ("KO", "5y")),
+    ("nvda", ("NVDA", None)),
+    ("Tesla past year", ("TSLA", "1y")),
+])
+def test_fast_path_resolves_unambiguous_queries(query, expected):
+    assert fast_extract_ticker_and_timeframe(query) == expected
+
+
+@pytest.mark.parametrize("query", [
+    "Microsoft last quarter",
+    "How did Apple do this quarter?",
+    "Apple over the last 2 weeks",
+    "Compare Apple and Microsoft",
+    "What did the FOMC say?",
+    "Apple past month versus past year",
+])
+def test_fast_path_defers_to_the_llm(query):
+    assert fast_extract_ticker_and_timeframe(query) is None
+
+
+def test_normalized_queries_share_a_cache_entry(cache_path):
+    backend = ScriptedBackend("MSFT,3mo")
+    parser = TickerParser(backend)
+    assert parser.extract_ticker_and_timeframe("Microsoft last quarter?") == ("MSFT", "3mo")
+    assert parser.extract_ticker_and_timeframe("  microsoft   LAST quarter ") == ("MSFT", "3mo")
+    assert backend.calls == 1
+    stats = parser.get_extraction_stats()
+    assert (stats["llm_calls"], stats["cache_hits"], stats["fast_path"]) == (1, 1, 0)
+
+
+def test_fast_path_never_calls_the_llm(cache_path):
+    backend = ScriptedBackend()
+    parser = TickerParser(backend)
+    assert parser.extract_ticker_and_timeframe("Apple") == ("AAPL", None)
+    assert backend.calls == 0
+    assert parser.get_extraction_stats()["fast_path"] == 1
+
+
+def test_misses_and_failures_are_not_cached(cache_path):
+    backend = ScriptedBackend("INVALID,NONE", None, "ACME,1y")
+    parser = TickerParser(backend)
+    query = "the rocket company from the cartoons"
+    assert parser.extract_ticker_and_timeframe(query) == (None, None)
+    assert parser.extract_ticker_and_timeframe(query) == (None, None)
+    assert parser.extract_ticker_and_timeframe(query) == ("ACME", "1y")
+    assert backend.calls == 3
+    assert parser.get_extraction_stats()["cache_size"] == 1
+
+
+def test_cache_is_persisted_for_the_next_parser(cache_path):
+    TickerParser(ScriptedBackend("ACME,1y")).extract_ticker_and_timeframe("rocket company past year")
+    assert cache_path.exists()
+
+    backend = ScriptedBackend()
+    assert TickerParser(backend).extract_ticker_and_timeframe("Rocket company past year!") == ("ACME", "1y")
+    assert backend.calls == 0
+
+
+def test_normalize_query():
+    assert normalize_query("  How is  Apple?! ") == "how is apple"
+
+
+def test_streamed_analysis_matches_the_blocking_one(cache_path, analysis_cache_path):
+    parser = TickerParser(StubBackend(latency_ms=0, token_ms=0, completion_tokens=20))
+    chunks = list(parser.stream_analysis_summary("AAPL", QUOTE, "Is Apple a buy?"))
+    assert len(chunks) > 1
+    assert parser.last_stream_timing["cached"] is False
+    assert 0 <= parser.last_stream_timing["time_to_first_token"] <= parser.last_stream_timing["total"]
+    assert parser.token_usage.calls == 1
+
+    blocking = TickerParser(StubBackend(latency_ms=0, token_ms=0, completion_tokens=20))
+    # Without a cache, so the answer is generated rather than replayed from the stream
+    blocking.analysis_cache = AnalysisCache(path="")
+    assert "".join(chunks).strip() == blocking.generate_analysis_summary("AAPL", QUOTE, "Is Apple a buy?")
+
+
+def test_completed_stream_is_replayed_from_the_cache(cache_path, analysis_cache_path):
+    parser = TickerParser(StubBackend(latency_ms=0, token_ms=0, completion_tokens=20))
+    streamed = "".join(parser.stream_analysis_summary("AAPL", QUOTE, "Is Apple a buy?")).strip()
+    assert list(parser.stream_analysis_summary("AAPL", QUOTE, "Is Apple a buy?")) == [streamed]
+    assert parser.last_stream_timing["cached"] is True
+    assert parser.token_usage.calls == 1
+
+
+def test_failed_or_abandoned_streams_are_not_cached(cache_path, analysis_cache_path):
+    broken = TickerParser(BrokenStreamBackend(latency_ms=0, token_ms=0))
+    assert "".join(broken.stream_analysis_summary("AAPL", QUOTE, "Is Apple a buy?")) == "Partial answer"
+    assert broken.last_stream_timing["total"] is not None
+
+    parser = TickerParser(StubBackend(latency_ms=0, token_ms=0, completion_tokens=20))
+    stream = parser.stream_analysis_summary("AAPL", QUOTE, "Is Apple a buy?")
+    next(stream)
+    stream.close()
+    assert parser.analysis_cache.get(parser._analysis_cache_key("AAPL", QUOTE, "Is Apple a buy?")) is None
+
+
+def test_analysis_is_reused_for_the_same_question_over_nearly_the_same_data(cache_path, analysis_cache_path):
+    backend = StubBackend(latency_ms=0, token_ms=0, completion_tokens=20)
+    parser = TickerParser(backend)
+    answer = parser.generate_analysis_summary("AAPL", QUOTE, "Is Apple a buy?")
+    assert parser.generate_analysis_summary("AAPL", dict(QUOTE, price=190.04), "is apple a buy") == answer
+    assert parser.token_usage.calls == 1
+
+    parser.generate_analysis_summary("AAPL", dict(QUOTE, price=195.0), "Is Apple a buy?")
+    parser.generate_analysis_summary("AAPL", QUOTE, "Is Apple a sell?")
+    assert parser.token_usage.calls == 3
+
+
+def test_extraction_cache_keeps_the_most_recent_queries(cache_path, monkeypatch):
+    monkeypatch.setenv("TICKER_CACHE_SIZE", "2")
+    backend = ScriptedBackend("AAA,NONE", "BBB,NONE", "CCC,NONE", "BBB,NONE")
+    parser = TickerParser(backend)
+    for query in ("first company", "second company", "first company", "third company", "second company"):
+        parser.extract_ticker_and_timeframe(query)
+    # "second company" was least recently used when "third company" arrived, so it was looked up again
+    assert backend.calls == 4
+    assert parser.get_extraction_stats()["cache_size"] == 2
+
+
+def test_zero_size_disables_the_extraction_cache(monkeypatch):
+    monkeypatch.setenv("TICKER_CACHE_PATH", "")
+    monkeypatch.setenv("TICKER_CACHE_SIZE", "0")
+    backend = ScriptedBackend("ACME,NONE", "ACME,NONE")
+    parser = TickerParser(backend)
+    parser.extract_ticker_and_timeframe("rocket company")
+    parser.extract_ticker_and_timeframe("rocket company")
+    assert backend.calls == 2
+
+
+def test_analysis_cache_key_covers_the_indicators_in_the_prompt(cache_path, analysis_cache_path):
+    parser = TickerParser(StubBackend(latency_ms=0, token_ms=0))
+    indicators = {"period": "6mo", "interval": "1d", "latest": {"rsi_14": 71.2}, "period_stats": {"vwap": 180.0}}
+
+    def key(indicators):
+        return parser._analysis_cache_key("AAPL", QUOTE, "Is Apple a buy?", indicators=indicators)
+
+    assert key(indicators) != key(None)
+    assert key(indicators) != key(dict(indicators, latest={"rsi_14": 35.0}))
+    assert key(indicators) == key(dict(indicators, latest={"rsi_14": 71.21}))
+    # Indicators that add nothing to the prompt leave the key as it was without them
+    assert key({"period": "6mo", "latest": {}, "period_stats": {}}) == key(None)
@@ -0,0 +1,70 @@
+import logging
+import logging.handlers
+
+import pytest
+
+import logging_setup
+from logging_setup import RequestLogger, configure_logging, summarize
+
+
+@pytest.fixture
+def root_logging():
+    """Restore the root logger pytest configured after a test reconfigures it"""
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield root
+    logging_setup._stop_listener()
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+
+def test_summarize_keeps_scalars_and_sizes_collections():
+    parameters = {
+        "ticker": "AAPL",
+        "tickers": ["AAPL", "MSFT"],
+        "holdings": {"AAPL": 0.5, "MSFT": 0.5},
+        "query": "x" * 41,
+        "limit": 10,
+    }
+    assert summarize(parameters) == {
+        "ticker": "AAPL",
+        "tickers": "<list 2 items>",
+        "holdings": "<dict 2 keys>",
+        "query": "<str 41 chars>",
+        "limit": 10,
+    }
+    assert summarize(None) is None
+
+
+def test_sampled_out_successes_are_skipped_but_failures_always_logged(caplog):
+    caplog.set_level(logging.INFO, logger="test.requests")
+    request_logger = RequestLogger("test.requests", sample_rate=0.0)
+    request_logger.log("POST", "/tool_call", 200, 0.01, tool="fetch_stock_data")
+    request_logger.log("POST", "/tool_call", 503, 0.02, tool="fetch_stock_data", parameters={"ticker": "AAPL"})
+    assert [record.levelno for record in caplog.records] == [logging.WARNING]
+    assert "status=503" in caplog.records[0].getMessage()
+    assert "'ticker': 'AAPL'" in caplog.records[0].getMessage()
+
+
+def test_every_request_is_logged_at_full_sample_rate(caplog):
+    caplog.set_level(logging.INFO, logger="test.requests")
+    request_logger = RequestLogger("test.requests", sample_rate=1.0)
+    for _ in range(3):
+        request_logger.log("GET", "/health", 200, 0.001, response_bytes=16)
+    assert len(caplog.records) == 3
+    assert "duration_ms=1.0 response_bytes=16" in caplog.records[0].getMessage()
+
+
+def test_sample_rate_defaults_from_the_environment(monkeypatch):
+    monkeypatch.setenv("REQUEST_LOG_SAMPLE_RATE", "0.25")
+    assert RequestLogger("test.requests").sample_rate == 0.25
+
+
+def test_async_logging_goes_through_the_queue(root_logging, monkeypatch, capsys):
+    monkeypatch.setenv("LOG_ASYNC", "1")
+    configure_logging("INFO")
+    assert isinstance(root_logging.handlers[0], logging.handlers.QueueHandler)
+    logging.getLogger("test.async").info("queued message")
+    # Stopping the listener drains the queue
+    logging_setup._stop_listener()
+    assert "test.async - INFO - queued message" in capsys.readouterr().err
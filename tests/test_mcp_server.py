@@ -0,0 +1,143 @@
+import time
+import threading
+
+import pandas as pd
+import pytest
+
+import mcp_server
+from finance_mcp_client import history_to_dataframe
+from llm_parser import history_close_endpoints
+from data_fetchers.quote_cache import QuoteCache
+from data_fetchers.screener import Screener
+from upstream_scheduler import UpstreamScheduler
+
+
+class CountingLoader:
+    def __init__(self, data):
+        self.data = data
+        self.calls = []
+
+    def __call__(self, ticker):
+        self.calls.append(ticker)
+        return self.data
+
+
+@pytest.fixture
+def loaders(monkeypatch):
+    loaders = {
+        "price": CountingLoader({"price": 10.0, "currency": "USD", "marketCap": 1e9}),
+        "profile": CountingLoader({"name": "Test", "sector": "Technology", "industry": "Software",
+                                   "description": "", "trailingEps": 1.0}),
+    }
+    monkeypatch.setattr(mcp_server, "quote_cache", QuoteCache(loaders, price_ttl=60, profile_ttl=600))
+    return loaders
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    # Full bucket of 2 plus 1 call/s over a 3s batch deadline: at most 5 Yahoo calls per batch
+    monkeypatch.setenv("UPSTREAM_YAHOO_RATE", "1")
+    monkeypatch.setenv("UPSTREAM_YAHOO_BURST", "2")
+    monkeypatch.setenv("UPSTREAM_BATCH_MAX_WAIT", "3")
+    scheduler = UpstreamScheduler()
+    monkeypatch.setattr(mcp_server, "scheduler", scheduler)
+    return scheduler
+
+
+@pytest.fixture
+def client():
+    return mcp_server.app.test_client()
+
+
+def tool_call(client, name, **parameters):
+    return client.post("/tool_call", json={"name": name, "parameters": parameters})
+
+
+def test_batch_defaults_to_price_fields(client, loaders, scheduler):
+    response = tool_call(client, "fetch_stock_data_batch", tickers=["aapl", "MSFT", "AAPL"])
+    assert response.status_code == 200
+    data = response.get_json()["data"]
+    assert data["requested"] == 2
+    assert data["results"]["AAPL"] == {"ticker": "AAPL", "price": 10.0, "currency": "USD", "marketCap": 1e9}
+    assert loaders["profile"].calls == []
+
+
+def test_batch_that_can_never_fit_the_deadline_is_rejected(client, loaders, scheduler):
+    response = tool_call(client, "fetch_stock_data_batch", tickers=[f"T{i}" for i in range(6)])
+    assert response.status_code == 400
+    assert "at most 5" in response.get_json()["error"]
+    # Three tickers with profiles need six calls
+    response = tool_call(client, "fetch_stock_data_batch", tickers=["A", "B", "C"], fields=["name", "price"])
+    assert response.status_code == 400
+    assert loaders["price"].calls == loaders["profile"].calls == []
+
+
+def test_batch_waits_for_the_bucket_to_refill(client, loaders, scheduler):
+    yahoo = scheduler.upstream("yahoo")
+    for _ in range(2):
+        yahoo.acquire()
+        yahoo.release()
+    response = tool_call(client, "fetch_stock_data_batch", tickers=[f"T{i}" for i in range(5)])
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert loaders["price"].calls == []
+
+
+def test_cached_quotes_do_not_count_against_the_batch(client, loaders, scheduler):
+    for ticker in ("A", "B", "C", "D"):
+        mcp_server.quote_cache.get(ticker, fields=("price",))
+    response = tool_call(client, "fetch_stock_data_batch", tickers=["A", "B", "C", "D", "E", "F"])
+    assert response.status_code == 200
+    assert len(response.get_json()["data"]["results"]) == 6
+    assert len(loaders["price"].calls) == 6
+
+
+def test_screen_before_the_first_snapshot_says_it_is_loading(client, monkeypatch):
+    release = threading.Event()
+    screener = Screener(lambda ticker: release.wait(5) and {"price": 1.0}, universe=["AAPL"], path="")
+    monkeypatch.setattr(mcp_server, "screener", screener)
+    try:
+        response = tool_call(client, "screen_stocks", sector="Technology")
+        assert response.status_code == 503
+        assert response.get_json()["status"] == "loading"
+        assert response.headers["Retry-After"] == "5"
+    finally:
+        release.set()
+
+
+def test_snapshot_refreshes_do_not_count_as_cache_lookups(loaders, scheduler):
+    quote = mcp_server.screener_quote("AAPL")
+    assert quote["price"] == 10.0 and quote["sector"] == "Technology"
+    stats = mcp_server.quote_cache.stats()
+    assert stats["misses"] == 0 and stats["hits"] == 0
+    assert stats["prefetches"] == 2
+
+    # Still-fresh classes are served from the cache without loading again
+    mcp_server.screener_quote("AAPL")
+    assert len(loaders["price"].calls) == 1 and mcp_server.quote_cache.stats()["hits"] == 0
+
+
+@pytest.mark.parametrize("period", ["1mo", "1y"])
+def test_columnar_history_decodes_to_the_same_frame_as_records(client, period):
+    responses = {
+        format: tool_call(client, "fetch_historical_data", ticker="AAPL", period=period, format=format)
+        for format in ("records", "columnar")
+    }
+    assert all(response.status_code == 200 for response in responses.values())
+    records, columnar = (responses[format].get_json()["data"] for format in ("records", "columnar"))
+
+    assert columnar["format"] == "columnar" and columnar["columns"][0] == "Date"
+    assert len(responses["columnar"].data) < len(responses["records"].data)
+    decoded = history_to_dataframe(columnar).reset_index(drop=True)
+    expected = history_to_dataframe(records).reset_index(drop=True)
+    # jsonify sorts the keys of each record and epoch seconds parse at second resolution
+    expected["Date"] = expected["Date"].astype(decoded["Date"].dtype)
+    pd.testing.assert_frame_equal(decoded, expected[decoded.columns])
+    assert str(history_to_dataframe(columnar)["Date"].dt.tz) == records["timezone"]
+    assert history_close_endpoints(columnar) == history_close_endpoints(records)
+
+
+def test_unknown_history_format_is_rejected(client):
+    response = tool_call(client, "fetch_historical_data", ticker="AAPL", format="parquet")
+    assert response.status_code == 400
+    assert "format must be one of" in response.get_json()["error"]
@@ -0,0 +1,68 @@
+import os
+import json
+import time
+
+from metrics import Registry
+
+
+def make_registry():
+    registry = Registry()
+    requests = registry.counter("requests_total", "Requests", ("path",))
+    registry.register_collector(lambda: [("queue_depth", "gauge", "Queued calls", [({}, 3)])])
+    return registry, requests
+
+
+def write_snapshot(directory, pid, families, age=0.0):
+    path = os.path.join(directory, f"metrics-{pid}.json")
+    with open(path, "w") as f:
+        json.dump(families, f)
+    if age:
+        os.utime(path, (time.time() - age, time.time() - age))
+
+
+def test_share_removes_only_old_snapshots(tmp_path):
+    (tmp_path / "metrics-123.json").write_text("[]")
+    (tmp_path / "settings.json").write_text("{}")
+    (tmp_path / "metrics-notes.json").write_text("{}")
+    registry, _ = make_registry()
+    registry.share(str(tmp_path), flush_interval=1)
+    assert sorted(os.listdir(tmp_path)) == ["metrics-notes.json", "settings.json"]
+
+
+def test_flush_writes_this_process_snapshot(tmp_path):
+    registry, requests = make_registry()
+    registry.share(str(tmp_path), flush_interval=1)
+    requests.inc(path="/tool_call")
+    registry.flush()
+    with open(tmp_path / f"metrics-{os.getpid()}.json") as f:
+        families = {name: samples for name, kind, help, samples in json.load(f)}
+    assert families["requests_total"] == [["requests_total", {"path": "/tool_call"}, 1]]
+
+
+def test_render_sums_counters_and_labels_live_gauges_by_pid(tmp_path):
+    registry, requests = make_registry()
+    registry.share(str(tmp_path), flush_interval=1)
+    requests.inc(2, path="/tool_call")
+    other = [
+        ["requests_total", "counter", "Requests", [["requests_total", {"path": "/tool_call"}, 5]]],
+        ["queue_depth", "gauge", "Queued calls", [["queue_depth", {}, 7]]],
+    ]
+    write_snapshot(str(tmp_path), 111, other)
+    # An exited worker: its counts still add up, its gauges are dropped
+    write_snapshot(str(tmp_path), 222, other, age=60)
+    (tmp_path / "unrelated.json").write_text("not json")
+
+    text = registry.render()
+    assert 'requests_total{path="/tool_call"} 12' in text
+    assert f'queue_depth{{pid="{os.getpid()}"}} 3' in text
+    assert 'queue_depth{pid="111"} 7' in text
+    assert 'pid="222"' not in text
+
+
+def test_unshared_registry_renders_its_own_metrics():
+    registry, requests = make_registry()
+    requests.inc(path="/health")
+    text = registry.render()
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{path="/health"} 1' in text
+    assert "queue_depth 3" in text
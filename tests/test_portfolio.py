@@ -0,0 +1,89 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_fetchers.portfolio import normalize_weights, align_closes, portfolio_analytics, TRADING_DAYS
+
+
+def random_prices(tickers, n=120, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2024-01-01", periods=n, freq="B")
+    returns = rng.normal(0.0005, 0.01, (n, len(tickers)))
+    return pd.DataFrame(100 * np.cumprod(1 + returns, axis=0), index=index, columns=tickers)
+
+
+def test_normalize_weights_scales_to_one():
+    assert normalize_weights({"AAPL": 3000, "MSFT": 1000}) == {"AAPL": 0.75, "MSFT": 0.25}
+    assert normalize_weights({"AAPL": 2, "TSLA": -1}) == {"AAPL": 2.0, "TSLA": -1.0}
+
+
+def test_normalize_weights_rejects_zero_sum():
+    with pytest.raises(ValueError):
+        normalize_weights({"AAPL": 1, "TSLA": -1})
+
+
+def test_align_closes_joins_time_zones_by_local_date():
+    us = pd.Series([10.0, 11.0, 12.0],
+                   index=pd.date_range("2024-01-02 16:00", periods=3, freq="D", tz="America/New_York"))
+    # 2024-01-03 is a holiday here, so it is forward-filled
+    jp = pd.Series([100.0, 102.0],
+                   index=pd.DatetimeIndex(["2024-01-02 15:00", "2024-01-04 15:00"], tz="Asia/Tokyo"))
+    frame, dropped = align_closes({"AAPL": us, "7203.T": jp}, min_observations=1)
+    assert dropped == {}
+    assert list(frame.index.strftime("%Y-%m-%d")) == ["2024-01-02", "2024-01-03", "2024-01-04"]
+    assert frame["7203.T"].tolist() == [100.0, 100.0, 102.0]
+
+
+def test_align_closes_drops_short_and_empty_series():
+    full = pd.Series(range(1, 31), index=pd.date_range("2024-01-01", periods=30), dtype=float)
+    short = full.iloc[-5:]
+    frame, dropped = align_closes({"AAPL": full, "NEW": short, "GONE": pd.Series(dtype=float)})
+    assert list(frame.columns) == ["AAPL"]
+    assert len(frame) == 30
+    assert set(dropped) == {"NEW", "GONE"}
+    assert dropped["GONE"] == "no price history"
+
+
+def test_portfolio_analytics_matches_direct_computation():
+    prices = random_prices(["AAPL", "MSFT", "TSLA"])
+    weights = {"AAPL": 0.5, "MSFT": 0.3, "TSLA": 0.2}
+    result = portfolio_analytics(prices, weights, include_matrices=True)
+
+    returns = prices.pct_change().dropna()
+    portfolio = returns @ pd.Series(weights)
+    assert result["observations"] == len(returns)
+    assert result["total_return"] == pytest.approx((1 + portfolio).prod() - 1, abs=1e-6)
+    assert result["volatility"] == pytest.approx(portfolio.std() * math.sqrt(TRADING_DAYS), abs=1e-6)
+    assert result["value_at_risk"]["historical"] == pytest.approx(-portfolio.quantile(0.05), abs=1e-6)
+    assert result["value_at_risk"]["expected_shortfall"] >= result["value_at_risk"]["historical"]
+    assert result["beta"] is None
+
+    holdings = result["holdings"]
+    assert sum(h["risk_contribution"] for h in holdings.values()) == pytest.approx(1, abs=1e-5)
+    assert holdings["TSLA"]["volatility"] == pytest.approx(
+        returns["TSLA"].std() * math.sqrt(TRADING_DAYS), abs=1e-6
+    )
+    correlation = np.array(result["matrices"]["correlation"])
+    assert np.allclose(np.diag(correlation), 1)
+    assert np.allclose(correlation, returns.corr().to_numpy(), atol=1e-4)
+
+
+def test_beta_against_benchmark():
+    prices = random_prices(["AAPL", "MSFT"], seed=1)
+    benchmark = prices["AAPL"] * 0.5 + prices["MSFT"] * 0.5
+    result = portfolio_analytics(prices, {"AAPL": 0.5, "MSFT": 0.5}, benchmark=benchmark)
+    returns = prices.pct_change().dropna()
+    bench_returns = benchmark.pct_change().dropna()
+    expected = returns["AAPL"].cov(bench_returns) / bench_returns.var()
+    assert result["holdings"]["AAPL"]["beta"] == pytest.approx(expected, abs=1e-6)
+    assert result["beta"] == pytest.approx(
+        0.5 * expected + 0.5 * returns["MSFT"].cov(bench_returns) / bench_returns.var(), abs=1e-6
+    )
+    assert "benchmark_return" in result
+
+
+def test_too_few_prices_raise():
+    with pytest.raises(ValueError):
+        portfolio_analytics(random_prices(["AAPL"], n=2), {"AAPL": 1.0})
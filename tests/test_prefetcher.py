@@ -0,0 +1,138 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from data_fetchers.prefetcher import Prefetcher, Popularity, market_phase, next_open, MARKET_TIMEZONE
+
+PREOPEN = timedelta(minutes=30)
+
+
+def ny(*args):
+    return datetime(*args, tzinfo=MARKET_TIMEZONE)
+
+
+def make_prefetcher(tmp_path, **kwargs):
+    options = {"watchlist": [], "top_n": 5, "interval": 60, "preopen_minutes": 30, "half_life_hours": 1,
+               "path": str(tmp_path / "popularity.json")}
+    options.update(kwargs)
+    return Prefetcher(lambda ticker: {"ticker": ticker}, **options)
+
+
+@pytest.mark.parametrize("now, phase", [
+    (ny(2024, 6, 12, 8, 59), "closed"),
+    (ny(2024, 6, 12, 9, 0), "preopen"),
+    (ny(2024, 6, 12, 9, 30), "open"),
+    (ny(2024, 6, 12, 15, 59), "open"),
+    (ny(2024, 6, 12, 16, 0), "closed"),
+    # Saturday
+    (ny(2024, 6, 15, 11, 0), "closed"),
+])
+def test_market_phase(now, phase):
+    assert market_phase(now, PREOPEN) == phase
+
+
+def test_market_phase_converts_from_other_time_zones():
+    from zoneinfo import ZoneInfo
+    # 15:00 in London is 10:00 in New York during summer time
+    assert market_phase(datetime(2024, 6, 12, 15, 0, tzinfo=ZoneInfo("Europe/London")), PREOPEN) == "open"
+
+
+def test_next_open_skips_the_weekend():
+    assert next_open(ny(2024, 6, 12, 8, 0)) == ny(2024, 6, 12, 9, 30)
+    assert next_open(ny(2024, 6, 12, 9, 30)) == ny(2024, 6, 12, 9, 30)
+    assert next_open(ny(2024, 6, 14, 17, 0)) == ny(2024, 6, 17, 9, 30)
+
+
+def test_delay_during_the_session_follows_the_interval(tmp_path):
+    prefetcher = make_prefetcher(tmp_path)
+    now = ny(2024, 6, 12, 11, 0)
+    assert prefetcher.delay(now) == 0.0
+    prefetcher.last_run = now.timestamp() - 20
+    assert prefetcher.delay(now) == pytest.approx(40)
+    prefetcher.last_run = now.timestamp() - 90
+    assert prefetcher.delay(now) == 0.0
+
+
+def test_delay_waits_for_the_close_to_settle_then_runs_once(tmp_path):
+    prefetcher = make_prefetcher(tmp_path)
+    prefetcher.last_run = ny(2024, 6, 12, 15, 59).timestamp()
+    assert prefetcher.delay(ny(2024, 6, 12, 16, 2)) == pytest.approx(180)
+    assert prefetcher.delay(ny(2024, 6, 12, 16, 10)) == 0.0
+
+    # After the post-close pass it sleeps until the next pre-open window
+    prefetcher.last_run = ny(2024, 6, 12, 16, 10).timestamp()
+    assert prefetcher.delay(ny(2024, 6, 12, 16, 10)) == pytest.approx(
+        (ny(2024, 6, 13, 9, 0) - ny(2024, 6, 12, 16, 10)).total_seconds()
+    )
+
+
+def test_delay_over_the_weekend(tmp_path):
+    prefetcher = make_prefetcher(tmp_path)
+    now = ny(2024, 6, 15, 12, 0)
+    assert prefetcher.delay(now) == pytest.approx((ny(2024, 6, 17, 9, 0) - now).total_seconds())
+
+
+def test_popularity_decays_with_its_half_life():
+    popularity = Popularity(half_life=3600)
+    popularity.record("AAPL", now=0, weight=4)
+    popularity.record("MSFT", now=3600)
+    # At two hours AAPL has decayed from 4 to 1 and MSFT from 1 to 0.5
+    assert popularity.top(5, now=7200) == ["AAPL", "MSFT"]
+    assert popularity.top(5, min_score=0.6, now=7200) == ["AAPL"]
+    assert popularity.top(1, min_score=0, now=7200) == ["AAPL"]
+    assert popularity.top(5, now=4 * 3600) == []
+
+
+def test_merge_keeps_the_higher_score_and_forgets_faded_tickers():
+    popularity = Popularity(half_life=3600)
+    popularity.record("AAPL", now=0)
+    popularity.merge({"AAPL": [3.0, 0], "TSLA": [1.0, -20 * 3600]}, now=0)
+    assert popularity.top(5, min_score=2.5, now=0) == ["AAPL"]
+    assert "TSLA" not in popularity.to_dict()
+
+
+def test_batch_requests_are_split_over_their_tickers(tmp_path):
+    prefetcher = make_prefetcher(tmp_path)
+    prefetcher.record(["aapl"])
+    prefetcher.record([f"T{i}" for i in range(100)])
+    assert prefetcher.popularity.top(5) == ["AAPL"]
+
+
+def test_targets_put_the_watchlist_first(tmp_path):
+    prefetcher = make_prefetcher(tmp_path, watchlist=["SPY", "AAPL"], top_n=2)
+    for ticker in ("AAPL", "AAPL", "AAPL", "MSFT", "MSFT", "TSLA"):
+        prefetcher.record([ticker])
+    assert prefetcher.targets() == ["SPY", "AAPL", "MSFT"]
+
+
+def test_run_once_persists_popularity_for_other_workers(tmp_path):
+    loaded = []
+    prefetcher = make_prefetcher(tmp_path)
+    prefetcher.quote_loader = loaded.append
+    prefetcher.record(["AAPL"])
+    result = prefetcher.run_once()
+    assert loaded == ["AAPL"]
+    assert result["tickers"] == 1 and result["errors"] == {}
+
+    with open(tmp_path / "popularity.json") as f:
+        assert set(json.load(f)["scores"]) == {"AAPL"}
+    assert make_prefetcher(tmp_path).targets() == ["AAPL"]
+
+
+def test_only_the_lock_holder_refreshes_history(tmp_path):
+    batches = []
+    first = make_prefetcher(tmp_path, history_loader=batches.append)
+    second = make_prefetcher(tmp_path, history_loader=batches.append)
+    first.record(["AAPL"])
+    first.run_once()
+    second.run_once()
+    assert batches == [["AAPL"]]
+    assert first.stats()["refreshes_history"]
+    assert not second.stats()["refreshes_history"]
+
+
+def test_disabled_without_targets_or_interval(tmp_path):
+    assert not make_prefetcher(tmp_path, top_n=0).enabled
+    assert not make_prefetcher(tmp_path, interval=0).enabled
+    assert make_prefetcher(tmp_path, top_n=0, watchlist=["SPY"]).enabled
@@ -0,0 +1,174 @@
+import time
+import threading
+
+import pytest
+
+from data_fetchers.quote_cache import QuoteCache
+
+
+class CountingLoader:
+    """Loader that records its calls and can be held until released"""
+
+    def __init__(self, data=None, delay=0.0):
+        self.data = data or {"price": 100.0, "currency": "USD", "marketCap": 1e12}
+        self.delay = delay
+        self.calls = []
+        self.error = None
+        self._lock = threading.Lock()
+
+    def __call__(self, ticker):
+        with self._lock:
+            self.calls.append(ticker)
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.data
+
+
+PROFILE = {"name": "Apple Inc.", "sector": "Technology", "industry": "Consumer Electronics",
+           "description": "Phones", "trailingEps": 6.0}
+
+
+def make_cache(price=None, profile=None, **kwargs):
+    loaders = {"price": price or CountingLoader(), "profile": profile or CountingLoader(PROFILE)}
+    return QuoteCache(loaders, **dict({"price_ttl": 60, "profile_ttl": 600, "max_size": 100}, **kwargs)), loaders
+
+
+def test_second_lookup_is_a_hit():
+    cache, loaders = make_cache()
+    first = cache.get("aapl")
+    second = cache.get("AAPL ")
+    assert first["price"] == second["price"] == 100.0
+    assert len(loaders["price"].calls) == 1
+    stats = cache.stats()
+    assert stats["classes"]["price"]["misses"] == 1
+    assert stats["classes"]["price"]["hits"] == 1
+
+
+def test_concurrent_misses_share_one_upstream_fetch():
+    cache, loaders = make_cache(price=CountingLoader(delay=0.1))
+    barrier = threading.Barrier(8)
+    results = []
+
+    def lookup():
+        barrier.wait()
+        results.append(cache.get("AAPL", fields=("price",)))
+
+    threads = [threading.Thread(target=lookup) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert len(results) == 8
+    assert len(loaders["price"].calls) == 1
+    stats = cache.stats()["classes"]["price"]
+    assert stats["misses"] == 1
+    assert stats["coalesced"] == 7
+
+
+def test_waiters_see_the_leaders_error_and_it_is_not_cached():
+    price = CountingLoader(delay=0.1)
+    price.error = RuntimeError("upstream down")
+    cache, _ = make_cache(price=price)
+    errors = []
+
+    def lookup():
+        try:
+            cache.get("AAPL", fields=("price",))
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=lookup) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert len(errors) == 4
+    assert len(price.calls) == 1
+
+    price.error = None
+    assert cache.get("AAPL", fields=("price",))["price"] == 100.0
+    assert len(price.calls) == 2
+
+
+def test_entries_expire_after_their_ttl():
+    cache, loaders = make_cache(price_ttl=0.05)
+    cache.get("AAPL", fields=("price",))
+    cache.get("AAPL", fields=("price",))
+    assert len(loaders["price"].calls) == 1
+    time.sleep(0.08)
+    cache.get("AAPL", fields=("price",))
+    assert len(loaders["price"].calls) == 2
+
+
+def test_least_recently_used_ticker_is_evicted():
+    cache, loaders = make_cache(max_size=2)
+    for ticker in ("AAPL", "MSFT"):
+        cache.get(ticker, fields=("price",))
+    cache.get("AAPL", fields=("price",))
+    cache.get("TSLA", fields=("price",))
+    assert cache.stats()["evictions"] == 1
+    cache.get("AAPL", fields=("price",))
+    assert loaders["price"].calls == ["AAPL", "MSFT", "TSLA"]
+    cache.get("MSFT", fields=("price",))
+    assert loaders["price"].calls[-1] == "MSFT"
+
+
+def test_invalidate_forces_a_reload():
+    cache, loaders = make_cache()
+    cache.get("AAPL", fields=("price",))
+    cache.invalidate("aapl")
+    cache.get("AAPL", fields=("price",))
+    assert len(loaders["price"].calls) == 2
+
+
+def test_price_only_lookups_never_load_the_profile():
+    cache, loaders = make_cache()
+    quote = cache.get("AAPL", fields=("price", "marketCap"))
+    assert quote == {"ticker": "AAPL", "price": 100.0, "marketCap": 1e12}
+    assert loaders["profile"].calls == []
+
+
+def test_pe_ratio_needs_both_classes():
+    cache, loaders = make_cache()
+    quote = cache.get("AAPL", fields=("pe_ratio",))
+    assert quote == {"ticker": "AAPL", "pe_ratio": round(100.0 / 6.0, 2)}
+    assert len(loaders["price"].calls) == len(loaders["profile"].calls) == 1
+
+
+def test_missing_fields_and_losses_are_reported_as_na():
+    cache, _ = make_cache(price=CountingLoader({"price": 20.0}), profile=CountingLoader({"trailingEps": -1.0}))
+    quote = cache.get("AAPL")
+    assert quote["pe_ratio"] == "N/A"
+    assert quote["currency"] == quote["name"] == "N/A"
+
+
+def test_classes_expire_independently():
+    cache, loaders = make_cache(price_ttl=0.05, profile_ttl=600)
+    cache.get("AAPL")
+    time.sleep(0.08)
+    cache.get("AAPL")
+    assert len(loaders["price"].calls) == 2
+    assert len(loaders["profile"].calls) == 1
+
+
+def test_warm_reloads_classes_expiring_soon_without_counting_lookups():
+    cache, loaders = make_cache(price_ttl=1, profile_ttl=600)
+    cache.get("AAPL")
+    cache.warm("AAPL", ahead=5)
+    assert len(loaders["price"].calls) == 2
+    assert len(loaders["profile"].calls) == 1
+    stats = cache.stats()
+    assert stats["classes"]["price"]["prefetches"] == 1
+    assert stats["classes"]["price"]["misses"] == 1
+    assert stats["hits"] == 0
+
+
+@pytest.mark.parametrize("fields", [("price",), ("name",), None])
+def test_stats_report_per_class_hit_rates(fields):
+    cache, _ = make_cache()
+    cache.get("AAPL", fields=fields)
+    cache.get("AAPL", fields=fields)
+    stats = cache.stats()
+    assert stats["hit_rate"] == 0.5
+    assert stats["ttls"] == {"price": 60, "profile": 600}
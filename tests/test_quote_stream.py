@@ -0,0 +1,117 @@
+import time
+import threading
+
+import pytest
+
+from data_fetchers.quote_stream import QuoteStream, StreamFull
+
+
+class MovingLoader:
+    """Quote loader whose price steps up on every poll, recording calls per ticker"""
+
+    def __init__(self):
+        self.calls = {}
+        self.error = None
+        self._lock = threading.Lock()
+
+    def __call__(self, ticker):
+        with self._lock:
+            self.calls[ticker] = self.calls.get(ticker, 0) + 1
+            count = self.calls[ticker]
+        if self.error is not None:
+            raise self.error
+        return {"price": 100.0 + count, "currency": "USD", "marketCap": 1e12, "name": "ignored"}
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def loader():
+    return MovingLoader()
+
+
+def test_subscribers_of_a_ticker_share_one_poller(loader):
+    stream = QuoteStream(loader, interval=0.05, max_subscribers=10)
+    subscriptions = [stream.subscribe(["aapl"]) for _ in range(5)]
+    try:
+        for subscription in subscriptions:
+            events = subscription.get(timeout=2)
+            assert events and events[0]["ticker"] == "AAPL"
+            assert set(events[0]) == {"type", "ticker", "as_of", "price", "currency", "marketCap"}
+        stats = stream.stats()
+        assert stats["subscribers"] == 5
+        assert list(stats["pollers"]) == ["AAPL"]
+        assert stats["pollers"]["AAPL"]["subscribers"] == 5
+        time.sleep(0.2)
+        # One poll per interval for everybody, not one per subscriber
+        assert loader.calls["AAPL"] <= 10
+    finally:
+        for subscription in subscriptions:
+            subscription.close()
+
+
+def test_late_subscribers_get_the_latest_quote_immediately(loader):
+    stream = QuoteStream(loader, interval=60, max_subscribers=10)
+    with stream.subscribe(["AAPL"]) as first:
+        assert first.get(timeout=2)[0]["price"] == 101.0
+        with stream.subscribe(["AAPL"]) as second:
+            assert second.get(timeout=0)[0]["price"] == 101.0
+    assert loader.calls["AAPL"] == 1
+
+
+def test_slow_subscribers_only_see_the_newest_event(loader):
+    stream = QuoteStream(loader, interval=0.02, max_subscribers=10)
+    with stream.subscribe(["AAPL", "MSFT"]) as subscription:
+        wait_for(lambda: loader.calls.get("AAPL", 0) >= 5 and loader.calls.get("MSFT", 0) >= 5)
+        events = subscription.get(timeout=0)
+        assert sorted(event["ticker"] for event in events) == ["AAPL", "MSFT"]
+        assert all(event["price"] > 101.0 for event in events)
+
+
+def test_unchanged_quotes_are_not_republished():
+    stream = QuoteStream(lambda ticker: {"price": 5.0, "currency": "USD", "marketCap": 1.0},
+                         interval=0.02, max_subscribers=10)
+    with stream.subscribe(["AAPL"]) as subscription:
+        assert len(subscription.get(timeout=2)) == 1
+        wait_for(lambda: stream.stats()["pollers"]["AAPL"]["polls"] >= 4)
+        assert subscription.get(timeout=0.05) == []
+
+
+def test_failed_polls_publish_error_events(loader):
+    loader.error = RuntimeError("upstream down")
+    stream = QuoteStream(loader, interval=60, max_subscribers=10)
+    with stream.subscribe(["AAPL"]) as subscription:
+        event = subscription.get(timeout=2)[0]
+        assert event["type"] == "error"
+        assert event["error"] == "upstream down"
+
+
+def test_max_subscribers_is_enforced_and_freed_on_close(loader):
+    stream = QuoteStream(loader, interval=60, max_subscribers=2)
+    first = stream.subscribe(["AAPL"])
+    second = stream.subscribe(["MSFT"])
+    with pytest.raises(StreamFull):
+        stream.subscribe(["TSLA"])
+    assert "TSLA" not in stream.stats()["pollers"]
+    first.close()
+    stream.subscribe(["TSLA"]).close()
+    second.close()
+
+
+def test_pollers_stop_with_their_last_subscriber(loader):
+    stream = QuoteStream(loader, interval=0.02, max_subscribers=10)
+    first = stream.subscribe(["AAPL", "MSFT"])
+    second = stream.subscribe(["AAPL"])
+    first.close()
+    first.close()
+    assert list(stream.stats()["pollers"]) == ["AAPL"]
+    second.close()
+    assert stream.stats() == {"subscribers": 0, "max_subscribers": 10, "interval": 0.02, "pollers": {}}
+    polls = loader.calls.get("AAPL", 0)
+    time.sleep(0.1)
+    assert loader.calls.get("AAPL", 0) <= polls + 1
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_fetchers.resample import resample_bars, lttb_indices, downsample
+
+
+def daily_bars(start="2024-01-01", periods=30):
+    index = pd.date_range(start, periods=periods, freq="B", tz="America/New_York", name="Date")
+    values = np.arange(1, periods + 1, dtype=float)
+    return pd.DataFrame({
+        "Open": values,
+        "High": values + 1,
+        "Low": values - 1,
+        "Close": values + 0.5,
+        "Volume": np.full(periods, 100, dtype="int64"),
+        "Dividends": 0.0,
+        "Stock Splits": 0.0,
+    }, index=index)
+
+
+def test_daily_is_returned_unchanged():
+    hist = daily_bars()
+    assert resample_bars(hist, "1d") is hist
+
+
+def test_unknown_interval_raises():
+    with pytest.raises(ValueError):
+        resample_bars(daily_bars(), "1h")
+
+
+def test_weekly_bars_are_labeled_by_monday():
+    # 2024-01-01 is a Monday: 10 business days make two full weeks
+    weekly = resample_bars(daily_bars(periods=10), "1wk")
+    assert list(weekly.index.strftime("%Y-%m-%d")) == ["2024-01-01", "2024-01-08"]
+    first = weekly.iloc[0]
+    assert first["Open"] == 1 and first["Close"] == 5.5
+    assert first["High"] == 6 and first["Low"] == 0
+    assert first["Volume"] == 500
+    assert weekly["Volume"].dtype == "int64"
+    assert list(weekly.columns) == list(daily_bars().columns)
+
+
+def test_monthly_bars_compound_splits():
+    hist = daily_bars(periods=45)
+    hist.loc[hist.index[3], "Stock Splits"] = 2.0
+    hist.loc[hist.index[10], "Stock Splits"] = 3.0
+    hist.loc[hist.index[5], "Dividends"] = 0.25
+    monthly = resample_bars(hist, "1mo")
+    assert list(monthly.index.strftime("%Y-%m")) == ["2024-01", "2024-02", "2024-03"]
+    assert monthly["Stock Splits"].tolist() == [6.0, 0.0, 0.0]
+    assert monthly["Dividends"].iloc[0] == 0.25
+
+
+@pytest.mark.parametrize("threshold", [0, 50, 100])
+def test_lttb_keeps_everything_when_threshold_is_not_smaller(threshold):
+    x = np.arange(50, dtype=float)
+    assert lttb_indices(x, np.sin(x), threshold).tolist() == list(range(50))
+
+
+def test_lttb_with_one_or_two_points():
+    x = np.arange(50, dtype=float)
+    assert lttb_indices(x, x, 1).tolist() == [49]
+    assert lttb_indices(x, x, 2).tolist() == [0, 49]
+
+
+def test_lttb_keeps_endpoints_and_peaks():
+    x = np.arange(1000, dtype=float)
+    y = np.zeros(1000)
+    y[300], y[700] = 10.0, -10.0
+    selected = lttb_indices(x, y, 20)
+    assert len(selected) == 20
+    assert selected[0] == 0 and selected[-1] == 999
+    assert np.all(np.diff(selected) > 0)
+    assert 300 in selected and 700 in selected
+
+
+@pytest.mark.parametrize("max_points", [1, 2, 10])
+def test_downsample_keeps_whole_bars(max_points):
+    hist = daily_bars(periods=60)
+    sampled = downsample(hist, max_points)
+    assert len(sampled) == max_points
+    assert sampled.index[-1] == hist.index[-1]
+    pd.testing.assert_frame_equal(sampled, hist.loc[sampled.index])
+
+
+def test_downsample_is_a_no_op_when_short_enough():
+    hist = daily_bars(periods=10)
+    assert downsample(hist, 10) is hist
+    assert downsample(hist, 0) is hist
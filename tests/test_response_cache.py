@@ -0,0 +1,69 @@
+import time
+
+import pytest
+
+from response_cache import AnalysisCache, quantize
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return AnalysisCache(path=str(tmp_path / "analysis_cache.db"), ttl=60, max_entries=2)
+
+
+@pytest.mark.parametrize("value, expected", [
+    (190.1234, 190.0),
+    (0.012345, 0.0123),
+    (3.04e12, 3.04e12),
+    (-12.34, -12.3),
+    (0, 0),
+    ("N/A", "N/A"),
+    (None, None),
+    (True, True),
+])
+def test_quantize_keeps_three_significant_digits(value, expected):
+    assert quantize(value) == expected
+
+
+def test_nearby_prices_share_a_key_and_other_questions_do_not():
+    fingerprint = {"price": quantize(190.12)}
+    key = AnalysisCache.make_key("aapl", "is it a buy", fingerprint, "1mo")
+    assert key == AnalysisCache.make_key("AAPL", "is it a buy", {"price": quantize(190.14)}, "1mo")
+    assert key != AnalysisCache.make_key("AAPL", "is it a buy", {"price": quantize(192.0)}, "1mo")
+    assert key != AnalysisCache.make_key("AAPL", "is it a sell", fingerprint, "1mo")
+    assert key != AnalysisCache.make_key("AAPL", "is it a buy", fingerprint, "1y")
+
+
+def test_stored_analyses_are_shared_through_the_file(cache):
+    cache.put("k1", "aapl", "Apple looks fine.")
+    assert cache.get("k1") == "Apple looks fine."
+    assert AnalysisCache(path=cache.path, ttl=60).get("k1") == "Apple looks fine."
+    assert cache.get("k2") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "enabled": True}
+
+
+def test_empty_answers_are_not_stored(cache):
+    cache.put("k1", "AAPL", "")
+    assert cache.get("k1") is None
+
+
+def test_expired_analyses_are_misses(cache):
+    cache.put("k1", "AAPL", "Old answer.")
+    cache.ttl = 0
+    assert cache.get("k1") is None
+
+
+def test_least_recently_used_entries_are_evicted(cache):
+    cache.put("k1", "AAPL", "one")
+    time.sleep(0.01)
+    cache.put("k2", "MSFT", "two")
+    time.sleep(0.01)
+    cache.get("k1")
+    time.sleep(0.01)
+    cache.put("k3", "NVDA", "three")
+    assert [cache.get(key) for key in ("k1", "k2", "k3")] == ["one", None, "three"]
+
+
+def test_empty_path_disables_the_cache():
+    cache = AnalysisCache(path="")
+    cache.put("k1", "AAPL", "answer")
+    assert not cache.enabled and cache.get("k1") is None
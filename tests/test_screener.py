@@ -0,0 +1,135 @@
+import time
+import threading
+
+import pytest
+
+from data_fetchers.screener import (
+    FundamentalsSnapshot, Screener, SnapshotLoading, parse_tickers, load_universe, DEFAULT_UNIVERSE
+)
+
+QUOTES = [
+    {"ticker": "AAPL", "name": "Apple", "sector": "Technology", "industry": "Consumer Electronics",
+     "price": 190.0, "marketCap": 3.0e12, "pe_ratio": 30.0},
+    {"ticker": "MSFT", "name": "Microsoft", "sector": "Technology", "industry": "Software",
+     "price": 410.0, "marketCap": 3.1e12, "pe_ratio": 35.0},
+    {"ticker": "JPM", "name": "JPMorgan", "sector": "Financial Services", "industry": "Banks",
+     "price": 180.0, "marketCap": 5.2e11, "pe_ratio": 11.0},
+    {"ticker": "TSLA", "name": "Tesla", "sector": "Consumer Cyclical", "industry": "Auto Manufacturers",
+     "price": 250.0, "marketCap": 8.0e11, "pe_ratio": "N/A"},
+    {"ticker": "NEWCO", "name": "N/A", "sector": "Technology", "industry": "Software",
+     "price": 0, "marketCap": "N/A", "pe_ratio": "N/A"},
+]
+
+
+@pytest.fixture
+def snapshot():
+    return FundamentalsSnapshot.from_quotes(QUOTES, as_of=1000.0)
+
+
+def tickers(result):
+    return [row["ticker"] for row in result["results"]]
+
+
+def test_default_sort_is_market_cap_descending_with_missing_last(snapshot):
+    result = snapshot.screen()
+    assert result["matches"] == 5
+    assert tickers(result) == ["MSFT", "AAPL", "TSLA", "JPM", "NEWCO"]
+
+
+def test_ascending_sort_keeps_missing_last(snapshot):
+    assert tickers(snapshot.screen(sort_by="pe_ratio", descending=False)) == ["JPM", "AAPL", "MSFT", "TSLA", "NEWCO"]
+
+
+def test_range_filters_are_inclusive_and_skip_missing_values(snapshot):
+    assert tickers(snapshot.screen(ranges={"pe_ratio": (11.0, 30.0)})) == ["AAPL", "JPM"]
+    assert tickers(snapshot.screen(ranges={"pe_ratio": (None, 12)})) == ["JPM"]
+    assert tickers(snapshot.screen(ranges={"price": (200, None)}, sort_by="ticker", descending=False)) == [
+        "MSFT", "TSLA"
+    ]
+    assert tickers(snapshot.screen(ranges={"pe_ratio": (None, None)})) == ["MSFT", "AAPL", "TSLA", "JPM", "NEWCO"]
+
+
+def test_category_filters_are_case_insensitive(snapshot):
+    assert tickers(snapshot.screen(categories={"sector": "technology"})) == ["MSFT", "AAPL", "NEWCO"]
+    assert tickers(snapshot.screen(categories={"industry": [" banks ", "Software"]})) == ["MSFT", "JPM", "NEWCO"]
+    assert snapshot.screen(categories={"sector": "Utilities"}) == {"matches": 0, "results": []}
+
+
+def test_filters_combine_and_limit_only_truncates_results(snapshot):
+    result = snapshot.screen(ranges={"marketCap": (1e12, None)}, categories={"sector": "Technology"},
+                             sort_by="price", limit=1)
+    assert result["matches"] == 2
+    assert tickers(result) == ["MSFT"]
+    row = result["results"][0]
+    assert row["price"] == 410.0 and isinstance(row["price"], float)
+
+
+def test_missing_numbers_are_reported_as_none(snapshot):
+    newco = snapshot.screen(categories={"industry": "software"})["results"][-1]
+    assert newco["ticker"] == "NEWCO"
+    assert newco["price"] is None and newco["marketCap"] is None and newco["pe_ratio"] is None
+
+
+def test_round_trips_through_dict(snapshot):
+    restored = FundamentalsSnapshot.from_dict(snapshot.to_dict())
+    assert restored.as_of == 1000.0
+    assert restored.screen(sort_by="pe_ratio") == snapshot.screen(sort_by="pe_ratio")
+
+
+def test_parse_tickers_from_list_and_file(tmp_path):
+    assert parse_tickers(" aapl, MSFT,,aapl ") == ["AAPL", "MSFT"]
+    assert parse_tickers("  ") == []
+    path = tmp_path / "universe.txt"
+    path.write_text("aapl\n# banks\njpm  # JPMorgan\n\n")
+    assert parse_tickers(str(path)) == ["AAPL", "JPM"]
+
+
+def test_load_universe_defaults(monkeypatch):
+    monkeypatch.delenv("SCREENER_UNIVERSE", raising=False)
+    assert load_universe() == list(DEFAULT_UNIVERSE)
+    monkeypatch.setenv("SCREENER_UNIVERSE", "ibm,ge")
+    assert load_universe() == ["IBM", "GE"]
+
+
+def test_refresh_keeps_last_known_rows_for_failed_tickers(tmp_path):
+    failing = set()
+
+    def loader(ticker):
+        if ticker in failing:
+            raise RuntimeError("upstream down")
+        return next(dict(q) for q in QUOTES if q["ticker"] == ticker)
+
+    path = str(tmp_path / "fundamentals.json")
+    screener = Screener(loader, universe=["AAPL", "JPM"], refresh_seconds=3600, path=path)
+    screener.refresh()
+    failing.add("JPM")
+    screener.refresh()
+    assert screener.errors == {"JPM": "upstream down"}
+    assert tickers(screener.snapshot.screen(sort_by="ticker", descending=False)) == ["AAPL", "JPM"]
+
+    # A second screener for the same universe starts from the persisted snapshot
+    warm = Screener(loader, universe=["AAPL", "JPM"], refresh_seconds=3600, path=path)
+    assert not warm.stale()
+    assert warm.screen()["snapshot_size"] == 2
+
+
+def test_screen_reports_loading_until_the_first_snapshot_exists():
+    release = threading.Event()
+
+    def loader(ticker):
+        release.wait(5)
+        return next(dict(q) for q in QUOTES if q["ticker"] == ticker)
+
+    screener = Screener(loader, universe=["AAPL", "JPM"], refresh_seconds=3600, path="")
+    screener.loading_retry_after = 2
+    with pytest.raises(SnapshotLoading) as excinfo:
+        screener.screen()
+    assert excinfo.value.retry_after == 2
+    assert screener.stats()["refreshing"]
+
+    release.set()
+    for _ in range(100):
+        if not screener.stats()["refreshing"]:
+            break
+        time.sleep(0.05)
+    assert tickers(screener.screen(sort_by="ticker", descending=False)) == ["AAPL", "JPM"]
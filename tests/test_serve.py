@@ -0,0 +1,37 @@
+import serve
+
+
+def test_server_options_come_from_the_environment(monkeypatch):
+    monkeypatch.setenv("HOST", "127.0.0.1")
+    monkeypatch.setenv("PORT", "6001")
+    monkeypatch.setenv("MCP_WORKERS", "3")
+    monkeypatch.setenv("MCP_THREADS", "8")
+    monkeypatch.delenv("MCP_ACCESS_LOG", raising=False)
+    options = serve.server_options()
+    assert options["bind"] == "127.0.0.1:6001"
+    assert (options["workers"], options["threads"], options["worker_class"]) == (3, 8, "gthread")
+    assert options["accesslog"] is None
+
+
+def test_stream_server_is_one_process_on_the_next_port(monkeypatch):
+    monkeypatch.setenv("PORT", "6001")
+    monkeypatch.setenv("MCP_WORKERS", "3")
+    monkeypatch.setenv("MCP_MAX_REQUESTS", "1000")
+    monkeypatch.delenv("QUOTE_STREAM_PORT", raising=False)
+    port = serve.stream_port()
+    assert port == 6002
+    options = serve.stream_server_options(port)
+    assert options["bind"].endswith(":6002")
+    # Recycling the process would drop every open stream
+    assert (options["workers"], options["max_requests"]) == (1, 0)
+
+    monkeypatch.setenv("QUOTE_STREAM_PORT", "")
+    assert serve.stream_port() is None
+
+
+def test_application_applies_only_known_options():
+    application = serve.MCPServerApplication(object(), {"workers": 2, "threads": None, "not_a_setting": 1})
+    assert application.cfg.workers == 2
+    assert application.cfg.threads == 1
+    assert application.load() is application.application
+
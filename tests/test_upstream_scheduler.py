@@ -0,0 +1,161 @@
+import time
+import threading
+
+import pytest
+
+from upstream_scheduler import Upstream, UpstreamScheduler, DeadlineExceeded, RateLimited, INTERACTIVE, BATCH
+
+
+class TooManyRequests(Exception):
+    status_code = 429
+
+
+def test_burst_is_granted_at_once_then_rate_limited():
+    upstream = Upstream("test", rate=20, burst=2, concurrency=10)
+    started = time.monotonic()
+    for _ in range(2):
+        upstream.acquire()
+        upstream.release()
+    assert time.monotonic() - started < 0.03
+
+    upstream.acquire()
+    upstream.release()
+    # The third call waits for a token refilled at 20/s
+    assert time.monotonic() - started >= 0.04
+    assert upstream.stats()["granted"] == 3
+
+
+def test_deadline_exceeded_while_slot_is_held():
+    upstream = Upstream("test", rate=0, burst=1, concurrency=1)
+    upstream.acquire()
+    with pytest.raises(DeadlineExceeded) as raised:
+        upstream.acquire(deadline=time.monotonic() + 0.05)
+    assert raised.value.status_code == 503
+    assert raised.value.retry_after >= 1.0
+    assert upstream.stats()["deadline_exceeded"] == 1
+    upstream.release()
+    assert upstream.stats()["in_flight"] == 0
+
+
+def test_interactive_waiters_go_before_batch():
+    upstream = Upstream("test", rate=0, burst=1, concurrency=1)
+    upstream.acquire()
+    order = []
+
+    def waiter(priority, label):
+        upstream.acquire(priority)
+        order.append(label)
+        upstream.release()
+
+    batch = threading.Thread(target=waiter, args=(BATCH, "batch"))
+    batch.start()
+    time.sleep(0.05)
+    interactive = threading.Thread(target=waiter, args=(INTERACTIVE, "interactive"))
+    interactive.start()
+    time.sleep(0.05)
+    upstream.release()
+    batch.join(2)
+    interactive.join(2)
+    assert order == ["interactive", "batch"]
+
+
+def test_429_is_retried_after_backoff():
+    upstream = Upstream("test", rate=0, burst=1, concurrency=1, max_retries=3, backoff=0.01)
+    attempts = []
+
+    def flaky():
+        attempts.append(time.monotonic())
+        if len(attempts) < 3:
+            raise TooManyRequests("slow down")
+        return "ok"
+
+    assert upstream.call(flaky) == "ok"
+    stats = upstream.stats()
+    assert stats["retries"] == 2
+    assert stats["rate_limited"] == 2
+    # Second backoff is twice the first
+    assert attempts[2] - attempts[1] >= 0.02
+
+
+def test_persistent_429_raises_rate_limited():
+    upstream = Upstream("test", rate=0, burst=1, concurrency=1, max_retries=1, backoff=0.01)
+
+    def throttled():
+        raise TooManyRequests("slow down")
+
+    with pytest.raises(RateLimited) as raised:
+        upstream.call(throttled)
+    assert raised.value.status_code == 429
+    assert upstream.stats()["in_flight"] == 0
+
+
+def test_other_errors_are_not_retried():
+    upstream = Upstream("test", rate=0, burst=1, concurrency=1)
+
+    def broken():
+        raise ValueError("bad ticker")
+
+    with pytest.raises(ValueError):
+        upstream.call(broken)
+    stats = upstream.stats()
+    assert stats["errors"] == 1
+    assert stats["retries"] == 0
+
+
+def test_request_block_applies_its_deadline(monkeypatch):
+    monkeypatch.setenv("UPSTREAM_SLOW_CONCURRENCY", "1")
+    scheduler = UpstreamScheduler()
+    upstream = scheduler.upstream("slow")
+    upstream.acquire()
+    try:
+        with scheduler.request(BATCH, max_wait=0.05):
+            with pytest.raises(DeadlineExceeded):
+                scheduler.call("slow", lambda: None)
+    finally:
+        upstream.release()
+    assert scheduler.stats()["slow"]["deadline_exceeded"] == 1
+
+
+def test_shared_bucket_is_drawn_from_by_every_process(tmp_path):
+    # Two Upstreams on one file stand in for two worker processes
+    path = str(tmp_path / "yahoo.bucket")
+    workers = [Upstream("yahoo", rate=20, burst=2, concurrency=10, shared_path=path) for _ in range(2)]
+    started = time.monotonic()
+    for upstream in workers:
+        upstream.acquire()
+        upstream.release()
+    assert time.monotonic() - started < 0.03
+    assert workers[0].capacity(0) < 1
+
+    for upstream in workers:
+        upstream.acquire()
+        upstream.release()
+    # The second round waits for two refilled tokens at 20/s
+    assert time.monotonic() - started >= 0.09
+
+
+def test_a_429_pauses_every_process(tmp_path):
+    path = str(tmp_path / "yahoo.bucket")
+    first = Upstream("yahoo", rate=100, burst=5, concurrency=10, shared_path=path)
+    second = Upstream("yahoo", rate=100, burst=5, concurrency=10, shared_path=path)
+    first.acquire()
+    first.release(rate_limited=True, retry_after=0.2)
+    started = time.monotonic()
+    second.acquire()
+    second.release()
+    assert time.monotonic() - started >= 0.15
+
+
+def test_shared_scheduler_keeps_buckets_in_its_directory(tmp_path, monkeypatch):
+    monkeypatch.setenv("UPSTREAM_YAHOO_RATE", "5")
+    monkeypatch.setenv("UPSTREAM_OPENAI_RATE", "0")
+    scheduler = UpstreamScheduler()
+    unshared = scheduler.upstream("yahoo")
+    scheduler.share(str(tmp_path))
+    assert scheduler.upstream("yahoo") is not unshared
+    assert scheduler.upstream("yahoo").shared_path == str(tmp_path / "yahoo.bucket")
+    # Nothing to share without a rate limit
+    assert scheduler.upstream("openai").shared_path is None
+    scheduler.call("yahoo", lambda: None)
+    assert (tmp_path / "yahoo.bucket").exists()
+    assert scheduler.stats()["yahoo"]["tokens"] < 10
@@ -0,0 +1,251 @@
+import pandas as pd
+import pytest
+
+from data_fetchers import bar_store
+from data_fetchers import indicators
+from data_fetchers import yahoo_finance
+from data_fetchers.yahoo_finance import YahooFinanceFetcher, INDICATOR_LOOKBACK, STORE_INTERVAL
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setenv("BAR_STORE_PATH", str(tmp_path / "bars.db"))
+    return bar_store.get_bar_store()
+
+
+@pytest.fixture
+def no_store(monkeypatch):
+    monkeypatch.setenv("BAR_STORE_PATH", "")
+
+
+@pytest.fixture
+def downloads(monkeypatch):
+    """Ticker lists passed to yf.download, which still runs"""
+    download = yahoo_finance.yf.download
+    calls = []
+
+    def recording(tickers, *args, **kwargs):
+        calls.append(list(tickers))
+        return download(tickers, *args, **kwargs)
+
+    monkeypatch.setattr(yahoo_finance.yf, "download", recording)
+    return calls
+
+
+@pytest.fixture
+def history_requests(monkeypatch):
+    """start= arguments of single-ticker history requests, which still run"""
+    history = yahoo_finance.yf.Ticker.history
+    starts = []
+
+    def recording(self, *args, **kwargs):
+        starts.append(kwargs.get("start"))
+        return history(self, *args, **kwargs)
+
+    monkeypatch.setattr(yahoo_finance.yf.Ticker, "history", recording)
+    return starts
+
+
+@pytest.fixture
+def history_loads(monkeypatch):
+    """Periods passed to _load_history, which still runs"""
+    load_history = YahooFinanceFetcher._load_history
+    periods = []
+
+    def recording(ticker, period, interval=STORE_INTERVAL):
+        periods.append(period)
+        return load_history(ticker, period, interval)
+
+    monkeypatch.setattr(YahooFinanceFetcher, "_load_history", staticmethod(recording))
+    return periods
+
+
+def expected_latest(ticker, period):
+    interval = YahooFinanceFetcher._interval_for_period(period)
+    hist = YahooFinanceFetcher._load_history(ticker, INDICATOR_LOOKBACK[period], interval)
+    return indicators.latest_values(indicators.compute_indicators(hist, interval))
+
+
+def assert_matches(actual, expected):
+    assert actual.keys() == expected.keys()
+    for key, value in expected.items():
+        if value is None:
+            assert actual[key] is None, key
+        else:
+            assert actual[key] == pytest.approx(value, abs=2e-4), key
+
+
+@pytest.mark.parametrize("period", ["3mo", "1y"])
+def test_latest_indicators_match_a_full_recompute(store, period):
+    payload = YahooFinanceFetcher.fetch_indicators("AAPL", period)
+    assert_matches(payload["latest"], expected_latest("AAPL", period))
+    # A second call advances the saved state instead of rebuilding it
+    assert YahooFinanceFetcher.fetch_indicators("AAPL", period)["latest"] == payload["latest"]
+
+
+def test_saved_state_reads_only_the_stored_tail(store, history_loads, monkeypatch):
+    YahooFinanceFetcher.fetch_indicators("MSFT", "3mo")
+    assert history_loads == ["3mo", "1y"]
+
+    reads = []
+    read = store.read
+
+    def recording_read(ticker, interval, start_ts=None):
+        reads.append(start_ts)
+        return read(ticker, interval, start_ts)
+
+    monkeypatch.setattr(store, "read", recording_read)
+    history_loads.clear()
+    YahooFinanceFetcher.fetch_indicators("MSFT", "3mo")
+    assert history_loads == ["3mo"]
+    state = store.read_indicator_state("MSFT", "1d")
+    assert reads[-1] == state["last_ts"]
+
+
+def test_new_bars_advance_the_saved_state(store, history_loads):
+    YahooFinanceFetcher.fetch_indicators("NVDA", "3mo")
+    before = store.read_indicator_state("NVDA", "1d")
+
+    hist = store.read("NVDA", "1d")
+    last = hist.iloc[-1]
+    new_bars = pd.DataFrame(
+        [last.to_dict(), last.to_dict()],
+        index=pd.DatetimeIndex([hist.index[-1] + pd.Timedelta(days=1), hist.index[-1] + pd.Timedelta(days=2)], name="Date"),
+    )
+    new_bars["Close"] = [last["Close"] * 1.05, last["Close"] * 0.97]
+    store.write("NVDA", "1d", new_bars)
+
+    history_loads.clear()
+    payload = YahooFinanceFetcher.fetch_indicators("NVDA", "3mo")
+    assert history_loads == ["3mo"]
+    after = store.read_indicator_state("NVDA", "1d")
+    # The formerly forming bar and the first new one are committed; the latest is only peeked
+    assert after["count"] == before["count"] + 2
+    assert payload["latest"]["close"] == pytest.approx(last["Close"] * 0.97, abs=1e-4)
+    assert_matches(payload["latest"], expected_latest("NVDA", "3mo"))
+
+
+def test_state_is_rebuilt_when_it_no_longer_lines_up(store, history_loads):
+    YahooFinanceFetcher.fetch_indicators("TSLA", "3mo")
+    # A state whose last bar isn't among the stored bars, e.g. left over from before a refetch
+    stale = indicators.IndicatorState.from_closes(pd.Series([1.0, 2.0], index=pd.date_range("2001-01-01", periods=2)))
+    store.write_indicator_state("TSLA", "1d", stale.to_dict())
+
+    history_loads.clear()
+    payload = YahooFinanceFetcher.fetch_indicators("TSLA", "3mo")
+    assert history_loads == ["3mo", "1y"]
+    assert_matches(payload["latest"], expected_latest("TSLA", "3mo"))
+    assert store.read_indicator_state("TSLA", "1d")["count"] > 2
+
+
+def ohlcv(closes, start="2024-01-02"):
+    index = pd.date_range(start, periods=len(closes), freq="B", tz="America/New_York", name="Date")
+    return pd.DataFrame({"Open": closes, "High": closes, "Low": closes, "Close": closes, "Volume": 100}, index=index)
+
+
+def test_split_download_returns_a_frame_per_available_ticker():
+    aapl = ohlcv([1.0, 2.0, 3.0])
+    # MSFT has no bar on the first day, as when symbols trade on different calendars
+    msft = ohlcv([float("nan"), 5.0, 6.0])
+    msft.iloc[0] = float("nan")
+    frame = pd.concat({"AAPL": aapl, "MSFT": msft}, axis=1)
+
+    split = YahooFinanceFetcher._split_download(["AAPL", "MSFT", "GONE"], frame)
+    assert list(split) == ["AAPL", "MSFT"]
+    pd.testing.assert_frame_equal(split["AAPL"], aapl)
+    assert split["MSFT"]["Close"].tolist() == [5.0, 6.0]
+
+
+def test_split_download_of_one_ticker_accepts_a_flat_frame():
+    flat = ohlcv([1.0, 2.0])
+    assert list(YahooFinanceFetcher._split_download(["AAPL"], flat)) == ["AAPL"]
+    assert YahooFinanceFetcher._split_download(["AAPL", "MSFT"], flat) == {}
+
+
+def test_batch_history_is_one_download_matching_single_fetches(no_store, downloads):
+    batch = YahooFinanceFetcher.fetch_historical_data_batch(["aapl", "MSFT ", "AAPL", ""], "6mo", format="columnar")
+    assert downloads == [["AAPL", "MSFT"]]
+    assert list(batch["results"]) == ["AAPL", "MSFT"] and batch["errors"] == {}
+    for ticker in ("AAPL", "MSFT"):
+        single = YahooFinanceFetcher.fetch_historical_data(ticker, "6mo", format="columnar")
+        assert batch["results"][ticker]["data"] == single["data"]
+
+
+def test_batch_history_reports_tickers_without_data(no_store, monkeypatch):
+    download = yahoo_finance.yf.download
+
+    def without_msft(tickers, *args, **kwargs):
+        return download([t for t in tickers if t != "MSFT"], *args, **kwargs)
+
+    monkeypatch.setattr(yahoo_finance.yf, "download", without_msft)
+    batch = YahooFinanceFetcher.fetch_historical_data_batch(["AAPL", "MSFT"], "1mo")
+    assert list(batch["results"]) == ["AAPL"]
+    assert batch["errors"] == {"MSFT": "No historical data found for MSFT"}
+
+
+def test_batch_history_without_tickers_is_an_error():
+    with pytest.raises(Exception, match="No tickers"):
+        YahooFinanceFetcher.fetch_historical_data_batch([" ", ""])
+
+
+def test_stored_history_is_served_locally_until_it_needs_a_refresh(store, history_requests, monkeypatch):
+    first = YahooFinanceFetcher._load_daily_history("AAPL", "3mo")
+    assert history_requests == [YahooFinanceFetcher._period_start("3mo").strftime("%Y-%m-%d")]
+
+    # Within BAR_STORE_REFRESH_SECONDS, and for any shorter period, no request is made
+    pd.testing.assert_frame_equal(YahooFinanceFetcher._load_daily_history("AAPL", "3mo"), first,
+                                  check_freq=False, check_index_type=False)
+    assert len(YahooFinanceFetcher._load_daily_history("AAPL", "1mo")) < len(first)
+    assert len(history_requests) == 1
+
+    # Once stale only the tail from the last stored bar is requested
+    monkeypatch.setattr(yahoo_finance, "BAR_STORE_REFRESH_SECONDS", 0)
+    YahooFinanceFetcher._load_daily_history("AAPL", "3mo")
+    assert history_requests[1] == first.index[-1].tz_convert("UTC").strftime("%Y-%m-%d")
+
+    # A longer period than the stored one downloads the history again
+    YahooFinanceFetcher._load_daily_history("AAPL", "6mo")
+    assert history_requests[-1] == YahooFinanceFetcher._period_start("6mo").strftime("%Y-%m-%d")
+
+
+def test_corporate_action_in_the_tail_refetches_the_stored_history(store, history_requests, monkeypatch):
+    YahooFinanceFetcher._load_daily_history("AAPL", "3mo")
+    store.write_indicator_state("AAPL", "1d", {"last_ts": 1})
+    last_ts = store.coverage("AAPL", "1d")["last_ts"]
+    history = yahoo_finance.yf.Ticker.history
+
+    def split_tail(self, *args, **kwargs):
+        hist = history(self, *args, **kwargs)
+        if kwargs.get("start") == pd.Timestamp(last_ts, unit="s").strftime("%Y-%m-%d"):
+            # A 2:1 split after the stored bars
+            hist = pd.concat([hist, hist.iloc[-1:].set_axis(hist.index[-1:] + pd.Timedelta(days=1))])
+            hist.iloc[-1, hist.columns.get_loc("Stock Splits")] = 2.0
+        return hist
+
+    monkeypatch.setattr(yahoo_finance.yf.Ticker, "history", split_tail)
+    monkeypatch.setattr(yahoo_finance, "BAR_STORE_REFRESH_SECONDS", 0)
+    cleared = []
+    clear = store.clear
+
+    def recording_clear(ticker, interval):
+        cleared.append(ticker)
+        clear(ticker, interval)
+
+    monkeypatch.setattr(store, "clear", recording_clear)
+    YahooFinanceFetcher._load_daily_history("AAPL", "3mo")
+    assert cleared == ["AAPL"]
+    assert store.read_indicator_state("AAPL", "1d") is None
+    assert store.coverage("AAPL", "1d")["start_ts"] <= int(YahooFinanceFetcher._period_start("3mo").timestamp())
+
+
+def test_indicator_series_are_cached_next_to_the_bars(store, monkeypatch):
+    payload = YahooFinanceFetcher.fetch_indicators("AAPL", "6mo", series=True)
+    assert len(payload["series"]["data"]["Date"]) == payload["bars"]
+    assert payload["series"]["data"]["Date"][-1] == payload["as_of"]
+    assert payload["latest"]["close"] == payload["series"]["data"]["close"][-1]
+
+    def fail(*args, **kwargs):
+        raise AssertionError("recomputed a cached series")
+
+    monkeypatch.setattr(indicators, "compute_indicators", fail)
+    assert YahooFinanceFetcher.fetch_indicators("AAPL", "6mo", series=True) == payload